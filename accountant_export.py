@@ -0,0 +1,95 @@
+import os
+import socket
+import calendar
+import datetime
+from dotenv import load_dotenv
+from database_manager import DatabaseManager
+
+load_dotenv()
+
+EXPORT_JOB = "envio_contador"
+
+
+def previous_month(hoje=None):
+    hoje = hoje or datetime.date.today()
+    return (hoje.replace(day=1) - datetime.timedelta(days=1)).strftime("%Y-%m")
+
+
+def _load_db_configs(db):
+    """ Settings saved through the UI (EMAIL_CONTADOR, SMTP_*, Inter credentials) override .env """
+    load_dotenv(override=True)
+    for k, v in db.get_all_configs().items():
+        os.environ[k] = str(v)
+
+
+def run_monthly_export(enviado_por, db=None):
+    """
+    Sends last month's Inter statement (PDF + OFX) to the accountant, at most once per month.
+    Callers in any process or host serialize on a MySQL named lock per month, and the
+    'already sent' check is repeated inside the lock, so a month is never sent twice.
+    Returns (status, message), status being 'sucesso', 'falha', 'ignorado' or 'ocupado'.
+    """
+    db = db or DatabaseManager()
+    mes_anterior = previous_month()
+
+    # Cheap pre-check: once a month is known to be sent this is answered from memory
+    if db.has_sent_export_for_month(mes_anterior):
+        return "ignorado", f"Relatório de {mes_anterior} já enviado."
+
+    _load_db_configs(db)
+    contador_email = os.getenv("EMAIL_CONTADOR", "")
+    if not contador_email:
+        return "ignorado", "EMAIL_CONTADOR não configurado."
+
+    with db.advisory_lock(f"locamotos_export_{mes_anterior}") as acquired:
+        if not acquired:
+            return "ocupado", f"Envio de {mes_anterior} já em andamento em outro processo."
+
+        # Another runner may have finished between the pre-check and the lock
+        if db.has_sent_export_for_month(mes_anterior, use_cache=False):
+            return "ignorado", f"Relatório de {mes_anterior} já enviado."
+
+        from inter_client import InterClient
+        from mailer import send_accountant_email
+
+        run_id = db.start_job_run(EXPORT_JOB, mes_anterior, socket.gethostname())
+        year_str, month_str = mes_anterior.split('-')
+        last_day = calendar.monthrange(int(year_str), int(month_str))[1]
+        data_inicio = f"{mes_anterior}-01"
+        data_fim = f"{mes_anterior}-{last_day:02d}"
+
+        try:
+            client = InterClient()
+            pdf_b64 = client.get_extrato_export(data_inicio, data_fim, "PDF")
+            ofx_b64 = client.get_extrato_export(data_inicio, data_fim, "OFX")
+
+            success, msg = send_accountant_email(contador_email, mes_anterior, ofx_b64=ofx_b64, pdf_b64=pdf_b64)
+        except Exception as e:
+            msg = f"Falha na integração com Banco Inter: {e}"
+            db.finish_job_run(run_id, "falha", msg)
+            return "falha", msg
+
+        agora = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if success:
+            db.record_accountant_export(mes_anterior, agora, "sucesso", enviado_por)
+            msg = f"Relatório de {mes_anterior} enviado para {contador_email}."
+            db.finish_job_run(run_id, "sucesso", msg)
+            return "sucesso", msg
+
+        db.record_accountant_export(mes_anterior, agora, "falha", enviado_por)
+        db.finish_job_run(run_id, "falha", msg)
+        return "falha", msg
+
+
+def auto_send_accountant_export_job():
+    """ Scheduler entry point """
+    print("[APScheduler] Executing monthly accountant export job...")
+    try:
+        status, msg = run_monthly_export("Worker Automático")
+        print(f"[APScheduler] Accountant export: {status} - {msg}")
+    except Exception as e:
+        print(f"[APScheduler] EXCEPTION in accountant export: {e}")
+
+
+if __name__ == "__main__":
+    print(run_monthly_export("Manual (CLI)"))
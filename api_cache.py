@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "256"))
+# On-disk tier shared by every process on the host (Streamlit + webhook server). Empty disables it.
+API_CACHE_SQLITE = os.getenv("API_CACHE_SQLITE", "cache/api_cache.sqlite3")
+
+
+class TTLCache:
+    """
+    Two-tier read cache for external API calls.
+
+    - In-process LRU (OrderedDict) capped at `max_entries`.
+    - Optional SQLite file so entries survive restarts and are shared across processes.
+
+    Each read passes its own `ttl` (fresh window) and `stale_ttl` (extra window during which the old
+    value is returned immediately while a background thread refreshes it).
+    invalidate(namespace) drops every entry of a namespace in all processes that share the SQLite file.
+    """
+    def __init__(self, max_entries=API_CACHE_MAX_ENTRIES, sqlite_path=API_CACHE_SQLITE):
+        self.max_entries = max_entries
+        self.sqlite_path = sqlite_path or None
+        self._memory = OrderedDict()  # key -> (value, stored_at)
+        self._invalidated = {}  # namespace -> timestamp (used when there is no SQLite tier)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._refreshing = set()
+
+        if self.sqlite_path:
+            os.makedirs(os.path.dirname(self.sqlite_path) or ".", exist_ok=True)
+            with self._sqlite() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS cache (
+                        key TEXT PRIMARY KEY,
+                        namespace TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        stored_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS invalidations (
+                        namespace TEXT PRIMARY KEY,
+                        invalidated_at REAL NOT NULL
+                    )
+                """)
+
+    # --- Public API ---
+    def get_or_load(self, namespace, params, loader, ttl, stale_ttl=0):
+        key = self._key(namespace, params)
+        entry = self._read(namespace, key)
+        now = time.time()
+
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < ttl:
+                return value
+            if age < ttl + stale_ttl:
+                self._refresh_in_background(namespace, key, loader)
+                return value
+
+        # Miss or too old: load once even if several threads ask at the same time
+        with self._key_lock(key):
+            entry = self._read(namespace, key)
+            if entry is not None and time.time() - entry[1] < ttl:
+                return entry[0]
+            started_at = time.time()
+            value = loader()
+            self._write(namespace, key, value, started_at)
+            return value
+
+    def invalidate(self, namespace):
+        now = time.time()
+        with self._lock:
+            self._invalidated[namespace] = now
+            prefix = f"{namespace}|"
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                del self._memory[key]
+        if self.sqlite_path:
+            with self._sqlite() as conn:
+                conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+                conn.execute("""
+                    INSERT INTO invalidations (namespace, invalidated_at) VALUES (?, ?)
+                    ON CONFLICT(namespace) DO UPDATE SET invalidated_at = excluded.invalidated_at
+                """, (namespace, now))
+
+    # --- Internals ---
+    @staticmethod
+    def _key(namespace, params):
+        return f"{namespace}|{json.dumps(params, sort_keys=True, default=str)}"
+
+    def _sqlite(self):
+        return sqlite3.connect(self.sqlite_path, timeout=5)
+
+    def _invalidated_at(self, namespace):
+        if not self.sqlite_path:
+            return self._invalidated.get(namespace, 0)
+        with self._sqlite() as conn:
+            row = conn.execute("SELECT invalidated_at FROM invalidations WHERE namespace = ?", (namespace,)).fetchone()
+            return row[0] if row else 0
+
+    def _read(self, namespace, key):
+        invalidated_at = self._invalidated_at(namespace)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > invalidated_at:
+                    self._memory.move_to_end(key)
+                    return entry
+                del self._memory[key]
+
+        if not self.sqlite_path:
+            return None
+        with self._sqlite() as conn:
+            row = conn.execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= invalidated_at:
+            return None
+        entry = (json.loads(row[0]), row[1])
+        self._remember(key, entry)
+        return entry
+
+    def _write(self, namespace, key, value, loaded_at):
+        """
+        Stores a value stamped with the time its load *started*. If the namespace was invalidated
+        since then, the value may predate the change behind the invalidation and is not stored.
+        """
+        if self._invalidated_at(namespace) >= loaded_at:
+            return
+        entry = (value, loaded_at)
+        self._remember(key, entry)
+        if self.sqlite_path:
+            with self._sqlite() as conn:
+                conn.execute("""
+                    INSERT INTO cache (key, namespace, value, stored_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at
+                """, (key, namespace, json.dumps(value, default=str), entry[1]))
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _refresh_in_background(self, namespace, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                started_at = time.time()
+                self._write(namespace, key, loader(), started_at)
+            except Exception as e:
+                print(f"[APICache] Background refresh failed for {namespace}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_api_cache():
+    """ Process-wide cache instance """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTLCache()
+    return _cache
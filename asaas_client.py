@@ -1,9 +1,32 @@
 import os
-import requests
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from api_cache import get_api_cache
+from http_session import get_session
 
 load_dotenv()
 
+# Per-resource cache windows in seconds: (fresh, extra stale-while-revalidate window)
+ASAAS_CACHE_TTL = {
+    "customers": (int(os.getenv("ASAAS_CACHE_TTL_CUSTOMERS", "600")), 3600),
+    "payments": (int(os.getenv("ASAAS_CACHE_TTL_PAYMENTS", "120")), 600),
+    "balance": (int(os.getenv("ASAAS_CACHE_TTL_BALANCE", "30")), 0),
+}
+
+ASAAS_PAGE_SIZE = 100  # API maximum
+ASAAS_PAGE_WORKERS = int(os.getenv("ASAAS_PAGE_WORKERS", "4"))
+ASAAS_MAX_RETRIES = int(os.getenv("ASAAS_MAX_RETRIES", "5"))
+
+
+def invalidate_asaas_cache(*resources):
+    """ Drops cached Asaas reads (all resources when none are given), e.g. after a webhook event """
+    cache = get_api_cache()
+    for resource in resources or ASAAS_CACHE_TTL:
+        cache.invalidate(f"asaas:{resource}")
+
+
 class AsaasClient:
     def __init__(self):
         self.api_key = os.getenv("ASAAS_API_KEY")
@@ -13,11 +36,21 @@ class AsaasClient:
             "access_token": self.api_key,
             "Content-Type": "application/json"
         }
+        # 429 is left to _get_page, which already backs off using Retry-After
+        self.session = get_session("asaas", pool_size=max(10, ASAAS_PAGE_WORKERS), status_forcelist=(500, 502, 503, 504))
 
     def _check_config(self):
         if not self.api_key:
             raise ValueError("ASAAS_API_KEY is not defined in the .env file.")
 
+    def _cached(self, resource, params, loader, use_cache):
+        if not use_cache:
+            return loader()
+        ttl, stale_ttl = ASAAS_CACHE_TTL[resource]
+        # The API key is part of the key so sandbox/production never share entries
+        params = dict(params, account=(self.api_key or "")[-8:])
+        return get_api_cache().get_or_load(f"asaas:{resource}", params, loader, ttl, stale_ttl)
+
     def get_received_payments(self, date_from, date_to):
         """
         Monitors incoming payments.
@@ -32,20 +65,24 @@ class AsaasClient:
             "status": "RECEIVED"
         }
         
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         response.raise_for_status()
         return response.json().get('data', [])
 
-    def get_balance(self):
+    def get_balance(self, use_cache=True):
         """
         Retrieves the current available balance in the Asaas account.
+        Pass use_cache=False before moving money.
         """
         self._check_config()
         url = f"{self.base_url}/finance/balance"
-        
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return response.json().get('balance', 0.0)
+
+        def load():
+            response = self.session.get(url, headers=self.headers)
+            response.raise_for_status()
+            return response.json().get('balance', 0.0)
+
+        return self._cached("balance", {}, load, use_cache)
 
     def create_pix_transfer(self, pix_key, pix_key_type, value, description=""):
         """
@@ -62,70 +99,92 @@ class AsaasClient:
             "operationType": "PIX"
         }
         
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = self.session.post(url, headers=self.headers, json=payload)
         response.raise_for_status()
+        invalidate_asaas_cache("balance")
         return response.json()
 
-    def get_customers(self):
+    def get_customers(self, use_cache=True):
         """
         Retrieves all customers (locatários) from Asaas.
         Handles pagination to get the complete list.
+        Served from the API cache unless use_cache=False.
         """
         self._check_config()
-        url = f"{self.base_url}/customers"
-        
-        all_customers = []
-        offset = 0
-        limit = 100
-        
-        while True:
-            params = {
-                "offset": offset,
-                "limit": limit
-            }
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            customers = data.get('data', [])
-            all_customers.extend(customers)
-            
-            if not data.get('hasMore'):
-                break
-                
-            offset += limit
-            
-        return all_customers
+        return self._cached("customers", {}, self._fetch_customers, use_cache)
 
-    def get_all_payments(self, date_from, date_to):
+    def _fetch_customers(self):
+        return self._paginate("/customers", {})
+
+    def get_customer(self, customer_id):
+        """ Retrieves a single customer by its Asaas id """
+        self._check_config()
+        response = self.session.get(f"{self.base_url}/customers/{customer_id}", headers=self.headers)
+        response.raise_for_status()
+        return response.json()
+
+    def get_all_payments(self, date_from, date_to, use_cache=True):
         """
         Retrieves all payments generated between two creation dates using pagination.
         date_from, date_to should be YYYY-MM-DD
+        Served from the API cache unless use_cache=False.
         """
         self._check_config()
-        url = f"{self.base_url}/payments"
-        
-        all_payments = []
-        offset = 0
-        limit = 100
-        
-        while True:
-            params = {
-                "dateCreated[ge]": date_from,
-                "dateCreated[le]": date_to,
-                "offset": offset,
-                "limit": limit
-            }
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            payments = data.get('data', [])
-            all_payments.extend(payments)
-            
-            if not data.get('hasMore'):
-                break
-                
+        params = {"date_from": date_from, "date_to": date_to}
+        return self._cached("payments", params, lambda: self._fetch_payments(date_from, date_to), use_cache)
+
+    def _fetch_payments(self, date_from, date_to):
+        return self._paginate("/payments", {"dateCreated[ge]": date_from, "dateCreated[le]": date_to})
+
+    def get_payments(self, filters):
+        """
+        Retrieves all payments matching raw Asaas filters (e.g. {"paymentDate[ge]": "2025-03-01"}).
+        Never cached; used by the incremental sync.
+        """
+        self._check_config()
+        return self._paginate("/payments", filters)
+
+    def _get_page(self, url, params):
+        """ GET one page, backing off on 429 (honoring Retry-After) before giving up """
+        for attempt in range(ASAAS_MAX_RETRIES + 1):
+            response = self.session.get(url, headers=self.headers, params=params)
+            if response.status_code != 429 or attempt == ASAAS_MAX_RETRIES:
+                response.raise_for_status()
+                return response.json()
+            retry_after = response.headers.get("Retry-After")
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(2 ** attempt, 30)
+            # Jitter keeps parallel workers from retrying in lockstep
+            time.sleep(delay + random.uniform(0, 0.5))
+
+    def _paginate(self, path, filters):
+        """
+        Returns the concatenated 'data' items of every page of a list endpoint, in API order.
+        The first page gives totalCount; the remaining pages are fetched concurrently
+        by at most ASAAS_PAGE_WORKERS threads.
+        """
+        url = f"{self.base_url}{path}"
+        limit = ASAAS_PAGE_SIZE
+
+        first = self._get_page(url, dict(filters, offset=0, limit=limit))
+        pages = [first]
+        total = first.get('totalCount') or 0
+
+        offsets = list(range(limit, total, limit)) if first.get('hasMore') else []
+        if offsets:
+            with ThreadPoolExecutor(max_workers=min(ASAAS_PAGE_WORKERS, len(offsets))) as executor:
+                # map() yields in submission order, so the result order is deterministic
+                pages.extend(executor.map(lambda off: self._get_page(url, dict(filters, offset=off, limit=limit)), offsets))
+
+        # Records created while we were paging can push the total past what the first page reported
+        offset = offsets[-1] if offsets else 0
+        while pages[-1].get('hasMore'):
             offset += limit
-            
-        return all_payments
+            pages.append(self._get_page(url, dict(filters, offset=offset, limit=limit)))
+
+        items = []
+        for page in pages:
+            items.extend(page.get('data', []))
+        return items
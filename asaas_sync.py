@@ -0,0 +1,141 @@
+import os
+import sys
+import datetime
+import threading
+from dotenv import load_dotenv
+from asaas_client import AsaasClient
+from database_manager import DatabaseManager
+
+load_dotenv()
+
+# Re-read a few days before each watermark so late-arriving changes are not missed
+ASAAS_SYNC_OVERLAP_DAYS = int(os.getenv("ASAAS_SYNC_OVERLAP_DAYS", "2"))
+ASAAS_SYNC_INTERVAL_MINUTES = int(os.getenv("ASAAS_SYNC_INTERVAL_MINUTES", "15"))
+
+# Watermarks live in the configuracoes table
+WATERMARK_KEY = "asaas_sync_watermark"
+LAST_RUN_KEY = "asaas_sync_ultima_execucao"
+
+_sync_lock = threading.Lock()
+
+
+def _today():
+    return datetime.date.today()
+
+
+def _mirror_unknown_customers(db, client):
+    """ Fetches customers that mirrored payments reference but the mirror does not know yet """
+    customers = []
+    for customer_id in db.get_unknown_asaas_customer_ids():
+        try:
+            customers.append(client.get_customer(customer_id))
+        except Exception as e:
+            print(f"[AsaasSync] Could not fetch customer {customer_id}: {e}")
+    return db.mirror_asaas_customers(customers)
+
+
+def _finish(db, started, summary):
+    db.set_config(WATERMARK_KEY, started.isoformat())
+    db.set_config(LAST_RUN_KEY, f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S} | {summary['modo']} | "
+                                f"{summary['pagamentos']} pagamentos, {summary['clientes']} clientes")
+    print(f"[AsaasSync] {summary}")
+    return summary
+
+
+def full_resync(db=None, client=None):
+    """ Re-downloads every customer and payment. Explicit admin action (or first run). """
+    db = db or DatabaseManager()
+    client = client or AsaasClient()
+    started = _today()
+    fetched_at = datetime.datetime.now()
+
+    n_customers = db.mirror_asaas_customers(client.get_customers(use_cache=False), versao=fetched_at)
+    n_payments = db.mirror_asaas_payments(client.get_payments({}), versao=fetched_at)
+    n_customers += _mirror_unknown_customers(db, client)
+    return _finish(db, started, {"modo": "completa", "pagamentos": n_payments, "clientes": n_customers})
+
+
+def sync_incremental(db=None, client=None):
+    """
+    Pulls only what changed since the last watermark:
+    payments created, paid or due since (watermark - overlap). Due-date matters because
+    PENDING -> OVERDUE changes neither dateCreated nor paymentDate.
+    Other status changes (refunds, deletions) arrive through apply_webhook_event.
+    Falls back to a full resync when there is no watermark yet.
+    """
+    db = db or DatabaseManager()
+    client = client or AsaasClient()
+
+    watermark = db.get_config(WATERMARK_KEY)
+    if not watermark:
+        return full_resync(db, client)
+
+    started = _today()
+    fetched_at = datetime.datetime.now()
+    since = (datetime.date.fromisoformat(watermark) - datetime.timedelta(days=ASAAS_SYNC_OVERLAP_DAYS)).isoformat()
+
+    changed = {}
+    for field in ("dateCreated", "paymentDate", "dueDate"):
+        filters = {f"{field}[ge]": since}
+        if field == "dueDate":
+            filters[f"{field}[le]"] = started.isoformat()
+        for payment in client.get_payments(filters):
+            changed[payment["id"]] = payment
+
+    n_payments = db.mirror_asaas_payments(list(changed.values()), versao=fetched_at)
+    n_customers = _mirror_unknown_customers(db, client)
+    return _finish(db, started, {"modo": "incremental", "pagamentos": n_payments, "clientes": n_customers})
+
+
+def run_sync(full=False):
+    """ Entry point for the scheduler and the UI. Skips if a sync is already running in this process. """
+    if not _sync_lock.acquire(blocking=False):
+        print("[AsaasSync] Sync already running, skipping.")
+        return None
+    try:
+        return full_resync() if full else sync_incremental()
+    finally:
+        _sync_lock.release()
+
+
+def _event_time(data, received_at=None):
+    """ When Asaas generated the event (its top-level dateCreated), else when we received it, else now """
+    try:
+        return datetime.datetime.strptime(data.get("dateCreated") or "", "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return received_at or datetime.datetime.now()
+
+
+def apply_webhook_event(event_type, data, db=None, client=None, received_at=None):
+    """
+    Applies a PAYMENT_* / CUSTOMER_* webhook payload to the mirror.
+    Events can arrive out of order (retries, parallel workers): the mirror keeps the state of the
+    most recent event, and only DELETED / RESTORED events touch the deleted flag.
+    """
+    db = db or DatabaseManager()
+    versao = _event_time(data, received_at)
+
+    if event_type.startswith("PAYMENT_"):
+        payment = dict(data.get("payment") or {})
+        if not payment.get("id"):
+            return
+        if event_type == "PAYMENT_DELETED":
+            payment["deleted"] = True
+        elif event_type == "PAYMENT_RESTORED":
+            payment["deleted"] = False
+        db.mirror_asaas_payments([payment], versao=versao,
+                                 keep_deleted=event_type not in ("PAYMENT_DELETED", "PAYMENT_RESTORED"))
+        if payment.get("customer") and payment["customer"] in db.get_unknown_asaas_customer_ids():
+            _mirror_unknown_customers(db, client or AsaasClient())
+
+    elif event_type.startswith("CUSTOMER_"):
+        customer = data.get("customer")
+        if not isinstance(customer, dict) or not customer.get("id"):
+            return
+        if event_type == "CUSTOMER_DELETED":
+            db.mark_asaas_deleted("asaas_clientes", customer["id"])
+        else:
+            db.mirror_asaas_customers([customer], versao=versao, keep_deleted=event_type != "CUSTOMER_RESTORED")
+
+if __name__ == "__main__":
+    run_sync(full="--full" in sys.argv)
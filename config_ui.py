@@ -3,6 +3,7 @@ import os
 import datetime
 import pandas as pd
 from database_manager import DatabaseManager
+from ui_cache import CachedDatabase
 from auth import hash_password, verify_password, is_strong_password
 from frota_ui import frota_tab
 from locatarios_ui import locatarios_tab
@@ -16,7 +17,7 @@ cookie_manager = stx.CookieManager()
 def load_env_vars():
     # Still load native .env for baseline DB connections
     load_dotenv()
-    db = DatabaseManager()
+    db = CachedDatabase()
     db_configs = db.get_all_configs()
     
     # Merge os.environ with the persistent database configs (DB overrides .env)
@@ -159,7 +160,7 @@ def dashboard_tab():
     
     st.subheader("Módulos Rápidos (Em Tempo Real)")
     
-    db = DatabaseManager()
+    db = CachedDatabase()
     
     # --- Live Metrics Gathering ---
     hoje = datetime.date.today()
@@ -180,18 +181,18 @@ def dashboard_tab():
         h_asaas = datetime.date.today()
         s_asaas = (h_asaas - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
         e_asaas = h_asaas.strftime("%Y-%m-%d")
-        pgs_asaas = ac.get_all_payments(s_asaas, e_asaas)
+        pgs_asaas = db.get_asaas_payments(s_asaas, e_asaas)
         
         asaas_pagos = len([p for p in pgs_asaas if p.get('status') in ["RECEIVED", "CONFIRMED", "RECEIVED_IN_CASH"]])
         asaas_vencidos = len([p for p in pgs_asaas if p.get('status') == "OVERDUE"])
         
         # Calculate Future Receivables (up to 1 year)
         e_asaas_future = (h_asaas + datetime.timedelta(days=365)).strftime("%Y-%m-%d")
-        pgs_asaas_future = ac.get_all_payments(s_asaas, e_asaas_future)
+        pgs_asaas_future = db.get_asaas_payments(s_asaas, e_asaas_future)
         asaas_pendentes_valor = sum(p.get("value", 0.0) for p in pgs_asaas_future if p.get("status") == "PENDING")
         asaas_pendentes_qtd = sum(1 for p in pgs_asaas_future if p.get("status") == "PENDING")
         
-        asaas_count_cust = len(ac.get_customers())
+        asaas_count_cust = len(db.get_asaas_customers())
     except Exception:
         saldo_asaas = 0.0
         asaas_pagos = 0
@@ -216,31 +217,27 @@ def dashboard_tab():
     except Exception:
         locat_ativos = 0
         
-    all_txs = db.get_transactions()
+    import calendar
+    inicio_mes = hoje.replace(day=1).strftime("%Y-%m-%d")
+    fim_mes = hoje.replace(day=calendar.monthrange(hoje.year, hoje.month)[1]).strftime("%Y-%m-%d")
     
     rec_mes_pend = 0.0
-    desp_hoje = 0.0
     desp_mes = 0.0
-    visiun_pend = 0.0
-    visiun_count = 0
     
-    if all_txs:
-        df_live = pd.DataFrame(all_txs, columns=["ID", "Origem", "Tipo", "Valor", "Data", "Status", "CPF/ID", "Placa da Moto"])
-        df_live["Data"] = pd.to_datetime(df_live["Data"])
-        
-        # Receitas
-        mask_rec_pend = (df_live["Tipo"].isin(["entrada", "entrada_liquida"])) & (df_live["Status"] == "pendente")
-        rec_mes_pend = df_live[mask_rec_pend & (df_live["Data"].dt.month == hoje.month) & (df_live["Data"].dt.year == hoje.year)]["Valor"].sum()
-        
-        # Despesas
-        mask_desp_pend = (df_live["Tipo"] == "saida") & (df_live["Status"] == "pendente")
-        desp_hoje = df_live[mask_desp_pend & (df_live["Data"].dt.date == hoje)]["Valor"].sum()
-        desp_mes = df_live[mask_desp_pend & (df_live["Data"].dt.month == hoje.month) & (df_live["Data"].dt.year == hoje.year)]["Valor"].sum()
-        
-        # Visiun
-        visiun_df = df_live[(df_live["Origem"] == "VISIUN") & (df_live["Status"] == "pendente")]
-        visiun_pend = visiun_df["Valor"].sum()
-        visiun_count = len(visiun_df)
+    # Pending totals for the current month, summed in MySQL
+    for tx_tipo, total, _qtd in db.get_transaction_totals(
+        group_by=["tipo"], data_inicio=inicio_mes, data_fim=fim_mes, status=["pendente"]
+    ):
+        if tx_tipo in ("entrada", "entrada_liquida"):
+            rec_mes_pend += total
+        elif tx_tipo == "saida":
+            desp_mes += total
+    
+    hoje_str = hoje.strftime("%Y-%m-%d")
+    desp_hoje = db.get_transaction_totals(data_inicio=hoje_str, data_fim=hoje_str, tipos=["saida"], status=["pendente"])[0][0]
+    
+    # Visiun
+    visiun_pend, visiun_count = db.get_transaction_totals(origem="VISIUN", status=["pendente"])[0]
     
     # 1. Banco Inter
     st.markdown("### 🏦 1. Posição Banco Inter")
@@ -288,12 +285,13 @@ def dashboard_tab():
     
     # 4. Calendário/Evolução
     st.markdown("### 🗓️ 4. Evolução (Receitas vs Despesas)")
-    if not all_txs:
+    # Monthly totals per tipo, aggregated server-side
+    totais_mes = db.get_transaction_totals(group_by=["mes", "tipo"])
+    if not totais_mes:
         st.info("Nenhuma transação financeira registrada para gráficos adicionais.")
         return
         
-    df = pd.DataFrame(all_txs, columns=["ID", "Origem", "Tipo", "Valor", "Data", "Status", "CPF/ID", "Placa da Moto"])
-    df["Data"] = pd.to_datetime(df["Data"])
+    df = pd.DataFrame(totais_mes, columns=["Mes", "Tipo", "Valor", "Qtd"])
     
     # Calculate metrics
     receitas = df[df["Tipo"].isin(["entrada", "entrada_liquida"])]["Valor"].sum()
@@ -308,9 +306,8 @@ def dashboard_tab():
     st.markdown("---")
     st.subheader("Fluxo de Caixa Mensal")
     
-    # Create a monthly summary for the chart
-    df['Mes'] = df['Data'].dt.to_period('M').astype(str)
-    resumo_mes = df.groupby(['Mes', 'Tipo'])['Valor'].sum().unstack(fill_value=0).reset_index()
+    # Pivot the monthly summary for the chart
+    resumo_mes = df.pivot_table(index="Mes", columns="Tipo", values="Valor", aggfunc="sum", fill_value=0).reset_index()
     if 'entrada' not in resumo_mes.columns: resumo_mes['entrada'] = 0
     if 'entrada_liquida' not in resumo_mes.columns: resumo_mes['entrada_liquida'] = 0
     if 'saida' not in resumo_mes.columns: resumo_mes['saida'] = 0
@@ -397,68 +394,42 @@ def inter_tab():
                 start_date_inter = hoje.replace(day=1) # Mês Atual
                 end_date_inter = hoje
             
+            # Statement comes from the local extrato_inter table, kept up to date by inter_sync
+            from inter_sync import LAST_RUN_KEY, run_sync
+            db = CachedDatabase()
+            c_sync1, c_sync2 = st.columns([3, 1])
+            c_sync1.caption(f"🔄 Última sincronização do extrato: {db.get_config(LAST_RUN_KEY) or 'nunca'}")
+            if c_sync2.button("Sincronizar agora", key="inter_sync_now", use_container_width=True):
+                resumo = run_sync()
+                if resumo:
+                    st.success(f"{resumo['novos']} novos lançamentos importados.")
+                    st.rerun()
+                else:
+                    st.warning("Já existe uma sincronização em andamento.")
+
             if start_date_inter > end_date_inter:
                 st.error("A Data Inicial não pode ser maior que a Data Final.")
-                extrato = {}
+                transacoes_inter = []
             else:
-                extrato = client.get_bank_statement(
-                    data_inicio=start_date_inter.strftime("%Y-%m-%d"),
-                    data_fim=end_date_inter.strftime("%Y-%m-%d")
-                )
+                transacoes_inter = db.get_inter_statement(start_date_inter, end_date_inter)
             
-            transacoes_inter = extrato.get("transacoes", [])
             if transacoes_inter:
-                df_inter = pd.DataFrame(transacoes_inter)
-                
-                # Try to parse dates to sort by newest first
-                date_col = None
-                if "dataLancamento" in df_inter.columns:
-                    date_col = "dataLancamento"
-                elif "dataTransacao" in df_inter.columns:
-                    date_col = "dataTransacao"
-                elif "dataInclusao" in df_inter.columns:
-                    date_col = "dataInclusao"
-                else:
-                    date_columns = [col for col in df_inter.columns if "data" in col.lower() or "date" in col.lower()]
-                    if date_columns:
-                        date_col = date_columns[0]
-                
-                if date_col:
-                    # Parse to real datetime for sorting, sort descending
-                    df_inter["_dt_sort"] = pd.to_datetime(df_inter[date_col], errors="coerce")
-                    df_inter = df_inter.sort_values(by="_dt_sort", ascending=False)
-                    # Now format the visible date column nicely
-                    df_inter[date_col] = df_inter["_dt_sort"].dt.strftime("%d/%m/%Y")
-                
-                # Build columns to show and rename them
-                cols_to_show = {}
-                if date_col:
-                    cols_to_show[date_col] = "Data"
-                
-                if "tipoTransacao" in df_inter.columns:
-                    cols_to_show["tipoTransacao"] = "Tipo"
-                if "valor" in df_inter.columns:
-                    cols_to_show["valor"] = "Valor"
-                if "descricao" in df_inter.columns:
-                    cols_to_show["descricao"] = "Descrição"
-                elif "titulo" in df_inter.columns:
-                    cols_to_show["titulo"] = "Descrição"
-                
-                if cols_to_show:
-                    df_display = df_inter[list(cols_to_show.keys())].rename(columns=cols_to_show)
-                    st.dataframe(
-                        df_display,
-                        use_container_width=True,
-                        hide_index=True,
-                        column_config={
-                            "Valor": st.column_config.NumberColumn(
-                                "Valor",
-                                format="R$ %.2f"
-                            )
-                        } if "Valor" in df_display.columns else None
-                    )
-                else:
-                    st.dataframe(df_inter, use_container_width=True, hide_index=True)
+                df_display = pd.DataFrame(
+                    [(t[1], t[3], float(t[4]), t[6] or t[5]) for t in transacoes_inter],
+                    columns=["Data", "Tipo", "Valor", "Descrição"]
+                )
+                df_display["Data"] = pd.to_datetime(df_display["Data"]).dt.strftime("%d/%m/%Y")
+                st.dataframe(
+                    df_display,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "Valor": st.column_config.NumberColumn(
+                            "Valor",
+                            format="R$ %.2f"
+                        )
+                    }
+                )
             else:
                 st.info("Nenhuma transação encontrada no período.")
 
@@ -501,94 +472,25 @@ def locatarios_ui_tab():
     with tab_financeiro:
         st.subheader("Cobranças, Receitas e Valores por Piloto")
         
-        db_fin = DatabaseManager()
-        hoje = datetime.date.today()
+        db_fin = CachedDatabase()
         
         # Load locatarios
         locatarios_fin = db_fin.get_locatarios_list()
         if not locatarios_fin:
             st.info("Nenhum locatário cadastrado.")
         else:
-            # Load all DB transactions once
-            all_db_txs = db_fin.get_transactions()
-            
-            # Load ASAAS data once
-            asaas_payments = []
-            asaas_cust_map = {}
-            asaas_cust_cpf_map = {}
-            try:
-                from asaas_client import AsaasClient
-                ac = AsaasClient()
-                customers = ac.get_customers()
-                asaas_cust_map = {c["id"]: c.get("name", "Desconhecido") for c in customers}
-                asaas_cust_cpf_map = {c["id"]: c.get("cpfCnpj", "").replace(".", "").replace("-", "").replace("/", "") for c in customers}
-                
-                asaas_start = datetime.date(2025, 1, 1).strftime("%Y-%m-%d")
-                asaas_end = (hoje + datetime.timedelta(days=365)).strftime("%Y-%m-%d")
-                with st.spinner("Buscando boletos no ASAAS..."):
-                    asaas_payments = ac.get_all_payments(asaas_start, asaas_end)
-            except Exception as e:
-                st.warning(f"Não foi possível buscar dados do ASAAS: {e}")
-            
-            # Reverse map: clean CPF -> list of ASAAS customer_ids
-            cpf_to_cust_ids = {}
-            for cid, cpf in asaas_cust_cpf_map.items():
-                if cpf:
-                    cpf_to_cust_ids.setdefault(cpf, []).append(cid)
-            
-            status_map = {
-                "RECEIVED": "recebido",
-                "CONFIRMED": "recebido",
-                "RECEIVED_IN_CASH": "recebido",
-                "PENDING": "pendente",
-                "OVERDUE": "em atraso",
-            }
+            # Ledger and ASAAS rows grouped by clean CPF, built once and shared with the profile tab
+            from pilot_finance import get_finance_index, finance_totals, normalize_cpf
+            finance_index, finance_error = get_finance_index()
+            if finance_error:
+                st.warning(f"Não foi possível buscar dados do ASAAS: {finance_error}")
             
             st.write(f"Exibindo dados financeiros de **{len(locatarios_fin)}** pilotos.")
             
             for loc in locatarios_fin:
                 l_id, l_nome, l_cpf, l_tel, l_placa = loc
-                cpf_clean = (l_cpf or "").replace(".", "").replace("-", "").replace("/", "").strip()
-                
-                fin_rows = []
-                
-                # 1. Manual DB transactions for this pilot
-                for tx in all_db_txs:
-                    tx_cpf_clean = (tx[6] or "").replace(".", "").replace("-", "").replace("/", "").strip()
-                    if tx_cpf_clean and cpf_clean and tx_cpf_clean == cpf_clean:
-                        tipo_label = "Receita" if tx[2] in ('entrada', 'entrada_liquida') else "Despesa"
-                        tx_status = tx[5] if tx[5] else "recebido"
-                        fin_rows.append({
-                            "id": tx[0],
-                            "origem": f"Manual ({tipo_label})",
-                            "valor": float(tx[3]),
-                            "valor_liquido": float(tx[3]),
-                            "data": str(tx[4]) if tx[4] else "",
-                            "status": tx_status,
-                            "editavel": True
-                        })
-                
-                # 2. ASAAS payments for this pilot
-                matching_cust_ids = cpf_to_cust_ids.get(cpf_clean, [])
-                for pg in asaas_payments:
-                    if pg.get("customer") in matching_cust_ids:
-                        pg_status = pg.get("status", "")
-                        if pg_status in status_map:
-                            data_pg = pg.get("paymentDate") or pg.get("dueDate") or pg.get("dateCreated", "")
-                            fin_rows.append({
-                                "id": None,
-                                "origem": "ASAAS",
-                                "valor": float(pg.get("value", 0)),
-                                "valor_liquido": float(pg.get("netValue", pg.get("value", 0))),
-                                "data": data_pg,
-                                "status": status_map.get(pg_status, pg_status.lower()),
-                                "editavel": False
-                            })
-                
-                # Compute totals
-                total_recebido = sum(r["valor"] for r in fin_rows if r["status"] == "recebido")
-                total_pendente = sum(r["valor"] for r in fin_rows if r["status"] == "pendente")
-                total_atraso = sum(r["valor"] for r in fin_rows if r["status"] == "em atraso")
+                fin_rows = finance_index.get(normalize_cpf(l_cpf), [])
+                total_recebido, total_pendente, total_atraso = finance_totals(fin_rows)
                 
                 placa_str = f"🏍️ {l_placa}" if l_placa else "Sem moto"
                 
@@ -646,14 +548,15 @@ def asaas_tab():
         
         # Top Metrics (restored)
         saldo = client.get_balance()
-        customers = client.get_customers()
+        db = CachedDatabase()
+        customers = db.get_asaas_customers()
         
         # We need to get payments to calculate the future projection
         hoje = datetime.date.today()
         # Look ahead up to 1 year and behind 30 days for open charges
         s_asaas = (hoje - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
         e_asaas = (hoje + datetime.timedelta(days=365)).strftime("%Y-%m-%d")
-        all_pgs = client.get_all_payments(s_asaas, e_asaas)
+        all_pgs = db.get_asaas_payments(s_asaas, e_asaas)
         
         # Calculate Pending Value Total
         total_futuro_pendente = sum(p.get("value", 0.0) for p in all_pgs if p.get("status") == "PENDING")
@@ -663,14 +566,34 @@ def asaas_tab():
         c_top1.metric("Saldo Disponível (Asaas)", format_currency(saldo))
         c_top2.metric(f"A Receber ({qtd_futuro_pendente} boletos)", format_currency(total_futuro_pendente))
         c_top3.metric("Total de Clientes", len(customers))
-        
-        # Sweep Trigger (Simulated for UI)
+
+        # Local mirror status; the full resync re-downloads everything from ASAAS
+        from asaas_sync import LAST_RUN_KEY, run_sync
+        ultima_sync = db.get_config(LAST_RUN_KEY)
+        st.caption(f"🔄 Última sincronização com o ASAAS: {ultima_sync or 'nunca'}")
+        if st.session_state.get("user_role") == "admin":
+            if st.button("Ressincronizar tudo com o ASAAS"):
+                with st.spinner("Baixando clientes e cobranças do ASAAS..."):
+                    resumo = run_sync(full=True)
+                if resumo:
+                    st.success(f"Sincronização completa: {resumo['pagamentos']} cobranças, {resumo['clientes']} clientes.")
+                    st.rerun()
+                else:
+                    st.warning("Já existe uma sincronização em andamento.")
+
+            # Webhooks that exhausted their retries stay in the queue as 'morto'
+            fila = db.get_webhook_queue_stats()
+            if fila.get("morto"):
+                st.warning(f"⚠️ {fila['morto']} webhook(s) do ASAAS falharam após todas as tentativas.")
+                if st.button("Reprocessar webhooks com falha"):
+                    st.success(f"{db.requeue_dead_webhook_events()} evento(s) recolocados na fila.")
+
+        # Sweep: the scheduler moves the balance periodically; the button runs one right away
         st.write("### 🧹 Varredura Automática")
         if saldo > 0:
             st.info(f"R$ {format_currency(saldo)} aguardando transferência para o Banco Inter.")
             if st.button("Executar Varredura Manual (Pix para Inter)"):
-                # This would call the logic in webhook_server.py or a dedicated worker
-                from webhook_server import trigger_sweep
+                from sweep import trigger_sweep
                 success, msg = trigger_sweep()
                 if success:
                     st.success(msg)
@@ -680,6 +603,14 @@ def asaas_tab():
         else:
             st.write("Saldo zerado. Nada a transferir no momento.")
 
+        varreduras = db.get_recent_sweeps()
+        if varreduras:
+            with st.expander("Últimas varreduras"):
+                st.dataframe(pd.DataFrame(
+                    [(v[0], float(v[1]), v[2], v[3], v[4], v[5], v[6] or "") for v in varreduras],
+                    columns=["#", "Valor", "Status", "Origem", "Pagamentos", "Criada em", "Erro"]
+                ), use_container_width=True, hide_index=True)
+
         st.markdown("---")
         
         # Boletos / Payments List
@@ -714,7 +645,7 @@ def asaas_tab():
             start_date = d_inicio.strftime("%Y-%m-%d")
             end_date = d_fim.strftime("%Y-%m-%d")
 
-        pagamentos = client.get_all_payments(start_date, end_date)
+        pagamentos = db.get_asaas_payments(start_date, end_date)
         
         if pagamentos:
             # Map customer IDs to Names
@@ -791,12 +722,11 @@ def receitas_tab():
     st.header("Receitas")
     st.write("Transações de entrada da Frota.")
     
-    db = DatabaseManager()
-    all_txs = db.get_transactions()
+    db = CachedDatabase()
     
-    # Filter for receitas ('entrada', 'entrada_liquida')
-    # Tx format: id, origem, tipo, valor, data, cpf_cliente, placa_moto
-    all_receitas = [tx for tx in all_txs if tx[2] in ('entrada', 'entrada_liquida')]
+    # Receitas only ('entrada', 'entrada_liquida')
+    # Tx format: id, origem, tipo, valor, data, status, cpf_cliente, placa_moto
+    all_receitas = db.get_transactions(tipos=["entrada", "entrada_liquida"])
     
     if not all_receitas:
         st.info("Nenhuma receita registrada ainda.")
@@ -975,40 +905,27 @@ def _render_dre(db, embedded=False):
         periodo_label = f"{start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}"
     
     # 1. Gather Manual DB transactions in period
-    all_txs = db.get_transactions()
-    
     receitas_manual_bruto = 0.0
     despesas_por_cat = {}  # origin -> total
     
-    for tx in all_txs:
-        tx_data = tx[4]
-        try:
-            tx_date = pd.to_datetime(tx_data).date()
-        except Exception:
-            continue
-        if tx_date < start_date or tx_date > end_date:
-            continue
-        
-        valor = float(tx[3])
-        tipo = tx[2]
-        origem = tx[1] or "Manual"
-        
-        if tipo in ('entrada', 'entrada_liquida'):
-            receitas_manual_bruto += valor
-        elif tipo == 'saida':
+    for tx_tipo, tx_origem, total, _qtd in db.get_transaction_totals(
+        group_by=["tipo", "origem"],
+        data_inicio=start_date.strftime("%Y-%m-%d"), data_fim=end_date.strftime("%Y-%m-%d")
+    ):
+        if tx_tipo in ('entrada', 'entrada_liquida'):
+            receitas_manual_bruto += total
+        elif tx_tipo == 'saida':
             # Categorize by origin
-            cat = origem if origem else "Outros"
-            despesas_por_cat[cat] = despesas_por_cat.get(cat, 0.0) + valor
+            cat = tx_origem or "Outros"
+            despesas_por_cat[cat] = despesas_por_cat.get(cat, 0.0) + total
     
     # 2. Gather ASAAS data
     receitas_asaas_bruto = 0.0
     receitas_asaas_liquido = 0.0
     try:
-        from asaas_client import AsaasClient
-        ac = AsaasClient()
         asaas_start = start_date.strftime("%Y-%m-%d")
         asaas_end = end_date.strftime("%Y-%m-%d")
-        pagamentos = ac.get_all_payments(asaas_start, asaas_end)
+        pagamentos = db.get_asaas_payments(asaas_start, asaas_end)
         
         for pg in pagamentos:
             pg_status = pg.get("status", "")
@@ -1085,7 +1002,7 @@ def receitas_despesas_tab():
     st.header("💰 Receitas e Despesas")
     st.write("Registre e acompanhe todas as entradas e saídas financeiras.")
     
-    db = DatabaseManager()
+    db = CachedDatabase()
     
     tab_receitas, tab_despesas, tab_dre = st.tabs(["📈 Receitas", "📉 Despesas", "📊 DRE"])
     
@@ -1157,9 +1074,14 @@ def receitas_despesas_tab():
         st.markdown("---")
         st.subheader("Histórico de Receitas")
         
-        # 1. Local manual receipts
-        all_txs = db.get_transactions()
-        all_receitas_local = [tx for tx in all_txs if tx[2] in ('entrada', 'entrada_liquida')]
+        hoje = datetime.date.today()
+        start_rec, end_rec = _select_history_period(hoje, "receitas")
+        
+        # 1. Local manual receipts in the selected period
+        all_receitas_local = db.get_transactions(
+            data_inicio=start_rec.strftime("%Y-%m-%d"), data_fim=end_rec.strftime("%Y-%m-%d"),
+            tipos=["entrada", "entrada_liquida"]
+        )
         
         rows = []
         manual_tx_ids = []  # Track IDs for editing
@@ -1183,18 +1105,15 @@ def receitas_despesas_tab():
         # 2. ASAAS paid boletos (automatic)
         asaas_cust_cpf_map = {}  # customer_id -> cpfCnpj
         try:
-            from asaas_client import AsaasClient
-            ac = AsaasClient()
-            
-            # Fetch customers for name and CPF mapping
-            customers = ac.get_customers()
+            # Customers for name and CPF mapping, from the local ASAAS mirror
+            customers = db.get_asaas_customers()
             cust_map = {c["id"]: c.get("name", c.get("cpfCnpj", "Desconhecido")) for c in customers}
             asaas_cust_cpf_map = {c["id"]: c.get("cpfCnpj", "") for c in customers}
             
             h = datetime.date.today()
             asaas_start = datetime.date(2025, 1, 1).strftime("%Y-%m-%d")
             asaas_end = (h + datetime.timedelta(days=365)).strftime("%Y-%m-%d")
-            pagamentos = ac.get_all_payments(asaas_start, asaas_end)
+            pagamentos = db.get_asaas_payments(asaas_start, asaas_end)
             
             status_map = {
                 "RECEIVED": "recebido",
@@ -1227,14 +1146,13 @@ def receitas_despesas_tab():
             st.warning(f"Não foi possível buscar boletos do ASAAS: {e}")
         
         if not rows:
-            st.info("Nenhuma receita registrada ainda.")
+            st.info("Nenhuma receita registrada no período.")
         else:
             df_rec = pd.DataFrame(rows)
             df_rec["Data"] = pd.to_datetime(df_rec["Data"], errors="coerce")
-            hoje = datetime.date.today()
             
             # Display without the ID column
-            _render_financial_history(df_rec.drop(columns=["ID"], errors="ignore"), hoje, "receitas")
+            _render_financial_history(df_rec.drop(columns=["ID"], errors="ignore"), start_rec, end_rec, "receitas")
         
         # ========== EDITAR ENTRADA MANUAL (compacto) ==========
         if all_receitas_local:
@@ -1340,24 +1258,28 @@ def receitas_despesas_tab():
         st.markdown("---")
         st.subheader("Histórico de Despesas")
 
-        all_txs_d = db.get_transactions()
-        all_despesas = [tx for tx in all_txs_d if tx[2] == 'saida']
+        hoje = datetime.date.today()
+        start_desp, end_desp = _select_history_period(hoje, "despesas")
+        all_despesas = db.get_transactions(
+            data_inicio=start_desp.strftime("%Y-%m-%d"), data_fim=end_desp.strftime("%Y-%m-%d"),
+            tipos=["saida"]
+        )
         
         if not all_despesas:
-            st.info("Nenhuma despesa registrada ainda.")
+            st.info("Nenhuma despesa registrada no período.")
         else:
             df = pd.DataFrame(all_despesas, columns=["ID", "Origem", "Tipo", "Valor", "Data", "Status", "CPF/ID", "Placa da Moto"])
+            df["Valor"] = df["Valor"].astype(float)
             df["Data"] = pd.to_datetime(df["Data"])
-            hoje = datetime.date.today()
             
-            _render_financial_history(df, hoje, "despesas")
+            _render_financial_history(df, start_desp, end_desp, "despesas")
 
     # ========== DRE ==========
     with tab_dre:
         _render_dre(db, embedded=False)
 
-def _render_financial_history(df, hoje, prefix):
-    """Shared period filter + table renderer for both Receitas and Despesas."""
+def _select_history_period(hoje, prefix):
+    """Shared period filter for both Receitas and Despesas. Returns (start_date, end_date)."""
     opcoes_periodo = [
         "Mês Atual",
         "Últimos 7 dias",
@@ -1406,7 +1328,12 @@ def _render_financial_history(df, hoje, prefix):
     else:
         start_date = hoje.replace(day=1)
         end_date = hoje
-        
+    
+    return start_date, end_date
+
+def _render_financial_history(df, start_date, end_date, prefix):
+    """Shared table renderer for both Receitas and Despesas."""
+    # DB rows already come filtered by period; ASAAS rows are filtered here by payment date
     mask = (df["Data"].dt.date >= start_date) & (df["Data"].dt.date <= end_date)
     filtered_df = df.loc[mask].copy()
     
@@ -1568,6 +1495,10 @@ def config_ui_tab():
 
 
 
+def _last_export_run():
+    from accountant_export import EXPORT_JOB
+    return CachedDatabase().get_last_job_run(EXPORT_JOB)
+
 def dados_contador_tab():
     st.header("Dados para Contador")
     st.write("Exporte OFX e CSV de todas as transações, e gerencie o envio para o email configurado.")
@@ -1580,7 +1511,7 @@ def dados_contador_tab():
     else:
         st.info(f"Email configurado: **{contador_email}**")
         
-    db = DatabaseManager()
+    db = CachedDatabase()
     
     st.markdown("---")
     st.subheader("Envio Manual / Download")
@@ -1631,15 +1562,14 @@ def dados_contador_tab():
                     clientes_csv_bytes = None
                     try:
                         import io, csv
-                        all_txs = db.get_transactions()
                         # Filter: type entrada/entrada_liquida, recebido, in the selected month
-                        receitas_mes = []
-                        for tx in all_txs:
-                            tx_id, tx_orig, tx_tipo, tx_valor, tx_data, tx_status, tx_cpf, tx_placa = tx
-                            if tx_tipo in ("entrada", "entrada_liquida") and tx_status in ("recebido", "pago"):
-                                tx_date = pd.to_datetime(tx_data)
-                                if tx_date.month == int(month_str) and tx_date.year == int(year_str) and tx_cpf:
-                                    receitas_mes.append(tx)
+                        receitas_mes = [
+                            tx for tx in db.get_transactions(
+                                data_inicio=data_inicio, data_fim=data_fim,
+                                tipos=["entrada", "entrada_liquida"], status=["recebido", "pago"]
+                            )
+                            if tx[6]
+                        ]
                         
                         if receitas_mes:
                             # Group by CPF
@@ -1686,6 +1616,21 @@ def dados_contador_tab():
                         
     st.markdown("---")
     st.subheader("Histórico de Envios Automatizados")
+
+    # The automatic send runs in the scheduler (accountant_export.py); here we only show its last run
+    ultima = _last_export_run()
+    if ultima:
+        status, mes_ref, iniciado_em, finalizado_em, mensagem = ultima
+        quando = iniciado_em.strftime("%d/%m/%Y %H:%M") if iniciado_em else "-"
+        texto = f"Último envio automático ({mes_ref}, {quando}): **{status}**" + (f" — {mensagem}" if mensagem else "")
+        if status == "sucesso":
+            st.success(texto)
+        elif status == "falha":
+            st.error(texto)
+        else:
+            st.info(texto)
+    else:
+        st.caption("O envio automático roda diariamente a partir do dia 5 até o relatório do mês anterior ser enviado.")
     
     historico = db.get_accountant_exports()
     if historico:
@@ -1698,44 +1643,6 @@ def dados_contador_tab():
 
 # --- Main App ---
 
-def auto_send_accountant_export():
-    env_vars = load_env_vars()
-    contador_email = env_vars.get("EMAIL_CONTADOR", "")
-    
-    if not contador_email:
-        return
-        
-    hoje = datetime.date.today()
-    if hoje.day >= 5:
-        mes_anterior = (hoje.replace(day=1) - datetime.timedelta(days=1)).strftime("%Y-%m")
-        db = DatabaseManager()
-        
-        if not db.has_sent_export_for_month(mes_anterior):
-            from exports import generate_csv_summary
-            from mailer import send_accountant_email
-            from inter_client import InterClient
-            import calendar
-            
-            year_str, month_str = mes_anterior.split('-')
-            last_day = calendar.monthrange(int(year_str), int(month_str))[1]
-            data_inicio = f"{mes_anterior}-01"
-            data_fim = f"{mes_anterior}-{last_day:02d}"
-            
-            try:
-                client = InterClient()
-                pdf_b64 = client.get_extrato_export(data_inicio, data_fim, "PDF")
-                ofx_b64 = client.get_extrato_export(data_inicio, data_fim, "OFX")
-                
-                success, msg = send_accountant_email(contador_email, mes_anterior, ofx_b64=ofx_b64, pdf_b64=pdf_b64)
-                if success:
-                    db.record_accountant_export(mes_anterior, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "sucesso", "Robô Automático")
-                    st.toast(f"✅ Relatório oficial do mês {mes_anterior} enviado automaticamente para o contador.")
-                else:
-                    db.record_accountant_export(mes_anterior, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "falha", "Robô Automático")
-                    st.toast(f"❌ Falha no envio automático para o contador: {msg}")
-            except Exception as e:
-                st.toast(f"❌ Falha na integração com Banco Inter no envio automático: {str(e)}")
-
 def main():
     st.set_page_config(page_title="Locamotos", page_icon="🏍️", layout="wide")
     
@@ -2130,10 +2037,6 @@ def main():
     if not st.session_state.logged_in:
         login_register_screen()
     else:
-        # Check auto send
-        if st.session_state.user_role == "admin":
-            auto_send_accountant_export()
-            
         # Sidebar Navigation
         st.sidebar.title("Locamotos")
         st.sidebar.write(f"Olá, **{st.session_state.user_name}**")
@@ -25,7 +25,7 @@ def create_locatarios_table():
                 telefone VARCHAR(20),
                 email VARCHAR(100),
                 cnh VARCHAR(50),
-                cnh_file MEDIUMBLOB,
+                cnh_sha256 CHAR(64),
                 cnh_name VARCHAR(255),
                 cnh_type VARCHAR(100),
                 placa_associada VARCHAR(20),
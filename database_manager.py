@@ -1,6 +1,14 @@
 import pymysql
+import json
+import hashlib
 import os
+import datetime
+import functools
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from db_pool import get_pool
+from document_store import get_document_store, iter_file_chunks
 
 load_dotenv()
 
@@ -9,21 +17,63 @@ DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 DB_NAME = os.getenv("DB_NAME")
 
+# Rows per multi-row INSERT when importing Asaas customers into locatarios
+ASAAS_UPSERT_CHUNK = int(os.getenv("ASAAS_UPSERT_CHUNK", "500"))
+# Ids per IN (...) lookup when counting the new entries of an Inter statement upsert
+INTER_LOOKUP_CHUNK = int(os.getenv("INTER_LOOKUP_CHUNK", "1000"))
+
+# Per-table write counters for this process. Read caches (ui_cache.py) include them in their
+# keys, so a write only drops the cached reads of the tables it changed.
+_table_versions = {}
+_table_versions_lock = threading.Lock()
+
+
+def bump_table_versions(*tables):
+    with _table_versions_lock:
+        for table in tables:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+
+
+def get_table_versions(*tables):
+    with _table_versions_lock:
+        return tuple(_table_versions.get(table, 0) for table in tables)
+
+
+def invalidates(*tables):
+    """ Marks a DatabaseManager write method: bumps the versions of `tables` once it returns """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                bump_table_versions(*tables)
+        return wrapper
+    return decorator
+
+
+def _mirror_update_clause(columns):
+    """
+    ON DUPLICATE KEY UPDATE assignments for the Asaas mirror tables: the stored row only takes the
+    incoming values when they are at least as recent (`versao`), so a late webhook never rolls it back.
+    `versao` goes last because MySQL applies the assignments left to right.
+    """
+    fresh = "versao IS NULL OR VALUES(versao) >= versao"
+    assignments = [f"{col} = IF({fresh}, VALUES({col}), {col})" for col in columns]
+    assignments.append(f"versao = IF({fresh}, VALUES(versao), versao)")
+    return ", ".join(assignments)
+
 class DatabaseManager:
     def __init__(self):
         pass
 
     def get_connection(self):
+        """
+        Borrows a connection from the process-wide pool.
+        Calling close() on it returns it to the pool rather than closing the socket.
+        """
         try:
-            return pymysql.connect(
-                host=DB_HOST,
-                user=DB_USER,
-                password=DB_PASS,
-                database=DB_NAME,
-                charset='utf8mb4',
-                connect_timeout=10,
-                autocommit=True
-            )
+            return get_pool().get_connection()
         except Exception as e:
             print(f"!!! DATABASE CONNECTION ERROR !!!")
             print(f"Host: {DB_HOST}")
@@ -31,7 +81,32 @@ class DatabaseManager:
             print(f"Error Detail: {str(e)}")
             raise e
 
+    def get_pool_stats(self):
+        """ Counters for the shared connection pool (checkouts, waits, reconnects, ...) """
+        return get_pool().stats()
+
+    @contextmanager
+    def advisory_lock(self, name, timeout=0):
+        """
+        MySQL named lock (GET_LOCK) held for the duration of the block, across every process
+        that shares the database. Yields True if the lock was acquired, False otherwise.
+        The connection stays borrowed by this thread, so nested DatabaseManager calls reuse it.
+        """
+        conn = self.get_connection()
+        acquired = False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+                acquired = cursor.fetchone()[0] == 1
+            yield acquired
+        finally:
+            if acquired:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+            conn.close()
+
     # --- Configurações (Persistence for APIs) ---
+    @invalidates("configuracoes")
     def set_config(self, chave, valor):
         conn = self.get_connection()
         try:
@@ -70,6 +145,7 @@ class DatabaseManager:
             conn.close()
 
     # --- Frota ---
+    @invalidates("motos")
     def add_moto(self, placa, modelo, data_compra, valor_compra, despesas, manutencao, revisao, troca_oleo, disponibilidade, locatario, 
                  doc_file=None, doc_name=None, doc_type=None, 
                  ipva_file=None, ipva_name=None, ipva_type=None, 
@@ -78,22 +154,26 @@ class DatabaseManager:
         conn = self.get_connection()
         try:
             with conn.cursor() as cursor:
+                # Files go to the document store; the row only keeps their hash, name and type
+                doc_sha = self.store_document(doc_file, doc_type, cursor)
+                ipva_sha = self.store_document(ipva_file, ipva_type, cursor)
+                crlv_sha = self.store_document(crlv_file, crlv_type, cursor)
                 query = """
                     INSERT INTO motos (
                         placa, modelo, data_compra, valor_compra, 
                         despesas, manutencao, revisao, troca_oleo, disponibilidade, locatario,
-                        doc_file, doc_name, doc_type,
-                        ipva_file, ipva_name, ipva_type,
-                        crlv_file, crlv_name, crlv_type,
+                        doc_sha256, doc_name, doc_type,
+                        ipva_sha256, ipva_name, ipva_type,
+                        crlv_sha256, crlv_name, crlv_type,
                         odometro
                     ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """
                 cursor.execute(query, (
                     placa, modelo, data_compra, valor_compra,
                     despesas, manutencao, revisao, troca_oleo, disponibilidade, locatario,
-                    doc_file, doc_name, doc_type,
-                    ipva_file, ipva_name, ipva_type,
-                    crlv_file, crlv_name, crlv_type,
+                    doc_sha, doc_name, doc_type,
+                    ipva_sha, ipva_name, ipva_type,
+                    crlv_sha, crlv_name, crlv_type,
                     odometro
                 ))
             conn.commit()
@@ -103,6 +183,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("motos")
     def update_moto(self, placa, modelo, data_compra, valor_compra, despesas, manutencao, revisao, troca_oleo, disponibilidade, locatario, 
                  doc_file=None, doc_name=None, doc_type=None, 
                  ipva_file=None, ipva_name=None, ipva_type=None, 
@@ -121,16 +202,16 @@ class DatabaseManager:
 
                 # Conditionally update files if provided
                 if doc_file is not None or doc_name is not None:
-                     updates.extend(["doc_file = %s", "doc_name = %s", "doc_type = %s"])
-                     params.extend([doc_file, doc_name, doc_type])
+                     updates.extend(["doc_sha256 = %s", "doc_name = %s", "doc_type = %s"])
+                     params.extend([self.store_document(doc_file, doc_type, cursor), doc_name, doc_type])
                 
                 if ipva_file is not None or ipva_name is not None:
-                     updates.extend(["ipva_file = %s", "ipva_name = %s", "ipva_type = %s"])
-                     params.extend([ipva_file, ipva_name, ipva_type])
+                     updates.extend(["ipva_sha256 = %s", "ipva_name = %s", "ipva_type = %s"])
+                     params.extend([self.store_document(ipva_file, ipva_type, cursor), ipva_name, ipva_type])
                      
                 if crlv_file is not None or crlv_name is not None:
-                     updates.extend(["crlv_file = %s", "crlv_name = %s", "crlv_type = %s"])
-                     params.extend([crlv_file, crlv_name, crlv_type])
+                     updates.extend(["crlv_sha256 = %s", "crlv_name = %s", "crlv_type = %s"])
+                     params.extend([self.store_document(crlv_file, crlv_type, cursor), crlv_name, crlv_type])
 
                 params.append(placa)
                 query = f"UPDATE motos SET {', '.join(updates)} WHERE placa = %s"
@@ -140,6 +221,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("motos")
     def update_moto_odometer(self, placa, odometro):
         conn = self.get_connection()
         try:
@@ -149,6 +231,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("motos")
     def update_moto_status(self, placa, status):
         conn = self.get_connection()
         try:
@@ -159,6 +242,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("motos", "locatarios")
     def sync_moto_association(self, placa, locatario_nome, move_to_status="Alugado"):
         """
         Links a moto to a locatario and updates both tables.
@@ -183,6 +267,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("motos")
     def delete_moto(self, placa):
         conn = self.get_connection()
         try:
@@ -202,7 +287,8 @@ class DatabaseManager:
                 query = """
                 SELECT 
                     placa, modelo, data_compra, valor_compra, despesas, manutencao, revisao, troca_oleo, disponibilidade, locatario,
-                    doc_name, doc_type, ipva_name, ipva_type, crlv_name, crlv_type, odometro
+                    doc_name, doc_type, ipva_name, ipva_type, crlv_name, crlv_type, odometro,
+                    doc_sha256, ipva_sha256, crlv_sha256
                 FROM motos WHERE placa = %s
                 """
                 cursor.execute(query, (placa,))
@@ -210,16 +296,25 @@ class DatabaseManager:
         finally:
             conn.close()
 
-    def get_moto_file(self, placa, file_col_prefix):
-        """ Fetch the raw binary data for a moto file. file_col_prefix should be 'doc', 'ipva', or 'crlv' """
+    def get_moto_document(self, placa, file_col_prefix):
+        """ Metadata (sha256, name, type) of a moto file. file_col_prefix should be 'doc', 'ipva', or 'crlv' """
+        if file_col_prefix not in ("doc", "ipva", "crlv"):
+            raise ValueError(f"Unknown moto file: {file_col_prefix}")
         conn = self.get_connection()
         try:
             with conn.cursor() as cursor:
-                query = f"SELECT {file_col_prefix}_file, {file_col_prefix}_name, {file_col_prefix}_type FROM motos WHERE placa = %s"
+                query = f"SELECT {file_col_prefix}_sha256, {file_col_prefix}_name, {file_col_prefix}_type FROM motos WHERE placa = %s"
                 cursor.execute(query, (placa,))
                 return cursor.fetchone()
         finally:
             conn.close()
+
+    def get_moto_file(self, placa, file_col_prefix):
+        """ Fetch the raw binary data for a moto file. file_col_prefix should be 'doc', 'ipva', or 'crlv' """
+        meta = self.get_moto_document(placa, file_col_prefix)
+        if not meta or not meta[0]:
+            return None
+        return (self.read_document(meta[0]), meta[1], meta[2])
             
     def get_motos_list(self):
         conn = self.get_connection()
@@ -236,6 +331,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("locacoes")
     def start_rental(self, cpf_cliente, placa_moto, data_inicio):
         conn = self.get_connection()
         try:
@@ -251,6 +347,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("locacoes")
     def end_rental(self, placa_moto, data_fim):
         conn = self.get_connection()
         try:
@@ -300,6 +397,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("transacoes")
     def add_transaction(self, origem, tipo, valor, data, status='pago', cpf_cliente=None, placa_moto=None):
         placa = placa_moto if placa_moto else self.get_active_moto_for_cpf(cpf_cliente, data)
         conn = self.get_connection()
@@ -322,15 +420,128 @@ class DatabaseManager:
         finally:
             conn.close()
 
-    def get_transactions(self):
+    TRANSACTION_COLUMNS = ("id", "origem", "tipo", "valor", "data", "status", "cpf_cliente", "placa_moto")
+    # Generated columns that can be projected but are not part of the default row shape
+    TRANSACTION_EXTRA_COLUMNS = ("cpf_digits",)
+
+    def _transaction_filters(self, data_inicio=None, data_fim=None, tipos=None, status=None,
+                             origem=None, cpf_cliente=None, placa_moto=None):
+        """ Builds the WHERE clause shared by the transaction queries """
+        where = []
+        params = []
+        if data_inicio:
+            where.append("data >= %s")
+            params.append(str(data_inicio))
+        if data_fim:
+            where.append("data <= %s")
+            params.append(str(data_fim))
+        if tipos:
+            where.append(f"tipo IN ({', '.join(['%s'] * len(tipos))})")
+            params.extend(tipos)
+        if status:
+            where.append(f"status IN ({', '.join(['%s'] * len(status))})")
+            params.extend(status)
+        if origem:
+            origens = [origem] if isinstance(origem, str) else list(origem)
+            where.append(f"origem IN ({', '.join(['%s'] * len(origens))})")
+            params.extend(origens)
+        if cpf_cliente:
+            # CPFs are stored with or without punctuation; cpf_digits is the indexed digits-only copy
+            cpf_digits = "".join(ch for ch in str(cpf_cliente) if ch.isdigit())
+            if cpf_digits:
+                where.append("cpf_digits = %s")
+                params.append(cpf_digits)
+            else:
+                # A CPF with no digits matches nobody, not every row with an empty CPF
+                where.append("FALSE")
+        if placa_moto:
+            where.append("placa_moto = %s")
+            params.append(placa_moto)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        return clause, params
+
+    def get_transactions(self, data_inicio=None, data_fim=None, tipos=None, status=None, origem=None,
+                         cpf_cliente=None, placa_moto=None, columns=None, limit=None, offset=0,
+                         order_desc=False):
+        """
+        Returns rows from transacoes, filtered in SQL.
+        data_inicio/data_fim are inclusive YYYY-MM-DD bounds, tipos/status are iterables of accepted values,
+        origem is a value or an iterable. columns projects a subset of TRANSACTION_COLUMNS (defaults to all,
+        in table order). limit/offset paginate the result, ordered by data then id.
+        With no arguments it behaves like the old `SELECT * FROM transacoes`.
+        """
+        cols = list(columns) if columns else list(self.TRANSACTION_COLUMNS)
+        invalid = [c for c in cols if c not in self.TRANSACTION_COLUMNS + self.TRANSACTION_EXTRA_COLUMNS]
+        if invalid:
+            raise ValueError(f"Unknown transacoes columns: {invalid}")
+
+        clause, params = self._transaction_filters(data_inicio, data_fim, tipos, status, origem, cpf_cliente, placa_moto)
+        direction = "DESC" if order_desc else "ASC"
+        query = f"SELECT {', '.join(cols)} FROM transacoes{clause} ORDER BY data {direction}, id {direction}"
+        if limit is not None:
+            query += " LIMIT %s OFFSET %s"
+            params.extend([int(limit), int(offset or 0)])
+
         conn = self.get_connection()
         try:
             with conn.cursor() as cursor:
-                cursor.execute("SELECT * FROM transacoes")
+                cursor.execute(query, tuple(params))
                 return cursor.fetchall()
         finally:
             conn.close()
 
+    def count_transactions(self, data_inicio=None, data_fim=None, tipos=None, status=None, origem=None,
+                           cpf_cliente=None, placa_moto=None):
+        """ Row count for the same filters as get_transactions, for pagination """
+        clause, params = self._transaction_filters(data_inicio, data_fim, tipos, status, origem, cpf_cliente, placa_moto)
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM transacoes{clause}", tuple(params))
+                return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    # Dimensions accepted by get_transaction_totals -> SQL expression
+    TRANSACTION_GROUPS = {
+        "mes": "DATE_FORMAT(data, '%%Y-%%m')",
+        "dia": "DATE(data)",
+        "tipo": "tipo",
+        "status": "status",
+        "origem": "origem",
+        "placa": "placa_moto",
+        "cpf": "cpf_digits",
+    }
+
+    def get_transaction_totals(self, group_by=(), data_inicio=None, data_fim=None, tipos=None, status=None,
+                               origem=None, cpf_cliente=None, placa_moto=None):
+        """
+        Sums transacoes.valor in MySQL.
+        group_by is a sequence of TRANSACTION_GROUPS keys (e.g. ("mes", "tipo")); filters are the same as
+        get_transactions. Returns a list of tuples (*group_values, total, quantidade) ordered by the groups,
+        with total as float. Without group_by a single (total, quantidade) row is returned.
+        """
+        invalid = [g for g in group_by if g not in self.TRANSACTION_GROUPS]
+        if invalid:
+            raise ValueError(f"Unknown transacoes groups: {invalid}")
+
+        exprs = [self.TRANSACTION_GROUPS[g] for g in group_by]
+        clause, params = self._transaction_filters(data_inicio, data_fim, tipos, status, origem, cpf_cliente, placa_moto)
+        select = ", ".join(exprs + ["COALESCE(SUM(valor), 0)", "COUNT(*)"])
+        query = f"SELECT {select} FROM transacoes{clause}"
+        if exprs:
+            positions = ", ".join(str(i + 1) for i in range(len(exprs)))
+            query += f" GROUP BY {positions} ORDER BY {positions}"
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, tuple(params))
+                return [row[:-2] + (float(row[-2]), int(row[-1])) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    @invalidates("transacoes")
     def update_transaction(self, tx_id, origem, valor, data, status, cpf_cliente=None, placa_moto=None):
         conn = self.get_connection()
         try:
@@ -344,6 +555,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("transacoes")
     def delete_transaction(self, tx_id):
         conn = self.get_connection()
         try:
@@ -415,6 +627,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("envios_contador")
     def record_accountant_export(self, mes_referencia, data_envio, status="sucesso", enviado_por="Sistema"):
         conn = self.get_connection()
         try:
@@ -439,30 +652,80 @@ class DatabaseManager:
         finally:
             conn.close()
 
-    def has_sent_export_for_month(self, mes_referencia):
+    # Months already sent successfully; a sent month never becomes unsent, so True answers are cached
+    _sent_export_months = set()
+
+    def has_sent_export_for_month(self, mes_referencia, use_cache=True):
+        if use_cache and mes_referencia in DatabaseManager._sent_export_months:
+            return True
         conn = self.get_connection()
         try:
             with conn.cursor() as cursor:
                 cursor.execute("SELECT COUNT(*) FROM envios_contador WHERE mes_referencia = %s AND status = 'sucesso'", (mes_referencia,))
-                return cursor.fetchone()[0] > 0
+                sent = cursor.fetchone()[0] > 0
+        finally:
+            conn.close()
+        if sent:
+            DatabaseManager._sent_export_months.add(mes_referencia)
+        return sent
+
+    # --- Job runs (execucoes_jobs) ---
+
+    @invalidates("execucoes_jobs")
+    def start_job_run(self, job, chave=None, host=None):
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("INSERT INTO execucoes_jobs (job, chave, host) VALUES (%s, %s, %s)", (job, chave, host))
+                run_id = cursor.lastrowid
+            conn.commit()
+            return run_id
+        finally:
+            conn.close()
+
+    @invalidates("execucoes_jobs")
+    def finish_job_run(self, run_id, status, mensagem=None):
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE execucoes_jobs SET status = %s, mensagem = %s, finalizado_em = NOW()
+                    WHERE id = %s
+                """, (status, mensagem, run_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_last_job_run(self, job):
+        """ (status, chave, iniciado_em, finalizado_em, mensagem) of the latest run, or None """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT status, chave, iniciado_em, finalizado_em, mensagem FROM execucoes_jobs
+                    WHERE job = %s ORDER BY id DESC LIMIT 1
+                """, (job,))
+                return cursor.fetchone()
         finally:
             conn.close()
 
     # --- Locatarios (Renters) ---
+    @invalidates("locatarios")
     def add_locatario(self, nome, cpf, endereco, telefone, email, cnh, placa_associada,
                       cnh_file=None, cnh_name=None, cnh_type=None):
         conn = self.get_connection()
         try:
             with conn.cursor() as cursor:
+                cnh_sha = self.store_document(cnh_file, cnh_type, cursor)
                 query = """
                     INSERT INTO locatarios (
                         nome, cpf, endereco, telefone, email, cnh,
-                        placa_associada, cnh_file, cnh_name, cnh_type
+                        placa_associada, cnh_sha256, cnh_name, cnh_type
                     ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """
                 cursor.execute(query, (
                     nome, cpf, endereco, telefone, email, cnh,
-                    placa_associada, cnh_file, cnh_name, cnh_type
+                    placa_associada, cnh_sha, cnh_name, cnh_type
                 ))
             conn.commit()
             return True
@@ -471,6 +734,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("locatarios")
     def update_locatario(self, locatario_id, nome, cpf, endereco, telefone, email, cnh, placa_associada,
                         cnh_file=None, cnh_name=None, cnh_type=None):
         conn = self.get_connection()
@@ -478,13 +742,15 @@ class DatabaseManager:
             with conn.cursor() as cursor:
                 updates = [
                     "nome = %s", "cpf = %s", "endereco = %s", "telefone = %s",
-                    "email = %s", "cnh = %s", "placa_associada = %s"
+                    "email = %s", "cnh = %s", "placa_associada = %s",
+                    # The row no longer matches its Asaas hash, so the next sync re-imports it
+                    "asaas_hash = NULL"
                 ]
                 params = [nome, cpf, endereco, telefone, email, cnh, placa_associada]
 
                 if cnh_file is not None:
-                    updates.extend(["cnh_file = %s", "cnh_name = %s", "cnh_type = %s"])
-                    params.extend([cnh_file, cnh_name, cnh_type])
+                    updates.extend(["cnh_sha256 = %s", "cnh_name = %s", "cnh_type = %s"])
+                    params.extend([self.store_document(cnh_file, cnh_type, cursor), cnh_name, cnh_type])
 
                 params.append(locatario_id)
                 query = f"UPDATE locatarios SET {', '.join(updates)} WHERE id = %s"
@@ -494,6 +760,7 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    @invalidates("locatarios")
     def delete_locatario(self, locatario_id):
         conn = self.get_connection()
         try:
@@ -504,56 +771,611 @@ class DatabaseManager:
         finally:
             conn.close()
             
+    @invalidates("locatarios")
     def upsert_asaas_customers(self, customers):
         """
-        Receives a list of dicts from Asaas and UPSERTS them using CPF/CNPJ.
+        Receives a list of dicts from Asaas and UPSERTS them into locatarios using CPF/CNPJ.
+        Each row carries a hash of the imported fields (asaas_hash); customers whose hash is unchanged
+        are skipped, the rest are written with multi-row INSERTs of ASAAS_UPSERT_CHUNK rows.
+        Returns (inserted, updated).
         """
+        rows = {}
+        for c in customers:
+            cpf_cnpj = c.get('cpfCnpj', '')
+            if not cpf_cnpj:
+                continue
+
+            nome = c.get('name', '')
+            email = c.get('email', '')
+            telefone = c.get('mobilePhone') or c.get('phone') or ''
+
+            endereco = ""
+            if c.get('address'):
+                parts = [
+                    f"{c.get('address')}, {c.get('addressNumber')}",
+                    c.get('complement') or "",
+                    c.get('province') or "",
+                    f"{c.get('city')}-{c.get('state')}",
+                    c.get('postalCode') or ""
+                ]
+                endereco = " | ".join([p for p in parts if p])
+
+            content_hash = hashlib.sha1(json.dumps([nome, endereco, telefone, email]).encode("utf-8")).hexdigest()
+            # The last occurrence of a CPF wins, like the row-by-row upsert did
+            rows[cpf_cnpj] = (nome, cpf_cnpj, endereco, telefone, email, content_hash)
+
+        if not rows:
+            return 0, 0
+
         conn = self.get_connection()
-        count_inserted = 0
-        count_updated = 0
-        
-        try:
-            with conn.cursor() as cursor:
-                for c in customers:
-                    nome = c.get('name', '')
-                    cpf_cnpj = c.get('cpfCnpj', '')
-                    
-                    if not cpf_cnpj:
-                        continue
-                        
-                    email = c.get('email', '')
-                    telefone = c.get('mobilePhone') or c.get('phone') or ''
-                    
-                    endereco = ""
-                    if c.get('address'):
-                        parts = [
-                            f"{c.get('address')}, {c.get('addressNumber')}",
-                            c.get('complement') or "",
-                            c.get('province') or "",
-                            f"{c.get('city')}-{c.get('state')}",
-                            c.get('postalCode') or ""
-                        ]
-                        endereco = " | ".join([p for p in parts if p])
-                        
-                    query = """
-                        INSERT INTO locatarios (nome, cpf, endereco, telefone, email)
-                        VALUES (%s, %s, %s, %s, %s)
+        try:
+            with conn.cursor() as cursor:
+                # Current hashes of the CPFs being imported
+                stored = {}
+                cpfs = list(rows)
+                for start in range(0, len(cpfs), ASAAS_UPSERT_CHUNK):
+                    chunk = cpfs[start:start + ASAAS_UPSERT_CHUNK]
+                    cursor.execute(
+                        f"SELECT cpf, asaas_hash FROM locatarios WHERE cpf IN ({', '.join(['%s'] * len(chunk))})",
+                        tuple(chunk)
+                    )
+                    stored.update(cursor.fetchall())
+
+                changed = [row for cpf, row in rows.items() if cpf not in stored or stored[cpf] != row[5]]
+                count_inserted = sum(1 for row in changed if row[1] not in stored)
+                count_updated = len(changed) - count_inserted
+
+                for start in range(0, len(changed), ASAAS_UPSERT_CHUNK):
+                    cursor.executemany("""
+                        INSERT INTO locatarios (nome, cpf, endereco, telefone, email, asaas_hash)
+                        VALUES (%s, %s, %s, %s, %s, %s)
                         ON DUPLICATE KEY UPDATE
                         nome = VALUES(nome),
                         endereco = VALUES(endereco),
                         telefone = VALUES(telefone),
-                        email = VALUES(email)
-                    """
-                    affected = cursor.execute(query, (nome, cpf_cnpj, endereco, telefone, email))
-                    if affected == 1:
-                        count_inserted += 1
-                    elif affected == 2:
-                        count_updated += 1
+                        email = VALUES(email),
+                        asaas_hash = VALUES(asaas_hash)
+                    """, changed[start:start + ASAAS_UPSERT_CHUNK])
             conn.commit()
             return count_inserted, count_updated
         finally:
             conn.close()
 
+    # --- ASAAS local mirror (filled by asaas_sync.py and the webhook) ---
+
+    @invalidates("asaas_clientes")
+    def mirror_asaas_customers(self, customers, versao=None, keep_deleted=False):
+        """
+        Upserts raw Asaas customer dicts into asaas_clientes. Returns the number of rows received.
+        versao: when this state was observed (defaults to now); rows already holding a newer state are left alone.
+        keep_deleted: leave the stored `deleted` flag as is (webhook events other than DELETED/RESTORED).
+        """
+        versao = versao or datetime.datetime.now()
+        rows = [
+            (c["id"], c.get("name"), c.get("cpfCnpj"), c.get("email"), c.get("dateCreated") or None,
+             1 if c.get("deleted") else 0, json.dumps(c), versao)
+            for c in customers if c.get("id")
+        ]
+        if not rows:
+            return 0
+        columns = ["nome", "cpf_cnpj", "email", "date_created", "payload"]
+        if not keep_deleted:
+            columns.append("deleted")
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.executemany(f"""
+                    INSERT INTO asaas_clientes (id, nome, cpf_cnpj, email, date_created, deleted, payload, versao)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE {_mirror_update_clause(columns)}
+                """, rows)
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+
+    @invalidates("asaas_pagamentos")
+    def mirror_asaas_payments(self, payments, versao=None, keep_deleted=False):
+        """
+        Upserts raw Asaas payment dicts into asaas_pagamentos. Returns the number of rows received.
+        versao: when this state was observed (defaults to now); rows already holding a newer state are left alone.
+        keep_deleted: leave the stored `deleted` flag as is (webhook events other than DELETED/RESTORED).
+        """
+        versao = versao or datetime.datetime.now()
+        rows = [
+            (p["id"], p.get("customer"), p.get("status"), p.get("value"), p.get("netValue"),
+             p.get("dateCreated") or None, p.get("dueDate") or None, p.get("paymentDate") or None,
+             1 if p.get("deleted") else 0, json.dumps(p), versao)
+            for p in payments if p.get("id")
+        ]
+        if not rows:
+            return 0
+        columns = ["customer_id", "status", "valor", "valor_liquido", "date_created",
+                   "due_date", "payment_date", "payload"]
+        if not keep_deleted:
+            columns.append("deleted")
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.executemany(f"""
+                    INSERT INTO asaas_pagamentos (id, customer_id, status, valor, valor_liquido,
+                                                  date_created, due_date, payment_date, deleted, payload, versao)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE {_mirror_update_clause(columns)}
+                """, rows)
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+
+    @invalidates("asaas_clientes", "asaas_pagamentos")
+    def mark_asaas_deleted(self, table, asaas_id):
+        """ Flags a mirrored customer/payment as deleted (table: 'asaas_clientes' or 'asaas_pagamentos') """
+        if table not in ("asaas_clientes", "asaas_pagamentos"):
+            raise ValueError(f"Unknown Asaas mirror table: {table}")
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"UPDATE {table} SET deleted = 1 WHERE id = %s", (asaas_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_asaas_customers(self):
+        """ Mirrored Asaas customers, in the same dict shape the API returns """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT payload FROM asaas_clientes WHERE deleted = 0 ORDER BY nome")
+                return [json.loads(row[0]) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def get_asaas_customer_cpfs(self):
+        """ {asaas customer id: CPF/CNPJ digits} for the mirrored customers that have one """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, cpf_digits FROM asaas_clientes WHERE deleted = 0 AND cpf_digits <> ''")
+                return dict(cursor.fetchall())
+        finally:
+            conn.close()
+
+    def get_asaas_payments(self, date_from=None, date_to=None, customer_ids=None, cpf_cliente=None, status=None):
+        """
+        Mirrored Asaas payments, in the same dict shape the API returns.
+        date_from/date_to filter on the creation date, like AsaasClient.get_all_payments.
+        """
+        where = ["p.deleted = 0"]
+        params = []
+        join = ""
+        if date_from:
+            where.append("p.date_created >= %s")
+            params.append(str(date_from))
+        if date_to:
+            where.append("p.date_created <= %s")
+            params.append(str(date_to))
+        if customer_ids:
+            where.append(f"p.customer_id IN ({', '.join(['%s'] * len(customer_ids))})")
+            params.extend(customer_ids)
+        if cpf_cliente:
+            cpf_digits = "".join(ch for ch in str(cpf_cliente) if ch.isdigit())
+            if not cpf_digits:
+                # A CPF with no digits matches nobody, not every customer with an empty CPF
+                return []
+            join = " JOIN asaas_clientes c ON c.id = p.customer_id"
+            where.append("c.cpf_digits = %s")
+            params.append(cpf_digits)
+        if status:
+            where.append(f"p.status IN ({', '.join(['%s'] * len(status))})")
+            params.extend(status)
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                query = f"SELECT p.payload FROM asaas_pagamentos p{join} WHERE {' AND '.join(where)} ORDER BY p.date_created, p.id"
+                cursor.execute(query, tuple(params))
+                return [json.loads(row[0]) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def get_unknown_asaas_customer_ids(self):
+        """ Customer ids referenced by mirrored payments but missing from asaas_clientes """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT DISTINCT p.customer_id FROM asaas_pagamentos p
+                    LEFT JOIN asaas_clientes c ON c.id = p.customer_id
+                    WHERE p.customer_id IS NOT NULL AND c.id IS NULL
+                """)
+                return [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    # --- Banco Inter statement (filled by inter_sync.py) ---
+
+    INTER_STATEMENT_COLUMNS = ("id_transacao", "data_entrada", "tipo_operacao", "tipo_transacao", "valor", "titulo", "descricao")
+
+    @invalidates("extrato_inter")
+    def upsert_inter_statement(self, rows):
+        """
+        rows: dicts with INTER_STATEMENT_COLUMNS plus 'payload' (the raw Inter item).
+        Returns the number of new entries.
+        """
+        if not rows:
+            return 0
+        cols = self.INTER_STATEMENT_COLUMNS + ("payload",)
+        values = [tuple(json.dumps(r[c]) if c == "payload" else r[c] for c in cols) for r in rows]
+        ids = list({r["id_transacao"] for r in rows})
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                # New entries = incoming ids not stored yet, looked up through the unique key
+                existing = 0
+                for start in range(0, len(ids), INTER_LOOKUP_CHUNK):
+                    chunk = ids[start:start + INTER_LOOKUP_CHUNK]
+                    cursor.execute(
+                        f"SELECT COUNT(*) FROM extrato_inter WHERE id_transacao IN ({', '.join(['%s'] * len(chunk))})",
+                        chunk)
+                    existing += cursor.fetchone()[0]
+                cursor.executemany(f"""
+                    INSERT INTO extrato_inter ({', '.join(cols)})
+                    VALUES ({', '.join(['%s'] * len(cols))})
+                    ON DUPLICATE KEY UPDATE
+                    {', '.join(f'{c} = VALUES({c})' for c in cols if c != 'id_transacao')}
+                """, values)
+            conn.commit()
+            return len(ids) - existing
+        finally:
+            conn.close()
+
+    def get_inter_statement(self, data_inicio=None, data_fim=None, tipo_operacao=None, order_desc=True):
+        """ Stored Inter statement entries as tuples in INTER_STATEMENT_COLUMNS order """
+        where = []
+        params = []
+        if data_inicio:
+            where.append("data_entrada >= %s")
+            params.append(str(data_inicio))
+        if data_fim:
+            where.append("data_entrada <= %s")
+            params.append(str(data_fim))
+        if tipo_operacao:
+            where.append("tipo_operacao = %s")
+            params.append(tipo_operacao)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        direction = "DESC" if order_desc else "ASC"
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                query = f"SELECT {', '.join(self.INTER_STATEMENT_COLUMNS)} FROM extrato_inter{clause} ORDER BY data_entrada {direction}, id {direction}"
+                cursor.execute(query, tuple(params))
+                return cursor.fetchall()
+        finally:
+            conn.close()
+
+    # --- Webhook queue (webhook_eventos, drained by webhook_queue.py) ---
+
+    def enqueue_webhook_event(self, event_type, payment_id, payload, idempotency_key=None):
+        """
+        Stores a webhook event for the workers.
+        With an idempotency_key, the (key, event_type) pair is registered in webhook_idempotencia in the
+        same transaction: a redelivery only bumps its duplicatas counter and returns None (nothing queued).
+        """
+        conn = self.get_connection()
+        try:
+            conn.begin()
+            with conn.cursor() as cursor:
+                if idempotency_key:
+                    # 1 affected row = first delivery, 2 = key already there (ON DUPLICATE KEY UPDATE)
+                    affected = cursor.execute("""
+                        INSERT INTO webhook_idempotencia (chave, event_type) VALUES (%s, %s)
+                        ON DUPLICATE KEY UPDATE duplicatas = duplicatas + 1, ultimo_em = NOW()
+                    """, (idempotency_key, event_type))
+                    if affected != 1:
+                        conn.commit()
+                        return None
+                cursor.execute(
+                    "INSERT INTO webhook_eventos (event_type, payment_id, payload) VALUES (%s, %s, %s)",
+                    (event_type, payment_id, json.dumps(payload))
+                )
+                event_id = cursor.lastrowid
+            conn.commit()
+            return event_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def claim_webhook_event(self, lock_timeout):
+        """
+        Atomically takes the oldest due event and marks it 'processando'.
+        SKIP LOCKED lets several workers claim in parallel without blocking on each other.
+        Events stuck in 'processando' for more than lock_timeout seconds (crashed worker) are claimed again.
+        Returns (id, event_type, payload dict, tentativas, recebido_em) or None.
+        """
+        conn = self.get_connection()
+        try:
+            conn.begin()
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, event_type, payload, tentativas, recebido_em FROM webhook_eventos
+                    WHERE (status = 'pendente' AND proxima_tentativa <= NOW())
+                       OR (status = 'processando' AND bloqueado_em < NOW() - INTERVAL %s SECOND)
+                    ORDER BY id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                """, (int(lock_timeout),))
+                row = cursor.fetchone()
+                if row is None:
+                    conn.commit()
+                    return None
+                cursor.execute("""
+                    UPDATE webhook_eventos
+                    SET status = 'processando', bloqueado_em = NOW(), tentativas = tentativas + 1
+                    WHERE id = %s
+                """, (row[0],))
+            conn.commit()
+            return row[0], row[1], json.loads(row[2]), row[3] + 1, row[4]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def complete_webhook_event(self, event_id):
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE webhook_eventos
+                    SET status = 'concluido', processado_em = NOW(), bloqueado_em = NULL, ultimo_erro = NULL
+                    WHERE id = %s
+                """, (event_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fail_webhook_event(self, event_id, erro, retry_in=None):
+        """ Schedules a retry in retry_in seconds, or moves the event to 'morto' when retry_in is None """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                if retry_in is None:
+                    cursor.execute("""
+                        UPDATE webhook_eventos
+                        SET status = 'morto', processado_em = NOW(), bloqueado_em = NULL, ultimo_erro = %s
+                        WHERE id = %s
+                    """, (erro, event_id))
+                else:
+                    cursor.execute("""
+                        UPDATE webhook_eventos
+                        SET status = 'pendente', proxima_tentativa = NOW() + INTERVAL %s SECOND,
+                            bloqueado_em = NULL, ultimo_erro = %s
+                        WHERE id = %s
+                    """, (int(retry_in), erro, event_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def requeue_dead_webhook_events(self):
+        """ Puts every 'morto' event back in the queue (admin action after fixing the cause) """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE webhook_eventos
+                    SET status = 'pendente', tentativas = 0, proxima_tentativa = NOW()
+                    WHERE status = 'morto'
+                """)
+                count = cursor.rowcount
+            conn.commit()
+            return count
+        finally:
+            conn.close()
+
+    def purge_webhook_history(self, idempotency_days, events_days, batch_size=5000):
+        """
+        Retention: forgets idempotency keys not seen for idempotency_days and deletes
+        processed queue events older than events_days. Deletes in batches to keep locks short.
+        Returns (keys removed, events removed).
+        """
+        removed = [0, 0]
+        statements = [
+            ("DELETE FROM webhook_idempotencia WHERE ultimo_em < NOW() - INTERVAL %s DAY LIMIT %s", idempotency_days),
+            ("DELETE FROM webhook_eventos WHERE status = 'concluido' AND processado_em < NOW() - INTERVAL %s DAY LIMIT %s", events_days),
+        ]
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                for n, (query, days) in enumerate(statements):
+                    while True:
+                        deleted = cursor.execute(query, (int(days), batch_size))
+                        conn.commit()
+                        removed[n] += deleted
+                        if deleted < batch_size:
+                            break
+            return tuple(removed)
+        finally:
+            conn.close()
+
+    def get_webhook_duplicate_stats(self, hours=24):
+        """ Distinct deliveries and redeliveries of keys seen in the last `hours` """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*), COALESCE(SUM(duplicatas), 0) FROM webhook_idempotencia
+                    WHERE ultimo_em >= NOW() - INTERVAL %s HOUR
+                """, (int(hours),))
+                unicos, duplicatas = cursor.fetchone()
+            unicos, duplicatas = int(unicos), int(duplicatas)
+            total = unicos + duplicatas
+            return {
+                "horas": hours,
+                "unicos": unicos,
+                "duplicatas": duplicatas,
+                "taxa_duplicatas": round(duplicatas / total, 4) if total else 0.0
+            }
+        finally:
+            conn.close()
+
+    # --- Pix sweeps ASAAS -> Inter (sweep.py) ---
+
+    @invalidates("varreduras")
+    def record_sweep_payment(self, payment_id, valor_liquido, data_pagamento=None, cpf_cliente=None):
+        """ Registers a received payment for the next sweep (ignored if already registered) """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT IGNORE INTO varredura_pagamentos (payment_id, valor_liquido, data_pagamento, cpf_cliente)
+                    VALUES (%s, %s, %s, %s)
+                """, (payment_id, valor_liquido, data_pagamento or None, cpf_cliente))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_pending_sweep_payments(self):
+        """ (payment_id, valor_liquido, data_pagamento, cpf_cliente) not covered by any sweep yet """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT payment_id, valor_liquido, data_pagamento, cpf_cliente
+                    FROM varredura_pagamentos WHERE varredura_id IS NULL
+                    ORDER BY recebido_em
+                """)
+                return cursor.fetchall()
+        finally:
+            conn.close()
+
+    @invalidates("varreduras")
+    def create_sweep(self, valor, origem, payment_ids):
+        """ Creates a sweep and assigns the given pending payments to it. Returns the sweep id. """
+        conn = self.get_connection()
+        try:
+            conn.begin()
+            with conn.cursor() as cursor:
+                cursor.execute("INSERT INTO varreduras (valor, origem) VALUES (%s, %s)", (valor, origem))
+                sweep_id = cursor.lastrowid
+                if payment_ids:
+                    cursor.execute(f"""
+                        UPDATE varredura_pagamentos SET varredura_id = %s
+                        WHERE varredura_id IS NULL AND payment_id IN ({', '.join(['%s'] * len(payment_ids))})
+                    """, (sweep_id, *payment_ids))
+            conn.commit()
+            return sweep_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @invalidates("varreduras", "transacoes")
+    def finish_sweep(self, sweep_id, transfer_id):
+        """
+        Marks the sweep as done and writes each covered payment to the ledger as 'entrada_liquida',
+        in one transaction: either every payment reaches transacoes or the sweep stays open.
+        Payments without a payment date are booked on the day they were received. Returns the payment count.
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT valor_liquido, COALESCE(data_pagamento, DATE(recebido_em)), cpf_cliente
+                    FROM varredura_pagamentos WHERE varredura_id = %s
+                """, (sweep_id,))
+                pagamentos = cursor.fetchall()
+            ledger = [
+                ("ASAAS", "entrada_liquida", valor, data, "pago", cpf, self.get_active_moto_for_cpf(cpf, data))
+                for valor, data, cpf in pagamentos
+            ]
+
+            conn.begin()
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE varreduras SET status = 'concluida', transfer_id = %s, erro = NULL, concluido_em = NOW()
+                    WHERE id = %s
+                """, (transfer_id, sweep_id))
+                if ledger:
+                    cursor.executemany("""
+                        INSERT INTO transacoes (origem, tipo, valor, data, status, cpf_cliente, placa_moto)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, ledger)
+            conn.commit()
+            return len(ledger)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @invalidates("varreduras")
+    def mark_sweep_transferred(self, sweep_id, transfer_id, erro):
+        """ The Pix went out but finish_sweep failed: keeps the payments assigned so only the ledger is retried """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE varreduras SET status = 'transferida', transfer_id = %s, erro = %s
+                    WHERE id = %s
+                """, (transfer_id, erro, sweep_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_transferred_sweeps(self):
+        """ (id, transfer_id) of sweeps whose transfer succeeded but whose ledger entries are still missing """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, transfer_id FROM varreduras WHERE status = 'transferida' ORDER BY id")
+                return cursor.fetchall()
+        finally:
+            conn.close()
+
+    @invalidates("varreduras")
+    def fail_sweep(self, sweep_id, erro):
+        """ Marks the sweep as failed and hands its payments back to the next one """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE varreduras SET status = 'falha', erro = %s, concluido_em = NOW() WHERE id = %s", (erro, sweep_id))
+                cursor.execute("UPDATE varredura_pagamentos SET varredura_id = NULL WHERE varredura_id = %s", (sweep_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_recent_sweeps(self, limit=10):
+        """ (id, valor, status, origem, qtd pagamentos, criado_em, erro), newest first """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT v.id, v.valor, v.status, v.origem, COUNT(p.payment_id), v.criado_em, v.erro
+                    FROM varreduras v
+                    LEFT JOIN varredura_pagamentos p ON p.varredura_id = v.id
+                    GROUP BY v.id, v.valor, v.status, v.origem, v.criado_em, v.erro
+                    ORDER BY v.id DESC
+                    LIMIT %s
+                """, (int(limit),))
+                return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def get_webhook_queue_stats(self):
+        """ Event count per status, e.g. {'pendente': 3, 'concluido': 120, 'morto': 1} """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT status, COUNT(*) FROM webhook_eventos GROUP BY status")
+                return {row[0]: row[1] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
     def get_locatarios_list(self):
         conn = self.get_connection()
         try:
@@ -582,12 +1404,113 @@ class DatabaseManager:
         finally:
             conn.close()
 
-    def get_locatario_file(self, locatario_id):
+    def get_locatario_document(self, locatario_id):
+        """ Metadata (sha256, name, type) of the locatario's CNH file """
         conn = self.get_connection()
         try:
             with conn.cursor() as cursor:
-                query = "SELECT cnh_file, cnh_name, cnh_type FROM locatarios WHERE id = %s"
+                query = "SELECT cnh_sha256, cnh_name, cnh_type FROM locatarios WHERE id = %s"
                 cursor.execute(query, (locatario_id,))
                 return cursor.fetchone()
         finally:
             conn.close()
+
+    def get_locatario_file(self, locatario_id):
+        meta = self.get_locatario_document(locatario_id)
+        if not meta or not meta[0]:
+            return None
+        return (self.read_document(meta[0]), meta[1], meta[2])
+
+    # --- Documentos (content-addressed file store) ---
+    def store_document(self, file_data, content_type=None, cursor=None, generate_variants=True):
+        """
+        Saves bytes (or a binary file-like object) to the document store and records its metadata row.
+        Returns the SHA-256 key, or None when there is no file. Identical files are stored once.
+        Images (and PDFs, when pypdfium2 is installed) get WebP thumbnail/preview variants built in the background.
+        """
+        if file_data is None:
+            return None
+        sha256, size = get_document_store().put_stream(iter_file_chunks(file_data))
+        query = """
+            INSERT INTO documentos (sha256, tamanho, content_type)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE sha256 = sha256
+        """
+        if cursor is not None:
+            cursor.execute(query, (sha256, size, content_type))
+        else:
+            conn = self.get_connection()
+            try:
+                with conn.cursor() as own_cursor:
+                    own_cursor.execute(query, (sha256, size, content_type))
+            finally:
+                conn.close()
+
+        if generate_variants:
+            from image_pipeline import schedule_previews
+            schedule_previews(sha256, content_type)
+        return sha256
+
+    def add_document_variant(self, sha256, variante, variante_sha256):
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO documento_variantes (sha256, variante, variante_sha256)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE variante_sha256 = VALUES(variante_sha256)
+                """, (sha256, variante, variante_sha256))
+            return True
+        finally:
+            conn.close()
+
+    def get_document_variants(self, sha256_list):
+        """ {sha256: {variante: variante_sha256}} for the given documents, in one query """
+        sha256_list = [sha for sha in sha256_list if sha]
+        if not sha256_list:
+            return {}
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                placeholders = ", ".join(["%s"] * len(sha256_list))
+                cursor.execute(
+                    f"SELECT sha256, variante, variante_sha256 FROM documento_variantes WHERE sha256 IN ({placeholders})",
+                    tuple(sha256_list)
+                )
+                variants = {}
+                for sha256, variante, variante_sha256 in cursor.fetchall():
+                    variants.setdefault(sha256, {})[variante] = variante_sha256
+                return variants
+        finally:
+            conn.close()
+
+    def get_documents_without_variants(self, variantes):
+        """ Source documents (sha256, content_type) still missing any of the given variants """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT d.sha256, d.content_type
+                    FROM documentos d
+                    LEFT JOIN documento_variantes v ON v.sha256 = d.sha256
+                    WHERE d.sha256 NOT IN (SELECT variante_sha256 FROM documento_variantes)
+                    GROUP BY d.sha256, d.content_type
+                    HAVING COUNT(v.variante) < %s
+                """, (len(variantes),))
+                return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def get_document_meta(self, sha256):
+        """ (sha256, tamanho, content_type, created_at) or None """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT sha256, tamanho, content_type, created_at FROM documentos WHERE sha256 = %s", (sha256,))
+                return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def read_document(self, sha256):
+        """ Whole file as bytes. Prefer get_document_store().iter_chunks() for large files. """
+        return b"".join(get_document_store().iter_chunks(sha256))
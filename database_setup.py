@@ -47,8 +47,9 @@ def main():
         id INT AUTO_INCREMENT PRIMARY KEY,
         cpf_cliente VARCHAR(50) NOT NULL,
         placa_moto VARCHAR(50) NOT NULL,
-        data_inicio VARCHAR(50) NOT NULL,
-        data_fim VARCHAR(50),
+        data_inicio DATE NOT NULL,
+        data_fim DATE,
+        INDEX idx_locacoes_cpf_inicio (cpf_cliente, data_inicio),
         FOREIGN KEY (placa_moto) REFERENCES motos (placa) ON DELETE CASCADE
     );"""
 
@@ -57,10 +58,14 @@ def main():
         id INT AUTO_INCREMENT PRIMARY KEY,
         origem ENUM('ASAAS', 'VISIUN', 'ASAAS_LUCRO', 'OUTROS') NOT NULL,
         tipo ENUM('entrada', 'saida', 'entrada_liquida') NOT NULL,
-        valor FLOAT NOT NULL,
-        data VARCHAR(50) NOT NULL,
+        valor DECIMAL(12,2) NOT NULL,
+        data DATE NOT NULL,
+        status ENUM('pago', 'pendente') DEFAULT 'pago',
         cpf_cliente VARCHAR(50),
         placa_moto VARCHAR(50),
+        INDEX idx_transacoes_data_tipo_status (data, tipo, status),
+        INDEX idx_transacoes_cpf_data (cpf_cliente, data),
+        INDEX idx_transacoes_placa_data (placa_moto, data),
         FOREIGN KEY (placa_moto) REFERENCES motos (placa) ON DELETE SET NULL
     );"""
 
@@ -85,6 +90,14 @@ def main():
         status VARCHAR(20) NOT NULL
     );"""
 
+    sql_create_documentos_table = """
+    CREATE TABLE IF NOT EXISTS documentos (
+        sha256 CHAR(64) PRIMARY KEY,
+        tamanho BIGINT NOT NULL,
+        content_type VARCHAR(100),
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );"""
+
     conn = create_connection()
     if conn is not None:
         create_table(conn, sql_create_motos_table)
@@ -92,6 +105,7 @@ def main():
         create_table(conn, sql_create_transacoes_table)
         create_table(conn, sql_create_usuarios_table)
         create_table(conn, sql_create_envios_contador_table)
+        create_table(conn, sql_create_documentos_table)
         print("MySQL Database tables initialized successfully.")
         conn.close()
     else:
@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+from collections import deque
+
+import pymysql
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_HOST = os.getenv("DB_HOST")
+DB_USER = os.getenv("DB_USER")
+DB_PASS = os.getenv("DB_PASS")
+DB_NAME = os.getenv("DB_NAME")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_MAX_IDLE = int(os.getenv("DB_POOL_MAX_IDLE", "300"))  # seconds
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "15"))  # seconds waiting for a free slot
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """
+    Thin proxy around a pymysql connection.
+    close() hands the connection back to the pool instead of closing the socket,
+    so every existing `finally: conn.close()` in DatabaseManager keeps working.
+    """
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            self._pool._release(self._raw)
+            self._raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections.
+
+    - At most `max_size` connections are open at once; callers wait up to `timeout` for a free one.
+    - Connections are pinged on checkout and transparently reconnected if the server dropped them.
+    - Connections idle for longer than `max_idle` seconds are closed instead of reused.
+    - A thread that already holds a connection gets the same one back (nested calls such as
+      add_transaction -> get_active_moto_for_cpf never hold two slots).
+    """
+    def __init__(self, max_size=DB_POOL_SIZE, max_idle=DB_POOL_MAX_IDLE, timeout=DB_POOL_TIMEOUT, **connect_kwargs):
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = deque()  # (raw_conn, released_at)
+        self._open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "reconnects": 0,
+            "created": 0,
+            "evicted": 0,
+        }
+
+    # --- Public API ---
+    def get_connection(self):
+        borrowed = getattr(self._local, "borrowed", None)
+        if borrowed is not None:
+            self._local.depth += 1
+            with self._cond:
+                self._stats["checkouts"] += 1
+            return PooledConnection(self, borrowed)
+
+        raw = self._checkout()
+        self._local.borrowed = raw
+        self._local.depth = 1
+        return PooledConnection(self, raw)
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data["open"] = self._open
+            data["idle"] = len(self._idle)
+            data["max_size"] = self.max_size
+            return data
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                raw, _ = self._idle.popleft()
+                self._close_raw(raw)
+            self._cond.notify_all()
+
+    # --- Internals ---
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    raw, _ = self._idle.pop()  # LIFO keeps the warmest connection in use
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    raw = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s (pool size {self.max_size}).")
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            self._stats["checkouts"] += 1
+
+        if raw is None:
+            try:
+                return self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+
+        try:
+            raw.ping(reconnect=False)
+        except Exception:
+            self._close_raw(raw)
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["reconnects"] += 1
+        return raw
+
+    def _release(self, raw):
+        depth = getattr(self._local, "depth", 0)
+        if getattr(self._local, "borrowed", None) is raw and depth > 1:
+            self._local.depth = depth - 1
+            return
+
+        self._local.borrowed = None
+        self._local.depth = 0
+        with self._cond:
+            if raw.open:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+    def _evict_idle(self):
+        # Called with the lock held; the oldest entries sit on the left of the deque
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            raw, _ = self._idle.popleft()
+            self._close_raw(raw)
+            self._open -= 1
+            self._stats["evicted"] += 1
+
+    def _connect(self):
+        raw = pymysql.connect(**self.connect_kwargs)
+        with self._cond:
+            self._stats["created"] += 1
+        return raw
+
+    @staticmethod
+    def _close_raw(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool shared by the Streamlit app and the webhook server."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    host=DB_HOST,
+                    user=DB_USER,
+                    password=DB_PASS,
+                    database=DB_NAME,
+                    charset='utf8mb4',
+                    connect_timeout=10,
+                    autocommit=True
+                )
+    return _pool
@@ -0,0 +1,198 @@
+import os
+import hmac
+import time
+import hashlib
+import tempfile
+import threading
+from urllib.parse import urlencode
+from dotenv import load_dotenv
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # Only needed when DOCS_STORAGE=s3
+    boto3 = None
+    ClientError = Exception
+
+load_dotenv()
+
+DOCS_STORAGE = os.getenv("DOCS_STORAGE", "local")  # "local" or "s3"
+DOCS_LOCAL_DIR = os.getenv("DOCS_LOCAL_DIR", "documentos")
+DOCS_S3_BUCKET = os.getenv("DOCS_S3_BUCKET")
+DOCS_S3_ENDPOINT = os.getenv("DOCS_S3_ENDPOINT")  # e.g. MinIO / R2 / Wasabi; empty for AWS
+DOCS_S3_PREFIX = os.getenv("DOCS_S3_PREFIX", "documentos/")
+
+# Signed download links served by the webhook_server Flask app
+DOCS_BASE_URL = os.getenv("DOCS_BASE_URL", "http://localhost:5001")
+DOCS_SIGNING_KEY = os.getenv("DOCS_SIGNING_KEY", "")
+DOCS_URL_TTL = int(os.getenv("DOCS_URL_TTL", "900"))  # seconds
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def iter_file_chunks(data, chunk_size=CHUNK_SIZE):
+    """ Yields chunks from bytes or a binary file-like object (e.g. a Streamlit UploadedFile) """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        for pos in range(0, len(data), chunk_size):
+            yield bytes(data[pos:pos + chunk_size])
+        return
+    while True:
+        chunk = data.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class LocalDocumentStore:
+    """
+    Stores files on local disk, keyed by their SHA-256.
+    Layout: <root>/ab/cd/abcd... so no single directory grows too large.
+    Identical files are written once.
+    """
+    def __init__(self, root=DOCS_LOCAL_DIR):
+        self.root = root
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+    def _path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256):
+        return os.path.exists(self._path(sha256))
+
+    def put_stream(self, chunks):
+        """ Writes chunks to the store. Returns (sha256, size). """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+            sha256 = digest.hexdigest()
+            final_path = self._path(sha256)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return sha256, size
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def size(self, sha256):
+        return os.path.getsize(self._path(sha256))
+
+    def iter_chunks(self, sha256, start=0, end=None, chunk_size=CHUNK_SIZE):
+        """ Yields the bytes in [start, end] (inclusive, like HTTP ranges) """
+        with open(self._path(sha256), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, sha256):
+        if self.exists(sha256):
+            os.remove(self._path(sha256))
+
+
+class S3DocumentStore:
+    """
+    Same interface as LocalDocumentStore, backed by any S3-compatible bucket.
+    Uploads are spooled to a temp file first because the key (the hash) is only known at the end.
+    """
+    def __init__(self, bucket=DOCS_S3_BUCKET, endpoint_url=DOCS_S3_ENDPOINT, prefix=DOCS_S3_PREFIX):
+        if boto3 is None:
+            raise ImportError("boto3 is required for DOCS_STORAGE=s3. Install it with `pip install boto3`.")
+        if not bucket:
+            raise ValueError("DOCS_S3_BUCKET is not defined in the .env file.")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+
+    def _key(self, sha256):
+        return f"{self.prefix}{sha256[:2]}/{sha256}"
+
+    def exists(self, sha256):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(sha256))
+            return True
+        except ClientError:
+            return False
+
+    def put_stream(self, chunks):
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.SpooledTemporaryFile(max_size=8 * CHUNK_SIZE) as tmp:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                tmp.write(chunk)
+            sha256 = digest.hexdigest()
+            if not self.exists(sha256):
+                tmp.seek(0)
+                self.client.upload_fileobj(tmp, self.bucket, self._key(sha256))
+        return sha256, size
+
+    def size(self, sha256):
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(sha256))["ContentLength"]
+
+    def iter_chunks(self, sha256, start=0, end=None, chunk_size=CHUNK_SIZE):
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        obj = self.client.get_object(Bucket=self.bucket, Key=self._key(sha256), Range=byte_range)
+        for chunk in obj["Body"].iter_chunks(chunk_size):
+            yield chunk
+
+    def delete(self, sha256):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(sha256))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store():
+    """ Process-wide store selected by DOCS_STORAGE """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = S3DocumentStore() if DOCS_STORAGE == "s3" else LocalDocumentStore()
+    return _store
+
+
+# --- Signed download URLs ---
+
+def _signature(sha256, expires, nome=None):
+    if not DOCS_SIGNING_KEY:
+        raise ValueError("DOCS_SIGNING_KEY is not defined in the .env file.")
+    # The download name is signed too, so a link cannot be edited to serve the file under another name
+    message = f"{sha256}:{expires}:{nome or ''}".encode()
+    return hmac.new(DOCS_SIGNING_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def sign_document_url(sha256, nome=None, ttl=DOCS_URL_TTL):
+    """ Short-lived link to /documentos/<sha256> that the download route accepts without a session """
+    expires = int(time.time()) + ttl
+    params = {"exp": expires, "sig": _signature(sha256, expires, nome)}
+    if nome:
+        params["nome"] = nome
+    return f"{DOCS_BASE_URL.rstrip('/')}/documentos/{sha256}?{urlencode(params)}"
+
+
+def verify_document_signature(sha256, expires, signature, nome=None):
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time() or not signature:
+        return False
+    return hmac.compare_digest(_signature(sha256, expires, nome), signature)
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
-from database_manager import DatabaseManager
-import base64
+from ui_cache import CachedDatabase
+from document_store import sign_document_url
 import datetime
 
 def format_currency(value):
@@ -10,13 +10,157 @@ def format_currency(value):
     except (ValueError, TypeError):
         return "R$ 0,00"
 
+MOTOS_PAGE_SIZE = 20
+
+def paginate(items, key, page_size=MOTOS_PAGE_SIZE):
+    """ Slice of `items` for the page chosen in a selector that is only shown when there is more than one page """
+    pages = max(1, -(-len(items) // page_size))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, value=1, step=1, key=f"page_{key}")
+    return items[(page - 1) * page_size:page * page_size]
+
+def render_document_preview(db, sha256, file_name, file_type):
+    """
+    Shows a stored document through signed links to the document route.
+    Uses the compressed WebP preview when the image pipeline has built one, so the page only ships kilobytes.
+    """
+    variants = db.get_document_variants([sha256]).get(sha256, {})
+    st.link_button("⬇️ Abrir original", sign_document_url(sha256, nome=file_name))
+    if variants.get("preview"):
+        st.markdown(f'<img src="{sign_document_url(variants["preview"])}" width="100%" />', unsafe_allow_html=True)
+    elif 'pdf' in (file_type or ''):
+        url = sign_document_url(sha256, nome=file_name)
+        st.markdown(f'<iframe src="{url}" width="100%" height="600" type="application/pdf"></iframe>', unsafe_allow_html=True)
+    else:
+        st.markdown(f'<img src="{sign_document_url(sha256, nome=file_name)}" width="100%" />', unsafe_allow_html=True)
+
+def render_moto_detail(db, placa, locatarios, all_statuses):
+    """ Full panel of one moto; only rendered for the moto selected in the list """
+    details = db.get_moto_details(placa)
+    if not details:
+        st.warning(f"Moto {placa} não encontrada.")
+        return
+    (d_placa, d_modelo, d_data, d_valor, d_despesas, d_manut, d_rev, d_oleo, d_disp, d_loc, 
+     d_docn, d_doct, d_ipvan, d_ipvat, d_crlvn, d_crlvt, d_odometro,
+     d_docsha, d_ipvasha, d_crlvsha) = details
+
+    # Rápida mudança de status
+    new_status = st.selectbox(
+        "Status Atual", 
+        options=all_statuses, 
+        index=all_statuses.index(d_disp) if d_disp in all_statuses else 0,
+        key=f"status_sel_{d_placa}"
+    )
+    if new_status != d_disp:
+        if st.button("💾 Salvar Status", key=f"save_status_{d_placa}", type="primary"):
+            if db.update_moto_status(d_placa, new_status):
+                st.success("Status atualizado!")
+                st.rerun()
+            else:
+                st.error("Erro ao atualizar status.")
+
+    st.write("---")
+    # Criação das Abas
+    aba_dados, aba_manutencao, aba_oleo, aba_valores = st.tabs([
+        "📝 Dados", 
+        "🔧 Manutenção", 
+        "🛢️ Óleo", 
+        "💰 Valores"
+    ])
+
+    with aba_dados:
+        st.markdown(f"**Data da Compra:** {d_data}")
+
+        st.markdown("##### 🤝 Atribuição de Locatário")
+        lista_nomes = ["Nenhum"] + [loc[1] for loc in locatarios]
+
+        try:
+            idx_loc = lista_nomes.index(d_loc) if d_loc in lista_nomes else 0
+        except:
+            idx_loc = 0
+
+        with st.form(f"atribuir_loc_{d_placa}"):
+            novo_loc = st.selectbox("Selecionar Locatário", options=lista_nomes, index=idx_loc)
+            save_atrib = st.form_submit_button("Salvar Atribuição")
+
+            if save_atrib:
+                loc_nome = None if novo_loc == "Nenhum" else novo_loc
+                if db.sync_moto_association(d_placa, loc_nome):
+                    st.success(f"Moto {d_placa} vinculada a {novo_loc}!")
+                    st.rerun()
+                else:
+                    st.error("Erro ao vincular.")
+
+        st.write("---")
+        with st.form(f"form_update_odometro_{d_placa}"):
+            new_odo = st.number_input("Odômetro / KM", min_value=0.0, value=float(d_odometro or 0.0), step=100.0)
+            btn_odo = st.form_submit_button("Salvar KM")
+            if btn_odo:
+                if db.update_moto_odometer(d_placa, new_odo):
+                    st.success(f"KM atualizado para {new_odo}!")
+                    st.rerun()
+                else:
+                    st.error("Erro ao atualizar quilometragem.")
+
+        st.write("### Arquivos")
+        fc1, fc2, fc3 = st.columns(3)
+
+        # Thumbnails for the three files in a single query
+        thumbs = db.get_document_variants([d_docsha, d_ipvasha, d_crlvsha])
+
+        def render_file_btn(col, title, prefix, file_name, file_type, file_sha):
+            if file_name:
+                col.write(f"**{title}**: \n{file_name}")
+                thumb_sha = thumbs.get(file_sha, {}).get("thumb")
+                if thumb_sha:
+                    col.image(sign_document_url(thumb_sha), use_container_width=True)
+                if col.button(f"🔎 Ver", key=f"view_{prefix}_{d_placa}", use_container_width=True):
+                    doc_meta = db.get_moto_document(d_placa, prefix)
+                    if doc_meta and doc_meta[0]:
+                        render_document_preview(db, doc_meta[0], file_name, file_type)
+                    else:
+                        st.error("Arquivo não encontrado.")
+            else:
+                col.write(f"**{title}**:\nFalta")
+
+        render_file_btn(fc1, "Doc", "doc", d_docn, d_doct, d_docsha)
+        render_file_btn(fc2, "IPVA", "ipva", d_ipvan, d_ipvat, d_ipvasha)
+        render_file_btn(fc3, "CRLV", "crlv", d_crlvn, d_crlvt, d_crlvsha)
+
+    with aba_manutencao:
+        st.markdown("**Anotações de Manutenção:**")
+        st.info(d_manut if d_manut else "Nenhuma anotação")
+        st.markdown("**Datas de Revisão:**")
+        st.warning(d_rev if d_rev else "Nenhuma anotação")
+
+    with aba_oleo:
+        st.info(d_oleo if d_oleo else "Nenhuma anotação de troca de óleo cadastrada.")
+
+    with aba_valores:
+        valor_orig = float(d_valor or 0)
+        data_compra = pd.to_datetime(d_data)
+        hoje_dt = pd.to_datetime(datetime.date.today())
+        dias_uso = (hoje_dt - data_compra).days if pd.notnull(data_compra) else 0
+        meses_uso = max(0, dias_uso // 30)
+        taxa_depreciacao = min(0.99, (meses_uso * 0.01)) 
+        valor_depreciado = valor_orig - (valor_orig * taxa_depreciacao)
+        km_display = float(d_odometro or 0.0)
+
+        st.markdown(f"**Valor de Compra:** {format_currency(valor_orig)}")
+        st.markdown(f"**Despesas:**\n{d_despesas if d_despesas else 'Nenhuma'}")
+        st.metric("Odômetro", f"{km_display:,.0f} km".replace(",", "."))
+        st.metric("Valor após Depreciação", format_currency(valor_depreciado), delta=f"-{taxa_depreciacao*100:.0f}% Comercial", delta_color="inverse")
+
 def frota_tab():
     st.header("Gestão de Frota (Motos)")
-    db = DatabaseManager()
+    db = CachedDatabase()
 
     st.markdown("---")
     
+    # The two list queries of the page; moto details are fetched only for the selected one
     motos_list = db.get_motos_list()
+    locatarios = db.get_locatarios_list()
     if not motos_list:
         st.info("Nenhuma moto cadastrada.")
     else:
@@ -31,144 +175,42 @@ def frota_tab():
         
         col_alugadas, col_disponiveis, col_indisponiveis = st.columns(3)
         
-        def render_moto_card(m, col_container):
-            p_placa, p_modelo, p_disp, p_loc, p_valor, p_odometro = m
-            loc_label = f"👤 {p_loc}" if p_loc else "Sem piloto"
-            
-            with col_container:
-                with st.expander(f"🏍️ {p_placa} — {p_modelo}\n{loc_label}"):
-                    # Rápida mudança de status
-                    new_status = st.selectbox(
-                        "Status Atual", 
-                        options=all_statuses, 
-                        index=all_statuses.index(p_disp) if p_disp in all_statuses else 0,
-                        key=f"status_sel_{p_placa}"
-                    )
-                    if new_status != p_disp:
-                        if st.button("💾 Salvar Status", key=f"save_status_{p_placa}", type="primary"):
-                            if db.update_moto_status(p_placa, new_status):
-                                st.success("Status atualizado!")
-                                st.rerun()
-                            else:
-                                st.error("Erro ao atualizar status.")
-                                
-                    st.write("---")
-                    details = db.get_moto_details(p_placa)
-                    if details:
-                         (d_placa, d_modelo, d_data, d_valor, d_despesas, d_manut, d_rev, d_oleo, d_disp, d_loc, 
-                          d_docn, d_doct, d_ipvan, d_ipvat, d_crlvn, d_crlvt, d_odometro) = details
-                         
-                         # Criação das Abas
-                         aba_dados, aba_manutencao, aba_oleo, aba_valores = st.tabs([
-                             "📝 Dados", 
-                             "🔧 Manutenção", 
-                             "🛢️ Óleo", 
-                             "💰 Valores"
-                         ])
-                         
-                         with aba_dados:
-                             st.markdown(f"**Data da Compra:** {d_data}")
-                             
-                             st.markdown("##### 🤝 Atribuição de Locatário")
-                             locatarios = db.get_locatarios_list() 
-                             lista_nomes = ["Nenhum"] + [loc[1] for loc in locatarios]
-                             
-                             try:
-                                 idx_loc = lista_nomes.index(d_loc) if d_loc in lista_nomes else 0
-                             except:
-                                 idx_loc = 0
-                                 
-                             with st.form(f"atribuir_loc_{d_placa}"):
-                                 novo_loc = st.selectbox("Selecionar Locatário", options=lista_nomes, index=idx_loc)
-                                 save_atrib = st.form_submit_button("Salvar Atribuição")
-                                 
-                                 if save_atrib:
-                                     loc_nome = None if novo_loc == "Nenhum" else novo_loc
-                                     if db.sync_moto_association(d_placa, loc_nome):
-                                         st.success(f"Moto {d_placa} vinculada a {novo_loc}!")
-                                         st.rerun()
-                                     else:
-                                         st.error("Erro ao vincular.")
-    
-                             st.write("---")
-                             with st.form(f"form_update_odometro_{d_placa}"):
-                                 new_odo = st.number_input("Odômetro / KM", min_value=0.0, value=float(d_odometro or 0.0), step=100.0)
-                                 btn_odo = st.form_submit_button("Salvar KM")
-                                 if btn_odo:
-                                     if db.update_moto_odometer(d_placa, new_odo):
-                                         st.success(f"KM atualizado para {new_odo}!")
-                                         st.rerun()
-                                     else:
-                                         st.error("Erro ao atualizar quilometragem.")
-                             
-                             st.write("### Arquivos")
-                             fc1, fc2, fc3 = st.columns(3)
-                             
-                             def render_file_btn(col, title, prefix, file_name, file_type):
-                                 if file_name:
-                                     col.write(f"**{title}**: \n{file_name}")
-                                     if col.button(f"🔎 Ver", key=f"view_{prefix}_{d_placa}", use_container_width=True):
-                                         file_data = db.get_moto_file(d_placa, prefix)
-                                         raw_bytes = file_data[0]
-                                         b64 = base64.b64encode(raw_bytes).decode()
-                                         if 'pdf' in file_type:
-                                             href = f'<iframe src="data:application/pdf;base64,{b64}" width="100%" height="600" type="application/pdf"></iframe>'
-                                             st.markdown(href, unsafe_allow_html=True)
-                                         else:
-                                             href = f'<img src="data:{file_type};base64,{b64}" width="100%" />'
-                                             st.markdown(href, unsafe_allow_html=True)
-                                 else:
-                                     col.write(f"**{title}**:\nFalta")
-    
-                             render_file_btn(fc1, "Doc", "doc", d_docn, d_doct)
-                             render_file_btn(fc2, "IPVA", "ipva", d_ipvan, d_ipvat)
-                             render_file_btn(fc3, "CRLV", "crlv", d_crlvn, d_crlvt)
-                         
-                         with aba_manutencao:
-                             st.markdown("**Anotações de Manutenção:**")
-                             st.info(d_manut if d_manut else "Nenhuma anotação")
-                             st.markdown("**Datas de Revisão:**")
-                             st.warning(d_rev if d_rev else "Nenhuma anotação")
-                         
-                         with aba_oleo:
-                             st.info(d_oleo if d_oleo else "Nenhuma anotação de troca de óleo cadastrada.")
-                             
-                         with aba_valores:
-                             valor_orig = float(d_valor or 0)
-                             data_compra = pd.to_datetime(d_data)
-                             hoje_dt = pd.to_datetime(datetime.date.today())
-                             dias_uso = (hoje_dt - data_compra).days if pd.notnull(data_compra) else 0
-                             meses_uso = max(0, dias_uso // 30)
-                             taxa_depreciacao = min(0.99, (meses_uso * 0.01)) 
-                             valor_depreciado = valor_orig - (valor_orig * taxa_depreciacao)
-                             km_display = float(d_odometro or 0.0)
-                             
-                             st.markdown(f"**Valor de Compra:** {format_currency(valor_orig)}")
-                             st.markdown(f"**Despesas:**\n{d_despesas if d_despesas else 'Nenhuma'}")
-                             st.metric("Odômetro", f"{km_display:,.0f} km".replace(",", "."))
-                             st.metric("Valor após Depreciação", format_currency(valor_depreciado), delta=f"-{taxa_depreciacao*100:.0f}% Comercial", delta_color="inverse")
+        def render_moto_list(motos, key):
+            # Compact, paginated rows; details are loaded only for the selected moto
+            for p_placa, p_modelo, p_disp, p_loc, p_valor, p_odometro in paginate(motos, key):
+                loc_label = f"👤 {p_loc}" if p_loc else "Sem piloto"
+                if st.button(f"🏍️ {p_placa} — {p_modelo}\n{loc_label}", key=f"sel_moto_{p_placa}", use_container_width=True,
+                             type="primary" if st.session_state.get("moto_selecionada") == p_placa else "secondary"):
+                    st.session_state.moto_selecionada = p_placa
 
         # Render each categorized moto list in its respective column
         with col_alugadas:
             st.markdown("### 🟢 Alugadas")
             if not alugadas:
                 st.info("Nenhuma")
-            for m in alugadas:
-                render_moto_card(m, col_alugadas)
+            render_moto_list(alugadas, "alugadas")
 
         with col_disponiveis:
             st.markdown("### 🔵 Disponíveis")
             if not disponiveis:
                 st.info("Nenhuma")
-            for m in disponiveis:
-                render_moto_card(m, col_disponiveis)
+            render_moto_list(disponiveis, "disponiveis")
                 
         with col_indisponiveis:
             st.markdown("### 🔴 Indisponíveis / Oficina")
             if not indisponiveis:
                 st.info("Nenhuma")
-            for m in indisponiveis:
-                render_moto_card(m, col_indisponiveis)
+            render_moto_list(indisponiveis, "indisponiveis")
+
+        placa_sel = st.session_state.get("moto_selecionada")
+        if placa_sel:
+            st.markdown("---")
+            c_title, c_close = st.columns([4, 1])
+            c_title.subheader(f"🏍️ {placa_sel}")
+            if c_close.button("✖ Fechar", key="close_moto", use_container_width=True):
+                del st.session_state.moto_selecionada
+                st.rerun()
+            render_moto_detail(db, placa_sel, locatarios, all_statuses)
 
     st.markdown('---')
     # Form to Add Moto
@@ -183,8 +225,7 @@ def frota_tab():
                 data_compra = st.date_input("Data da Compra")
                 valor_compra = st.number_input("Valor da Moto (R$)", min_value=0.0, format="%.2f")
                 
-                locatarios_add = db.get_locatarios_list()
-                lista_add = ["Nenhum"] + [loc[1] for loc in locatarios_add]
+                lista_add = ["Nenhum"] + [loc[1] for loc in locatarios]
                 locatario_sel = st.selectbox("Locatário Atual (Opcional)", options=lista_add)
                 locatario = None if locatario_sel == "Nenhum" else locatario_sel
             with col3:
@@ -0,0 +1,27 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("WEBHOOK_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Threads let one worker stream /documentos downloads while still answering webhooks
+worker_class = "gthread"
+threads = int(os.getenv("WEBHOOK_THREADS", "4"))
+timeout = int(os.getenv("WEBHOOK_TIMEOUT", "60"))
+# Time a worker gets on shutdown to finish requests and in-flight webhook jobs
+graceful_timeout = int(os.getenv("WEBHOOK_GRACEFUL_TIMEOUT", "30"))
+accesslog = "-"
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    # Each HTTP worker also drains webhook_eventos; SKIP LOCKED keeps workers from taking the same event
+    from webhook_queue import get_worker_pool
+    get_worker_pool().start()
+
+
+def worker_exit(server, worker):
+    # Stop claiming new events and wait for the ones being processed
+    from webhook_queue import get_worker_pool
+    get_worker_pool().stop(timeout=graceful_timeout)
@@ -0,0 +1,77 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TimeoutSession(requests.Session):
+    """ requests.Session with a default (connect, read) timeout, so no call can hang forever """
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _retry_policy(retries, status_forcelist):
+    # Only idempotent methods are retried: a repeated POST could duplicate a Pix transfer
+    options = dict(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=0.5,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=0.5, **options)
+    except TypeError:  # urllib3 < 2 has no jitter option
+        return Retry(**options)
+
+
+def build_session(pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, status_forcelist=RETRY_STATUSES, cert=None):
+    """ Keep-alive session with a pooled HTTPAdapter, retry policy and default timeouts """
+    session = TimeoutSession()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=_retry_policy(retries, status_forcelist))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if cert:
+        session.cert = cert
+    return session
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(name, cert=None, **options):
+    """
+    Process-wide session per API (and client certificate), so TCP/TLS connections
+    are reused across client instances and Streamlit reruns.
+    """
+    key = (name, cert)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = build_session(cert=cert, **options)
+                _sessions[key] = session
+    return session
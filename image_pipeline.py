@@ -0,0 +1,117 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # PDF rasterization is optional
+    pdfium = None
+
+load_dotenv()
+
+IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", "2"))
+
+# variante -> (max side in px, WebP quality)
+VARIANTS = {
+    "thumb": (320, 70),
+    "preview": (1600, 80),
+}
+
+# Phone photos can be huge; _load_source_image refuses anything that would decode to more than ~80 MP.
+# Pillow itself only warns above MAX_IMAGE_PIXELS and raises above twice that.
+Image.MAX_IMAGE_PIXELS = 80_000_000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=IMAGE_PIPELINE_WORKERS, thread_name_prefix="image-pipeline")
+    return _executor
+
+
+def is_previewable(content_type):
+    content_type = (content_type or "").lower()
+    return content_type.startswith("image/") or ("pdf" in content_type and pdfium is not None)
+
+
+def _load_source_image(raw_bytes, content_type):
+    """ Opens an uploaded image, or renders page 1 of a PDF, as an RGB PIL image """
+    if "pdf" in (content_type or "").lower():
+        pdf = pdfium.PdfDocument(raw_bytes)
+        try:
+            page = pdf[0]
+            # Scale so the long side lands around the preview size
+            width, height = page.get_size()
+            scale = VARIANTS["preview"][0] / max(width, height, 1)
+            return page.render(scale=max(scale, 1.0)).to_pil().convert("RGB")
+        finally:
+            pdf.close()
+    img = Image.open(io.BytesIO(raw_bytes))
+    # open() only parses the header, so this check runs before any pixel is decoded
+    if img.width * img.height > Image.MAX_IMAGE_PIXELS:
+        raise Image.DecompressionBombError(
+            f"Image size ({img.width * img.height} pixels) exceeds limit of {Image.MAX_IMAGE_PIXELS} pixels")
+    img = ImageOps.exif_transpose(img)  # Respect phone camera orientation
+    return img.convert("RGB")
+
+
+def generate_previews(sha256, content_type):
+    """
+    Builds the WebP variants of a stored document and records them in documento_variantes.
+    Variants are themselves content-addressed documents, so they are served by the same /documentos route.
+    """
+    from database_manager import DatabaseManager
+
+    db = DatabaseManager()
+    existing = db.get_document_variants([sha256]).get(sha256, {})
+    missing = [name for name in VARIANTS if name not in existing]
+    if not missing or not is_previewable(content_type):
+        return
+
+    source = _load_source_image(db.read_document(sha256), content_type)
+    for name in missing:
+        max_side, quality = VARIANTS[name]
+        img = source.copy()
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+        variant_sha = db.store_document(buffer.getvalue(), "image/webp", generate_variants=False)
+        db.add_document_variant(sha256, name, variant_sha)
+
+
+def _run_safely(sha256, content_type):
+    try:
+        generate_previews(sha256, content_type)
+    except Exception as e:
+        print(f"[ImagePipeline] Could not build previews for {sha256}: {e}")
+
+
+def schedule_previews(sha256, content_type):
+    """ Queues preview generation in the background so uploads return immediately """
+    if sha256 and is_previewable(content_type):
+        return _get_executor().submit(_run_safely, sha256, content_type)
+    return None
+
+
+def backfill_previews():
+    """ Generates missing variants for documents uploaded before the pipeline existed """
+    from database_manager import DatabaseManager
+
+    db = DatabaseManager()
+    pending = db.get_documents_without_variants(list(VARIANTS))
+    print(f"[ImagePipeline] {len(pending)} documents without previews.")
+    for sha256, content_type in pending:
+        _run_safely(sha256, content_type)
+    print("[ImagePipeline] Backfill finished.")
+
+
+if __name__ == "__main__":
+    backfill_previews()
@@ -1,9 +1,35 @@
 import os
-import requests
+import json
+import time
+import hashlib
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from http_session import get_session
 
 load_dotenv()
 
+# Refresh the OAuth token this many seconds before it expires
+INTER_TOKEN_REFRESH_MARGIN = int(os.getenv("INTER_TOKEN_REFRESH_MARGIN", "120"))
+
+INTER_STATEMENT_WORKERS = int(os.getenv("INTER_STATEMENT_WORKERS", "4"))
+# Statements of months that are already over never change, so they are kept on disk
+INTER_STATEMENT_CACHE_DIR = os.getenv("INTER_STATEMENT_CACHE_DIR", "cache/inter_extrato")
+# ...once they are over for this many days: entries can still settle a few days after the month ends
+INTER_STATEMENT_SETTLE_DAYS = int(os.getenv("INTER_STATEMENT_SETTLE_DAYS", "5"))
+
+# Process-wide token cache: (client_id, scope) -> (access_token, expires_at)
+_token_cache = {}
+_token_locks = {}
+_token_locks_guard = threading.Lock()
+
+
+def _token_lock(key):
+    with _token_locks_guard:
+        return _token_locks.setdefault(key, threading.Lock())
+
+
 class InterClient:
     def __init__(self):
         # Base URL for Banco Inter API v2
@@ -22,9 +48,13 @@ class InterClient:
         # This requires Client ID and Client Secret, which the user should also add via UI if needed.
         self.client_id = os.getenv("INTER_CLIENT_ID")
         self.client_secret = os.getenv("INTER_CLIENT_SECRET")
+        self.scope = "extrato.read"
         
         self.access_token = None
 
+        # One keep-alive session per certificate pair: the mTLS handshake is paid once, not per request
+        self.session = get_session("inter", cert=(self.cert_path, self.key_path))
+
     def _check_certs(self):
         # If certificates don't exist in the file system but we have the raw string in ENV (Streamlit Cloud),
         # create them on the fly.
@@ -41,8 +71,32 @@ class InterClient:
         if not os.path.exists(self.cert_path) or not os.path.exists(self.key_path):
              raise FileNotFoundError("Inter Certificates not found at the specified paths. Check your Streamlit Secrets.")
 
-    def get_token(self):
-        """Fetches the OAuth2 access token using MTLS"""
+    def get_token(self, stale_token=None):
+        """
+        Returns a valid OAuth2 access token, fetching one over MTLS only when needed.
+        Tokens are shared by every InterClient in the process and renewed shortly before expiry.
+        Pass stale_token (a token the API just rejected) to force a refresh; concurrent callers
+        that hit the same 401 reuse the first refresh instead of each requesting a new token.
+        """
+        key = (self.client_id, self.scope)
+        cached = _token_cache.get(key)
+        if cached and cached[0] != stale_token and cached[1] - INTER_TOKEN_REFRESH_MARGIN > time.time():
+            self.access_token = cached[0]
+            return self.access_token
+
+        with _token_lock(key):
+            cached = _token_cache.get(key)
+            if cached and cached[0] != stale_token and cached[1] - INTER_TOKEN_REFRESH_MARGIN > time.time():
+                self.access_token = cached[0]
+                return self.access_token
+
+            token, expires_in = self._request_token()
+            _token_cache[key] = (token, time.time() + expires_in)
+            self.access_token = token
+            return token
+
+    def _request_token(self):
+        """Fetches a new OAuth2 access token using MTLS. Returns (token, expires_in seconds)."""
         self._check_certs()
         if not self.client_id or not self.client_secret:
             raise ValueError("Inter Client ID and Secret are missing. Please add them to .env")
@@ -54,98 +108,122 @@ class InterClient:
         data = {
             "client_id": self.client_id,
             "client_secret": self.client_secret,
-            "scope": "extrato.read",
+            "scope": self.scope,
             "grant_type": "client_credentials"
         }
 
-        response = requests.post(
+        response = self.session.post(
             url, 
             headers=headers, 
-            data=data, 
-            cert=(self.cert_path, self.key_path)
+            data=data
         )
         response.raise_for_status()
-        self.access_token = response.json().get("access_token")
-        return self.access_token
+        payload = response.json()
+        return payload.get("access_token"), int(payload.get("expires_in") or 3600)
+
+    def _get(self, path, params=None):
+        """ Authenticated GET; on a 401 the token is refreshed and the call retried once """
+        url = f"{self.base_url}{path}"
+        token = self.get_token()
+        for attempt in range(2):
+            response = self.session.get(
+                url,
+                headers={"Authorization": f"Bearer {token}"},
+                params=params
+            )
+            if response.status_code == 401 and attempt == 0:
+                token = self.get_token(stale_token=token)
+                continue
+            response.raise_for_status()
+            return response.json()
 
-    def get_bank_statement(self, data_inicio, data_fim):
+    def get_bank_statement(self, data_inicio, data_fim, live_days=INTER_STATEMENT_SETTLE_DAYS):
         """
         Queries the PJ bank statement.
         data_inicio, data_fim in YYYY-MM-DD
-        If the date range is >90 days, it automatically chunks the requests.
+        The range is split into calendar months (always under the 90-day API limit), fetched concurrently.
+        Months that ended more than live_days ago are cached on disk; newer ones are always re-downloaded,
+        so callers with a longer look-back window (late entries) pass it instead of the settle margin.
         """
-        if not self.access_token:
-            self.get_token()
-
-        from datetime import datetime, timedelta
-
-        start_dt = datetime.strptime(data_inicio, "%Y-%m-%d")
-        end_dt = datetime.strptime(data_fim, "%Y-%m-%d")
-
-        all_transacoes = []
-        base_response = {}
+        start_dt = datetime.datetime.strptime(data_inicio, "%Y-%m-%d").date()
+        end_dt = datetime.datetime.strptime(data_fim, "%Y-%m-%d").date()
 
+        windows = []
         current_start = start_dt
         while current_start <= end_dt:
-            # Add up to 89 days so the interval is 90 days inclusive
-            current_end = current_start + timedelta(days=89)
-            if current_end > end_dt:
-                current_end = end_dt
-                
-            url = f"{self.base_url}/banking/v2/extrato"
-            headers = {
-                "Authorization": f"Bearer {self.access_token}"
-            }
-            params = {
-                "dataInicio": current_start.strftime("%Y-%m-%d"),
-                "dataFim": current_end.strftime("%Y-%m-%d")
-            }
-
-            response = requests.get(
-                url, 
-                headers=headers, 
-                params=params, 
-                cert=(self.cert_path, self.key_path)
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            if not base_response:
-                base_response = data
-                all_transacoes = data.get("transacoes", [])
-            else:
-                all_transacoes.extend(data.get("transacoes", []))
+            next_month = (current_start.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+            current_end = min(next_month - datetime.timedelta(days=1), end_dt)
+            windows.append((current_start, current_end))
+            current_start = next_month
 
-            # Move to the day after the current end
-            current_start = current_end + timedelta(days=1)
+        if not windows:
+            return {"transacoes": []}
 
+        # Make sure the token exists before the workers start, so they do not all request one
+        self.get_token()
+        with ThreadPoolExecutor(max_workers=min(INTER_STATEMENT_WORKERS, len(windows))) as executor:
+            results = list(executor.map(lambda w: self._get_statement_window(*w, live_days=live_days), windows))
+
+        base_response = results[0]
+        all_transacoes = []
+        for data in results:
+            all_transacoes.extend(data.get("transacoes", []))
         base_response["transacoes"] = all_transacoes
         return base_response
 
+    def _get_statement_window(self, start, end, live_days=INTER_STATEMENT_SETTLE_DAYS):
+        """ Statement for a range inside a single month, served from the disk cache when the month is closed """
+        month_start = start.replace(day=1)
+        month_end = (month_start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+
+        if month_end + datetime.timedelta(days=live_days) >= datetime.date.today():
+            return self._get("/banking/v2/extrato", {"dataInicio": start.isoformat(), "dataFim": end.isoformat()})
+
+        data = self._read_cached_month(month_start)
+        if data is None:
+            data = self._get("/banking/v2/extrato", {"dataInicio": month_start.isoformat(), "dataFim": month_end.isoformat()})
+            self._write_cached_month(month_start, data)
+
+        if start == month_start and end == month_end:
+            return data
+        # Partial month: keep only the requested days (entries without a date are kept)
+        data = dict(data)
+        data["transacoes"] = [
+            t for t in data.get("transacoes", [])
+            if not t.get("dataEntrada") or start.isoformat() <= t["dataEntrada"][:10] <= end.isoformat()
+        ]
+        return data
+
+    def _statement_cache_path(self, month_start):
+        account = hashlib.sha256((self.client_id or "").encode()).hexdigest()[:12]
+        return os.path.join(INTER_STATEMENT_CACHE_DIR, account, f"{month_start:%Y-%m}.json")
+
+    def _read_cached_month(self, month_start):
+        path = self._statement_cache_path(month_start)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cached_month(self, month_start, data):
+        path = self._statement_cache_path(month_start)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
     def get_balance(self, data_saldo=None):
         """
         Queries the PJ account balance.
         data_saldo in YYYY-MM-DD (optional, defaults to current day if None)
         """
-        if not self.access_token:
-            self.get_token()
-
-        url = f"{self.base_url}/banking/v2/saldo"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}"
-        }
         params = {}
         if data_saldo:
             params["dataSaldo"] = data_saldo
 
-        response = requests.get(
-            url, 
-            headers=headers, 
-            params=params, 
-            cert=(self.cert_path, self.key_path)
-        )
-        response.raise_for_status()
-        return response.json()
+        return self._get("/banking/v2/saldo", params)
 
     def get_extrato_export(self, data_inicio, data_fim, tipo_arquivo="PDF"):
         """
@@ -153,27 +231,13 @@ class InterClient:
         tipo_arquivo can be "PDF" or "OFX".
         Returns the base64 encoded string directly.
         """
-        if not self.access_token:
-            self.get_token()
-
-        url = f"{self.base_url}/banking/v2/extrato/exportar"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}"
-        }
         params = {
             "dataInicio": data_inicio,
             "dataFim": data_fim,
             "tipoArquivo": tipo_arquivo
         }
 
-        response = requests.get(
-            url, 
-            headers=headers, 
-            params=params, 
-            cert=(self.cert_path, self.key_path)
-        )
-        response.raise_for_status()
+        data = self._get("/banking/v2/extrato/exportar", params)
         
         # Inter API usually returns the base64 string under the 'pdf' key regardless of the requested type
-        data = response.json()
         return data.get("pdf", "")
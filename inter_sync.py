@@ -0,0 +1,100 @@
+import os
+import hashlib
+import datetime
+import threading
+from decimal import Decimal, InvalidOperation
+from dotenv import load_dotenv
+from inter_client import InterClient, INTER_STATEMENT_SETTLE_DAYS
+from database_manager import DatabaseManager
+
+load_dotenv()
+
+INTER_SYNC_START = os.getenv("INTER_SYNC_START", "2025-01-01")
+# Days re-read before the watermark; entries can still settle a couple of days late
+INTER_SYNC_OVERLAP_DAYS = int(os.getenv("INTER_SYNC_OVERLAP_DAYS", "3"))
+INTER_SYNC_INTERVAL_MINUTES = int(os.getenv("INTER_SYNC_INTERVAL_MINUTES", "30"))
+
+WATERMARK_KEY = "inter_sync_watermark"
+LAST_RUN_KEY = "inter_sync_ultima_execucao"
+
+_sync_lock = threading.Lock()
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value).replace(",", ".")).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return Decimal("0.00")
+
+
+def statement_rows(transacoes):
+    """
+    Normalizes raw Inter statement items into extrato_inter rows.
+    Items carry idTransacao only in some API versions; otherwise the key is a hash of the item
+    plus its occurrence number, so two identical Pix on the same day stay two rows.
+    Syncs always cover whole days, which keeps the occurrence numbers stable between runs.
+    """
+    rows = []
+    seen = {}
+    for t in transacoes:
+        data_entrada = (t.get("dataEntrada") or t.get("dataLancamento") or t.get("dataTransacao") or "")[:10]
+        if not data_entrada:
+            continue
+        id_transacao = t.get("idTransacao")
+        if not id_transacao:
+            fingerprint = "|".join(str(t.get(k, "")) for k in
+                                   ("dataEntrada", "tipoOperacao", "tipoTransacao", "valor", "titulo", "descricao"))
+            digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:40]
+            seen[digest] = seen.get(digest, -1) + 1
+            id_transacao = f"h:{digest}:{seen[digest]}"
+        rows.append({
+            "id_transacao": str(id_transacao),
+            "data_entrada": data_entrada,
+            "tipo_operacao": (t.get("tipoOperacao") or "")[:1] or None,
+            "tipo_transacao": t.get("tipoTransacao"),
+            "valor": _to_decimal(t.get("valor", 0)),
+            "titulo": (t.get("titulo") or "")[:255] or None,
+            "descricao": (t.get("descricao") or "")[:500] or None,
+            "payload": t,
+        })
+    return rows
+
+
+def sync_incremental(db=None, client=None):
+    """ Downloads the statement from (watermark - overlap) up to today and upserts it into extrato_inter """
+    db = db or DatabaseManager()
+    client = client or InterClient()
+
+    hoje = datetime.date.today()
+    watermark = db.get_config(WATERMARK_KEY)
+    if watermark:
+        since = datetime.date.fromisoformat(watermark) - datetime.timedelta(days=INTER_SYNC_OVERLAP_DAYS)
+    else:
+        since = datetime.date.fromisoformat(INTER_SYNC_START)
+
+    # Months still inside the overlap window can get late entries, so only older ones come from the disk cache
+    extrato = client.get_bank_statement(since.isoformat(), hoje.isoformat(),
+                                       live_days=max(INTER_SYNC_OVERLAP_DAYS, INTER_STATEMENT_SETTLE_DAYS))
+    rows = statement_rows(extrato.get("transacoes", []))
+    novos = db.upsert_inter_statement(rows)
+
+    db.set_config(WATERMARK_KEY, hoje.isoformat())
+    db.set_config(LAST_RUN_KEY, f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S} | {len(rows)} lançamentos lidos, {novos} novos")
+    summary = {"desde": since.isoformat(), "lidos": len(rows), "novos": novos}
+    print(f"[InterSync] {summary}")
+    return summary
+
+
+def run_sync():
+    """ Entry point for the scheduler and the UI. Skips if a sync is already running in this process. """
+    if not _sync_lock.acquire(blocking=False):
+        print("[InterSync] Sync already running, skipping.")
+        return None
+    try:
+        return sync_incremental()
+    finally:
+        _sync_lock.release()
+
+
+if __name__ == "__main__":
+    run_sync()
@@ -1,12 +1,148 @@
 import streamlit as st
 import pandas as pd
-import datetime
-from database_manager import DatabaseManager
-import base64
+from ui_cache import CachedDatabase
+from frota_ui import render_document_preview, paginate
+from pilot_finance import get_finance_index, finance_totals, normalize_cpf
+
+def render_locatario_detail(db, locatario_id, finance_index, finance_error, motos_list):
+    """ Full panel of one locatário; only rendered for the pilot selected in the list """
+    details = db.get_locatario_details(locatario_id)
+    if not details:
+        st.warning("Locatário não encontrado.")
+        return
+    (d_id, d_nome, d_cpf, d_endereco, d_telefone, d_email, d_cnh, d_placa, d_cnhn, d_cnht) = details
+
+    c1, c2 = st.columns(2)
+    c1.markdown(f"**Nome:** {d_nome}")
+    c1.markdown(f"**CPF:** {d_cpf}")
+    c1.markdown(f"**CNH:** {d_cnh or 'Não informada'}")
+    c1.markdown(f"**Email:** {d_email or 'Não informado'}")
+    c2.markdown(f"**Telefone:** {d_telefone or 'Não informado'}")
+    c2.markdown(f"**Moto Associada:** {d_placa or 'Nenhuma'}")
+    c2.markdown(f"**Endereço:**\\n{d_endereco or 'Não informado'}")
+
+    st.write("---")
+    if d_cnhn:
+        st.write(f"**Arquivo Anexado da CNH**: {d_cnhn}")
+        if st.button(f"Visualizar CNH", key=f"view_cnh_{d_id}"):
+            doc_meta = db.get_locatario_document(d_id)
+            if doc_meta and doc_meta[0]:
+                render_document_preview(db, doc_meta[0], d_cnhn, d_cnht)
+            else:
+                st.error("Arquivo não encontrado.")
+    else:
+        st.write("**Arquivo Anexado da CNH**: Não anexado")
+
+    st.write("---")
+
+    # ========== FINANCEIRO DO PILOTO ==========
+    with st.expander("💰 Financeiro do Piloto"):
+        # Rows come from the per-CPF index built once for the whole page
+        fin_rows = finance_index.get(normalize_cpf(d_cpf), []) if d_cpf else []
+        if finance_error:
+            st.warning(f"Não foi possível buscar dados do ASAAS: {finance_error}")
+
+        if not fin_rows:
+            st.info("Nenhum registro financeiro encontrado para este piloto.")
+        else:
+            # Summary metrics
+            total_recebido, total_pendente, total_atraso = finance_totals(fin_rows)
+
+            m1, m2, m3 = st.columns(3)
+            m1.metric("✅ Recebido", f"R$ {total_recebido:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+            m2.metric("⏳ Pendente", f"R$ {total_pendente:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+            m3.metric("🔴 Em Atraso", f"R$ {total_atraso:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+
+            # Build display table
+            display_rows = []
+            for r in fin_rows:
+                data_fmt = pd.to_datetime(r["data"]).strftime("%d/%m/%Y") if r["data"] else "—"
+                display_rows.append({
+                    "Origem": r["origem"],
+                    "Valor Bruto": f"R$ {r['valor']:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+                    "Valor Líquido": f"R$ {r['valor_liquido']:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+                    "Data": data_fmt,
+                    "Status": r["status"].upper()
+                })
+
+            df_fin = pd.DataFrame(display_rows)
+            st.dataframe(df_fin, use_container_width=True, hide_index=True)
+
+            # Editable manual entries
+            pendentes_manuais = [r for r in fin_rows if r["editavel"] and r["status"] == "pendente" and r["id"]]
+            if pendentes_manuais:
+                st.markdown("#### Marcar como Recebido")
+                for r in pendentes_manuais:
+                    data_fmt = pd.to_datetime(r["data"]).strftime("%d/%m/%Y") if r["data"] else "—"
+                    col_info, col_btn = st.columns([3, 1])
+                    col_info.write(f"**#{r['id']}** — R$ {r['valor']:.2f} — {data_fmt}")
+                    if col_btn.button("✅ Recebido", key=f"mark_recv_{d_id}_{r['id']}"):
+                        db.update_transaction(r["id"], "Manual", r["valor"], r["data"], "recebido", cpf_cliente=d_cpf)
+                        st.success("Status atualizado para Recebido!")
+                        st.rerun()
+
+    st.write("---")
+    with st.expander("📝 Editar Dados do Piloto"):
+        with st.form(f"form_edit_locatario_{d_id}"):
+            c1, c2 = st.columns(2)
+            with c1:
+                new_nome = st.text_input("Nome Completo", value=d_nome)
+                new_cpf = st.text_input("CPF", value=d_cpf)
+                new_telefone = st.text_input("Telefone", value=d_telefone or "")
+                new_email = st.text_input("E-mail", value=d_email or "")
+            with c2:
+                new_endereco = st.text_area("Endereço", value=d_endereco or "")
+                new_cnh = st.text_input("CNH", value=d_cnh or "")
+
+                placas_disponiveis = ["Nenhuma"] + [m[0] for m in motos_list] if motos_list else ["Nenhuma"]
+                current_placa_idx = placas_disponiveis.index(d_placa) if d_placa in placas_disponiveis else 0
+                new_placa = st.selectbox("Moto Associada Atualmente", placas_disponiveis, index=current_placa_idx)
+
+            new_cnh_file = st.file_uploader("Nova CNH (Opcional)", type=["pdf", "png", "jpg"], key=f"edit_cnh_{d_id}")
+
+            cb1, cb2 = st.columns(2)
+            save_btn = cb1.form_submit_button("Salvar Alterações")
+            delete_btn = cb2.form_submit_button("🚨 Excluir Piloto")
+
+            if save_btn:
+                placa_final = None if new_placa == "Nenhuma" else new_placa
+                cf_bytes = new_cnh_file.read() if new_cnh_file else None
+                cf_name = new_cnh_file.name if new_cnh_file else None
+                cf_type = new_cnh_file.type if new_cnh_file else None
+
+                if d_placa and d_placa != placa_final:
+                    # Free the old moto
+                    db.sync_moto_association(d_placa, None)
+
+                if placa_final:
+                    # Bind the new moto
+                    db.sync_moto_association(placa_final, new_nome)
+
+                success = db.update_locatario(
+                    d_id, new_nome, new_cpf, new_endereco, new_telefone, new_email, new_cnh, placa_final,
+                    cf_bytes, cf_name, cf_type
+                )
+                if success:
+                    st.success(f"Locatário {new_nome} atualizado com sucesso!")
+                    st.rerun()
+                else:
+                    st.error("Erro ao atualizar dados.")
+
+            if delete_btn:
+                # Before deleting, clear the moto association using sync method
+                if d_placa:
+                    db.sync_moto_association(d_placa, None)
+
+                if db.delete_locatario(d_id):
+                    st.success("Piloto excluído com sucesso!")
+                    st.session_state.pop("locatario_selecionado", None)
+                    st.rerun()
+                else:
+                    st.error("Erro ao excluir piloto.")
 
 def locatarios_tab():
     st.header("Gestão de Locatários (Pilotos)")
-    db = DatabaseManager()
+    db = CachedDatabase()
 
     st.markdown("---")
     
@@ -18,7 +154,7 @@ def locatarios_tab():
             try:
                 from asaas_client import AsaasClient
                 client = AsaasClient()
-                asaas_customers = client.get_customers()
+                asaas_customers = client.get_customers(use_cache=False)
                 if asaas_customers:
                     inserted, updated = db.upsert_asaas_customers(asaas_customers)
                     st.success(f"Sincronização concluída! {inserted} clientes importados e {updated} atualizados.")
@@ -27,215 +163,34 @@ def locatarios_tab():
             except Exception as e:
                 st.error(f"Erro na sincronização: {e}")
                 
+    # The list queries of the page; pilot details are fetched only for the selected one
     locatarios_list = db.get_locatarios_list()
+    motos_list = db.get_motos_list()
     if not locatarios_list:
         st.info("Nenhum locatário cadastrado.")
         return
         
-    for l in locatarios_list:
-        l_id, l_nome, l_cpf, l_tel, l_placa = l
-        assoc_label = f" (🏍️ Moto: {l_placa})" if l_placa else " (Sem moto associada)"
-        with st.expander(f"👤 {l_nome} - CPF: {l_cpf} {assoc_label}"):
-            details = db.get_locatario_details(l_id)
-            if details:
-                 (d_id, d_nome, d_cpf, d_endereco, d_telefone, d_email, d_cnh, d_placa, d_cnhn, d_cnht) = details
-                 
-                 c1, c2 = st.columns(2)
-                 c1.markdown(f"**Nome:** {d_nome}")
-                 c1.markdown(f"**CPF:** {d_cpf}")
-                 c1.markdown(f"**CNH:** {d_cnh or 'Não informada'}")
-                 c1.markdown(f"**Email:** {d_email or 'Não informado'}")
-                 c2.markdown(f"**Telefone:** {d_telefone or 'Não informado'}")
-                 c2.markdown(f"**Moto Associada:** {d_placa or 'Nenhuma'}")
-                 c2.markdown(f"**Endereço:**\\n{d_endereco or 'Não informado'}")
-                 
-                 st.write("---")
-                 if d_cnhn:
-                     st.write(f"**Arquivo Anexado da CNH**: {d_cnhn}")
-                     if st.button(f"Visualizar CNH", key=f"view_cnh_{d_id}"):
-                         file_data = db.get_locatario_file(d_id)
-                         raw_bytes = file_data[0]
-                         b64 = base64.b64encode(raw_bytes).decode()
-                         if 'pdf' in d_cnht:
-                             href = f'<iframe src="data:application/pdf;base64,{b64}" width="100%" height="600" type="application/pdf"></iframe>'
-                             st.markdown(href, unsafe_allow_html=True)
-                         else:
-                             href = f'<img src="data:{d_cnht};base64,{b64}" width="100%" />'
-                             st.markdown(href, unsafe_allow_html=True)
-                 else:
-                     st.write("**Arquivo Anexado da CNH**: Não anexado")
-                 
-                 st.write("---")
-                 
-                 # ========== FINANCEIRO DO PILOTO ==========
-                 with st.expander("💰 Financeiro do Piloto"):
-                     fin_rows = []
-                     
-                     # 1. Manual transactions from DB
-                     all_txs = db.get_transactions()
-                     # Normalize CPF for comparison
-                     pilot_cpf_clean = (d_cpf or "").replace(".", "").replace("-", "").replace("/", "").strip()
-                     manual_txs = []
-                     for tx in all_txs:
-                         tx_cpf_clean = (tx[6] or "").replace(".", "").replace("-", "").replace("/", "").strip()
-                         if tx_cpf_clean and pilot_cpf_clean and tx_cpf_clean == pilot_cpf_clean:
-                             manual_txs.append(tx)
-                     
-                     for tx in manual_txs:
-                         tipo_label = "Receita" if tx[2] in ('entrada', 'entrada_liquida') else "Despesa"
-                         tx_status = tx[5] if tx[5] else "recebido"  # Legacy entries may have empty status
-                         tx_origem = tx[1] if tx[1] else "Manual"
-                         fin_rows.append({
-                             "id": tx[0],
-                             "origem": f"{tx_origem} ({tipo_label})",
-                             "valor": float(tx[3]),
-                             "valor_liquido": float(tx[3]),
-                             "data": str(tx[4]),
-                             "status": tx_status,
-                             "tipo": tx[2],
-                             "editavel": True
-                         })
-                     
-                     # 2. ASAAS payments for this pilot
-                     try:
-                         from asaas_client import AsaasClient
-                         ac = AsaasClient()
-                         customers = ac.get_customers()
-                         
-                         # Find ASAAS customer(s) matching this CPF
-                         matching_cust_ids = [c["id"] for c in customers if c.get("cpfCnpj", "").replace(".", "").replace("-", "").replace("/", "") == d_cpf.replace(".", "").replace("-", "").replace("/", "")]
-                         
-                         if matching_cust_ids:
-                             h = datetime.date.today()
-                             asaas_start = datetime.date(2025, 1, 1).strftime("%Y-%m-%d")
-                             asaas_end = (h + datetime.timedelta(days=365)).strftime("%Y-%m-%d")
-                             pagamentos = ac.get_all_payments(asaas_start, asaas_end)
-                             
-                             status_map = {
-                                 "RECEIVED": "recebido",
-                                 "CONFIRMED": "recebido",
-                                 "RECEIVED_IN_CASH": "recebido",
-                                 "PENDING": "pendente",
-                                 "OVERDUE": "em atraso",
-                             }
-                             
-                             for pg in pagamentos:
-                                 if pg.get("customer") in matching_cust_ids:
-                                     pg_status = pg.get("status", "")
-                                     if pg_status in status_map:
-                                         data_pg = pg.get("paymentDate") or pg.get("dueDate") or pg.get("dateCreated", "")
-                                         fin_rows.append({
-                                             "id": None,
-                                             "origem": "ASAAS",
-                                             "valor": float(pg.get("value", 0)),
-                                             "valor_liquido": float(pg.get("netValue", pg.get("value", 0))),
-                                             "data": data_pg,
-                                             "status": status_map.get(pg_status, pg_status.lower()),
-                                             "tipo": "entrada",
-                                             "editavel": False
-                                         })
-                     except Exception as e:
-                         st.warning(f"Não foi possível buscar dados do ASAAS: {e}")
-                     
-                     if not fin_rows:
-                         st.info("Nenhum registro financeiro encontrado para este piloto.")
-                     else:
-                         # Summary metrics
-                         total_recebido = sum(r["valor"] for r in fin_rows if r["status"] == "recebido")
-                         total_pendente = sum(r["valor"] for r in fin_rows if r["status"] == "pendente")
-                         total_atraso = sum(r["valor"] for r in fin_rows if r["status"] == "em atraso")
-                         
-                         m1, m2, m3 = st.columns(3)
-                         m1.metric("✅ Recebido", f"R$ {total_recebido:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-                         m2.metric("⏳ Pendente", f"R$ {total_pendente:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-                         m3.metric("🔴 Em Atraso", f"R$ {total_atraso:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-                         
-                         # Build display table
-                         display_rows = []
-                         for r in fin_rows:
-                             data_fmt = pd.to_datetime(r["data"]).strftime("%d/%m/%Y") if r["data"] else "—"
-                             display_rows.append({
-                                 "Origem": r["origem"],
-                                 "Valor Bruto": f"R$ {r['valor']:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-                                 "Valor Líquido": f"R$ {r['valor_liquido']:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-                                 "Data": data_fmt,
-                                 "Status": r["status"].upper()
-                             })
-                         
-                         df_fin = pd.DataFrame(display_rows)
-                         st.dataframe(df_fin, use_container_width=True, hide_index=True)
-                         
-                         # Editable manual entries
-                         pendentes_manuais = [r for r in fin_rows if r["editavel"] and r["status"] == "pendente" and r["id"]]
-                         if pendentes_manuais:
-                             st.markdown("#### Marcar como Recebido")
-                             for r in pendentes_manuais:
-                                 data_fmt = pd.to_datetime(r["data"]).strftime("%d/%m/%Y") if r["data"] else "—"
-                                 col_info, col_btn = st.columns([3, 1])
-                                 col_info.write(f"**#{r['id']}** — R$ {r['valor']:.2f} — {data_fmt}")
-                                 if col_btn.button("✅ Recebido", key=f"mark_recv_{d_id}_{r['id']}"):
-                                     db.update_transaction(r["id"], "Manual", r["valor"], r["data"], "recebido", cpf_cliente=d_cpf)
-                                     st.success("Status atualizado para Recebido!")
-                                     st.rerun()
-                 
-                 st.write("---")
-                 with st.expander("📝 Editar Dados do Piloto"):
-                     with st.form(f"form_edit_locatario_{d_id}"):
-                         c1, c2 = st.columns(2)
-                         with c1:
-                             new_nome = st.text_input("Nome Completo", value=d_nome)
-                             new_cpf = st.text_input("CPF", value=d_cpf)
-                             new_telefone = st.text_input("Telefone", value=d_telefone or "")
-                             new_email = st.text_input("E-mail", value=d_email or "")
-                         with c2:
-                             new_endereco = st.text_area("Endereço", value=d_endereco or "")
-                             new_cnh = st.text_input("CNH", value=d_cnh or "")
-                             
-                             motos_list = db.get_motos_list()
-                             placas_disponiveis = ["Nenhuma"] + [m[0] for m in motos_list] if motos_list else ["Nenhuma"]
-                             current_placa_idx = placas_disponiveis.index(d_placa) if d_placa in placas_disponiveis else 0
-                             new_placa = st.selectbox("Moto Associada Atualmente", placas_disponiveis, index=current_placa_idx)
-
-                         new_cnh_file = st.file_uploader("Nova CNH (Opcional)", type=["pdf", "png", "jpg"], key=f"edit_cnh_{d_id}")
-                         
-                         cb1, cb2 = st.columns(2)
-                         save_btn = cb1.form_submit_button("Salvar Alterações")
-                         delete_btn = cb2.form_submit_button("🚨 Excluir Piloto")
-
-                         if save_btn:
-                             placa_final = None if new_placa == "Nenhuma" else new_placa
-                             cf_bytes = new_cnh_file.read() if new_cnh_file else None
-                             cf_name = new_cnh_file.name if new_cnh_file else None
-                             cf_type = new_cnh_file.type if new_cnh_file else None
-                             
-                             if d_placa and d_placa != placa_final:
-                                 # Free the old moto
-                                 db.sync_moto_association(d_placa, None)
+    finance_index, finance_error = get_finance_index()
 
-                             if placa_final:
-                                 # Bind the new moto
-                                 db.sync_moto_association(placa_final, new_nome)
+    def render_locatario_list(locatarios):
+        # Compact, paginated rows; details are loaded only for the selected pilot
+        for l_id, l_nome, l_cpf, l_tel, l_placa in paginate(locatarios, "locatarios"):
+            assoc_label = f" (🏍️ Moto: {l_placa})" if l_placa else " (Sem moto associada)"
+            if st.button(f"👤 {l_nome} - CPF: {l_cpf} {assoc_label}", key=f"sel_loc_{l_id}", use_container_width=True,
+                         type="primary" if st.session_state.get("locatario_selecionado") == l_id else "secondary"):
+                st.session_state.locatario_selecionado = l_id
 
-                             success = db.update_locatario(
-                                 d_id, new_nome, new_cpf, new_endereco, new_telefone, new_email, new_cnh, placa_final,
-                                 cf_bytes, cf_name, cf_type
-                             )
-                             if success:
-                                 st.success(f"Locatário {new_nome} atualizado com sucesso!")
-                                 st.rerun()
-                             else:
-                                 st.error("Erro ao atualizar dados.")
-                         
-                         if delete_btn:
-                             # Before deleting, clear the moto association using sync method
-                             if d_placa:
-                                 db.sync_moto_association(d_placa, None)
+    render_locatario_list(locatarios_list)
 
-                             if db.delete_locatario(d_id):
-                                 st.success("Piloto excluído com sucesso!")
-                                 st.rerun()
-                             else:
-                                 st.error("Erro ao excluir piloto.")
+    loc_sel = st.session_state.get("locatario_selecionado")
+    if loc_sel:
+        st.markdown("---")
+        c_title, c_close = st.columns([4, 1])
+        c_title.subheader(next((f"👤 {l[1]}" for l in locatarios_list if l[0] == loc_sel), "👤 Locatário"))
+        if c_close.button("✖ Fechar", key="close_locatario", use_container_width=True):
+            del st.session_state.locatario_selecionado
+            st.rerun()
+        render_locatario_detail(db, loc_sel, finance_index, finance_error, motos_list)
 
     st.markdown('---')
     # Form to Add Locatário
@@ -253,7 +208,6 @@ def locatarios_tab():
                 cnh = st.text_input("Número da CNH")
                 
                 # Fetch available motos to associate
-                motos_list = db.get_motos_list()
                 placas_disponiveis = ["Nenhuma"] + [m[0] for m in motos_list] if motos_list else ["Nenhuma"]
                 placa_associada = st.selectbox("Moto Associada Atualmente", placas_disponiveis)
 
@@ -0,0 +1,560 @@
+import os
+import time
+import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from dotenv import load_dotenv
+from database_manager import DatabaseManager
+
+load_dotenv()
+
+# Rows touched per UPDATE batch and pause between batches, so backfills never hold long locks
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+MIGRATION_BATCH_SLEEP = float(os.getenv("MIGRATION_BATCH_SLEEP", "0.05"))
+
+MIGRATIONS = []
+
+
+def migration(version, descricao):
+    """ Registers a schema migration. Versions are applied once, in ascending order. """
+    def register(func):
+        MIGRATIONS.append((version, descricao, func))
+        return func
+    return register
+
+
+# --- Helpers ---
+
+def column_type(cursor, table, column):
+    cursor.execute("""
+        SELECT DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    row = cursor.fetchone()
+    return row[0].lower() if row else None
+
+
+def index_exists(cursor, table, index_name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, index_name))
+    return cursor.fetchone() is not None
+
+
+def parse_legacy_date(value):
+    """ Parses the free-form dates stored in VARCHAR columns ('2025-03-01', '2025-03-01 10:00:00', '01/03/2025') """
+    if value is None:
+        return None
+    if isinstance(value, datetime.date):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(text[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def backfill_in_batches(conn, table, select_cols, convert, update_sql):
+    """
+    Walks `table` by primary key in MIGRATION_BATCH_SIZE chunks.
+    convert(row) returns the UPDATE parameters for a row (ending with the id) or None if the row is invalid.
+    Returns the list of invalid rows so the caller can abort before swapping columns.
+    """
+    invalid = []
+    last_id = 0
+    total = 0
+    while True:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, {select_cols} FROM {table} WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, MIGRATION_BATCH_SIZE)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                params = convert(row)
+                if params is None:
+                    invalid.append(row)
+                else:
+                    updates.append(params)
+            if updates:
+                cursor.executemany(update_sql, updates)
+        conn.commit()
+        last_id = rows[-1][0]
+        total += len(rows)
+        print(f"  {table}: {total} rows backfilled (last id {last_id})")
+        time.sleep(MIGRATION_BATCH_SLEEP)
+    return invalid
+
+
+# --- Migrations ---
+
+@migration(1, "transacoes/locacoes: DATE e DECIMAL(12,2) nativos + indices compostos")
+def native_types_transacoes(conn):
+    def to_decimal(value):
+        return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+    with conn.cursor() as cursor:
+        needs_transacoes = column_type(cursor, "transacoes", "data") != "date" or column_type(cursor, "transacoes", "valor") != "decimal"
+        needs_locacoes = column_type(cursor, "locacoes", "data_inicio") != "date"
+
+    # 1. Shadow columns (nullable, so adding them is cheap and online)
+    if needs_transacoes:
+        with conn.cursor() as cursor:
+            if not column_type(cursor, "transacoes", "data_nova"):
+                cursor.execute("ALTER TABLE transacoes ADD COLUMN data_nova DATE NULL, ADD COLUMN valor_novo DECIMAL(12,2) NULL")
+    if needs_locacoes:
+        with conn.cursor() as cursor:
+            if not column_type(cursor, "locacoes", "data_inicio_nova"):
+                cursor.execute("ALTER TABLE locacoes ADD COLUMN data_inicio_nova DATE NULL, ADD COLUMN data_fim_nova DATE NULL")
+
+    # 2. Triggers keep the shadow columns in sync with every write the app makes while the backfill runs.
+    # Same formats as parse_legacy_date; anything else stays NULL and is caught before the swap.
+    def sql_date(col):
+        return f"""(CASE
+            WHEN {col} REGEXP '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}' THEN STR_TO_DATE(LEFT({col}, 10), '%Y-%m-%d')
+            WHEN {col} REGEXP '^[0-9]{{2}}/[0-9]{{2}}/[0-9]{{4}}' THEN STR_TO_DATE(LEFT({col}, 10), '%d/%m/%Y')
+        END)"""
+
+    sync_sets = {}
+    if needs_transacoes:
+        sync_sets["transacoes"] = f"SET NEW.data_nova = {sql_date('NEW.data')}, NEW.valor_novo = ROUND(NEW.valor, 2)"
+    if needs_locacoes:
+        sync_sets["locacoes"] = f"SET NEW.data_inicio_nova = {sql_date('NEW.data_inicio')}, NEW.data_fim_nova = {sql_date('NEW.data_fim')}"
+    with conn.cursor() as cursor:
+        for table, sets in sync_sets.items():
+            for event in ("INSERT", "UPDATE"):
+                trigger = f"{table}_shadow_{event.lower()}"
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                cursor.execute(f"CREATE TRIGGER {trigger} BEFORE {event} ON {table} FOR EACH ROW {sets}")
+
+    # 3. Backfill the existing rows in batches; rows written meanwhile are covered by the triggers
+    def convert_transacao(row):
+        tx_id, data, valor = row
+        data_nova = parse_legacy_date(data)
+        if data_nova is None or valor is None:
+            return None
+        return (data_nova, to_decimal(valor), tx_id)
+
+    def convert_locacao(row):
+        loc_id, data_inicio, data_fim = row
+        inicio = parse_legacy_date(data_inicio)
+        fim = parse_legacy_date(data_fim)
+        if inicio is None or (data_fim and str(data_fim).strip() and fim is None):
+            return None
+        return (inicio, fim, loc_id)
+
+    if needs_transacoes:
+        invalid = backfill_in_batches(
+            conn, "transacoes", "data, valor", convert_transacao,
+            "UPDATE transacoes SET data_nova = %s, valor_novo = %s WHERE id = %s"
+        )
+        if invalid:
+            raise ValueError(f"transacoes com data/valor inválidos, corrija antes de migrar: {invalid[:20]}")
+    if needs_locacoes:
+        invalid = backfill_in_batches(
+            conn, "locacoes", "data_inicio, data_fim", convert_locacao,
+            "UPDATE locacoes SET data_inicio_nova = %s, data_fim_nova = %s WHERE id = %s"
+        )
+        if invalid:
+            raise ValueError(f"locacoes com datas inválidas, corrija antes de migrar: {invalid[:20]}")
+
+    # 4. Swap the columns. Writes are blocked only for this metadata-only step (ALGORITHM=INSTANT,
+    # MySQL 8.0.29+): the triggers go away in the same locked section, so no write can miss them
+    # and no trigger survives to reference the renamed columns.
+    incomplete = {
+        "transacoes": "data_nova IS NULL OR valor_novo IS NULL",
+        "locacoes": "data_inicio_nova IS NULL OR (data_fim IS NOT NULL AND TRIM(data_fim) <> '' AND data_fim_nova IS NULL)",
+    }
+    swaps = {
+        "transacoes": """
+            ALTER TABLE transacoes
+                DROP COLUMN valor,
+                DROP COLUMN data,
+                RENAME COLUMN valor_novo TO valor,
+                RENAME COLUMN data_nova TO data,
+                ALGORITHM=INSTANT
+        """,
+        "locacoes": """
+            ALTER TABLE locacoes
+                DROP COLUMN data_inicio,
+                DROP COLUMN data_fim,
+                RENAME COLUMN data_inicio_nova TO data_inicio,
+                RENAME COLUMN data_fim_nova TO data_fim,
+                ALGORITHM=INSTANT
+        """,
+    }
+    if sync_sets:
+        with conn.cursor() as cursor:
+            # Rows the triggers could not convert (unparseable app writes during the backfill).
+            # Checked before locking so the scan never blocks writes; a bad row written after this
+            # point makes the NOT NULL step below fail, which aborts without losing data.
+            for table in sync_sets:
+                cursor.execute(f"SELECT id FROM {table} WHERE {incomplete[table]} LIMIT 20")
+                bad = [row[0] for row in cursor.fetchall()]
+                if bad:
+                    raise ValueError(f"{table}: linhas sem conversão válida, corrija antes de migrar: {bad}")
+
+            cursor.execute("LOCK TABLES " + ", ".join(f"{table} WRITE" for table in sync_sets))
+            try:
+                for table in sync_sets:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {table}_shadow_insert")
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {table}_shadow_update")
+                    cursor.execute(swaps[table])
+            finally:
+                cursor.execute("UNLOCK TABLES")
+
+    # 5. NOT NULL and the original column order, online: the renamed columns are now the live ones
+    with conn.cursor() as cursor:
+        if needs_transacoes:
+            cursor.execute("""
+                ALTER TABLE transacoes
+                    MODIFY COLUMN valor DECIMAL(12,2) NOT NULL AFTER tipo,
+                    MODIFY COLUMN data DATE NOT NULL AFTER valor,
+                    ALGORITHM=INPLACE, LOCK=NONE
+            """)
+        if needs_locacoes:
+            cursor.execute("""
+                ALTER TABLE locacoes
+                    MODIFY COLUMN data_inicio DATE NOT NULL AFTER placa_moto,
+                    MODIFY COLUMN data_fim DATE NULL AFTER data_inicio,
+                    ALGORITHM=INPLACE, LOCK=NONE
+            """)
+
+    # 6. Composite indexes for the period/CPF/placa queries
+    indexes = [
+        ("transacoes", "idx_transacoes_data_tipo_status", "(data, tipo, status)"),
+        ("transacoes", "idx_transacoes_cpf_data", "(cpf_cliente, data)"),
+        ("transacoes", "idx_transacoes_placa_data", "(placa_moto, data)"),
+        ("locacoes", "idx_locacoes_cpf_inicio", "(cpf_cliente, data_inicio)"),
+    ]
+    with conn.cursor() as cursor:
+        for table, name, cols in indexes:
+            if not index_exists(cursor, table, name):
+                cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} {cols}, ALGORITHM=INPLACE, LOCK=NONE")
+                print(f"  Index {name} created.")
+
+
+@migration(2, "documentos: blobs de motos/locatarios movidos para o document store")
+def move_blobs_to_document_store(conn):
+    from document_store import get_document_store, CHUNK_SIZE
+
+    store = get_document_store()
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                sha256 CHAR(64) PRIMARY KEY,
+                tamanho BIGINT NOT NULL,
+                content_type VARCHAR(100),
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    # (table, primary key, file prefix)
+    sources = [
+        ("motos", "placa", "doc"),
+        ("motos", "placa", "ipva"),
+        ("motos", "placa", "crlv"),
+        ("locatarios", "id", "cnh"),
+    ]
+
+    for table, pk, prefix in sources:
+        with conn.cursor() as cursor:
+            if not column_type(cursor, table, f"{prefix}_sha256"):
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {prefix}_sha256 CHAR(64) NULL AFTER {prefix}_file")
+            if not column_type(cursor, table, f"{prefix}_file"):
+                continue  # Already migrated and dropped
+
+        moved = 0
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {pk}, OCTET_LENGTH({prefix}_file), {prefix}_type FROM {table} "
+                    f"WHERE {prefix}_file IS NOT NULL LIMIT %s",
+                    (MIGRATION_BATCH_SIZE,)
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                break
+
+            for key, length, content_type in rows:
+                # Read the blob in CHUNK_SIZE slices so a large file never sits whole in memory
+                def blob_chunks(key=key, length=length):
+                    with conn.cursor() as chunk_cursor:
+                        for pos in range(1, (length or 0) + 1, CHUNK_SIZE):
+                            chunk_cursor.execute(
+                                f"SELECT SUBSTRING({prefix}_file, %s, %s) FROM {table} WHERE {pk} = %s",
+                                (pos, CHUNK_SIZE, key)
+                            )
+                            yield chunk_cursor.fetchone()[0]
+
+                sha256, size = store.put_stream(blob_chunks())
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO documentos (sha256, tamanho, content_type)
+                        VALUES (%s, %s, %s)
+                        ON DUPLICATE KEY UPDATE sha256 = sha256
+                    """, (sha256, size, content_type))
+                    cursor.execute(
+                        f"UPDATE {table} SET {prefix}_sha256 = %s, {prefix}_file = NULL WHERE {pk} = %s",
+                        (sha256, key)
+                    )
+                conn.commit()
+                moved += 1
+            print(f"  {table}.{prefix}_file: {moved} files moved")
+            time.sleep(MIGRATION_BATCH_SLEEP)
+
+    # All blobs are out: drop the columns so the hot tables shrink
+    with conn.cursor() as cursor:
+        for table, pk, prefix in sources:
+            if column_type(cursor, table, f"{prefix}_file"):
+                cursor.execute(f"ALTER TABLE {table} DROP COLUMN {prefix}_file, ALGORITHM=INPLACE, LOCK=NONE")
+                print(f"  Column {table}.{prefix}_file dropped.")
+
+
+@migration(3, "documento_variantes: miniaturas e previews WebP")
+def document_variants(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS documento_variantes (
+                sha256 CHAR(64) NOT NULL,
+                variante VARCHAR(20) NOT NULL,
+                variante_sha256 CHAR(64) NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (sha256, variante),
+                INDEX idx_variantes_variante_sha (variante_sha256)
+            )
+        """)
+    print("  Run `python image_pipeline.py` to build previews for existing documents.")
+
+
+@migration(4, "asaas_clientes / asaas_pagamentos: espelho local do ASAAS")
+def asaas_mirror(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS asaas_clientes (
+                id VARCHAR(40) PRIMARY KEY,
+                nome VARCHAR(255),
+                cpf_cnpj VARCHAR(20),
+                email VARCHAR(255),
+                date_created DATE,
+                deleted TINYINT(1) NOT NULL DEFAULT 0,
+                payload JSON NOT NULL,
+                sincronizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_asaas_clientes_cpf (cpf_cnpj)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS asaas_pagamentos (
+                id VARCHAR(40) PRIMARY KEY,
+                customer_id VARCHAR(40),
+                status VARCHAR(30),
+                valor DECIMAL(12,2),
+                valor_liquido DECIMAL(12,2),
+                date_created DATE,
+                due_date DATE,
+                payment_date DATE,
+                deleted TINYINT(1) NOT NULL DEFAULT 0,
+                payload JSON NOT NULL,
+                sincronizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_asaas_pagamentos_customer_created (customer_id, date_created),
+                INDEX idx_asaas_pagamentos_created (date_created),
+                INDEX idx_asaas_pagamentos_status_due (status, due_date),
+                INDEX idx_asaas_pagamentos_payment_date (payment_date)
+            )
+        """)
+    print("  The first `asaas_sync` run (scheduler or `python asaas_sync.py --full`) fills the mirror.")
+
+
+@migration(5, "extrato_inter: extrato do Banco Inter armazenado localmente")
+def inter_statement(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS extrato_inter (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                id_transacao VARCHAR(100) NOT NULL,
+                data_entrada DATE NOT NULL,
+                tipo_operacao CHAR(1),
+                tipo_transacao VARCHAR(50),
+                valor DECIMAL(12,2) NOT NULL,
+                titulo VARCHAR(255),
+                descricao VARCHAR(500),
+                payload JSON NOT NULL,
+                sincronizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                UNIQUE KEY uq_extrato_inter_id_transacao (id_transacao),
+                INDEX idx_extrato_inter_data (data_entrada),
+                INDEX idx_extrato_inter_operacao_data (tipo_operacao, data_entrada)
+            )
+        """)
+    print("  The first `inter_sync` run (scheduler or `python inter_sync.py`) fills the table.")
+
+
+@migration(6, "webhook_eventos: fila durável de webhooks do ASAAS")
+def webhook_queue(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS webhook_eventos (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                event_type VARCHAR(60) NOT NULL,
+                payment_id VARCHAR(40),
+                payload JSON NOT NULL,
+                status VARCHAR(15) NOT NULL DEFAULT 'pendente',
+                tentativas INT NOT NULL DEFAULT 0,
+                proxima_tentativa DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                bloqueado_em DATETIME NULL,
+                ultimo_erro TEXT,
+                recebido_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                processado_em DATETIME NULL,
+                INDEX idx_webhook_eventos_fila (status, proxima_tentativa),
+                INDEX idx_webhook_eventos_payment (payment_id)
+            )
+        """)
+
+
+@migration(7, "webhook_idempotencia: descarta reentregas do ASAAS")
+def webhook_idempotency(conn):
+    with conn.cursor() as cursor:
+        # chave = payment id (or the Asaas event id for event types that legitimately repeat)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS webhook_idempotencia (
+                chave VARCHAR(64) NOT NULL,
+                event_type VARCHAR(60) NOT NULL,
+                primeiro_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                ultimo_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                duplicatas INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (chave, event_type),
+                INDEX idx_webhook_idempotencia_ultimo (ultimo_em)
+            )
+        """)
+
+
+@migration(8, "varreduras: transferências Pix agrupadas ASAAS -> Inter")
+def sweeps(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS varreduras (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                valor DECIMAL(12,2) NOT NULL,
+                status VARCHAR(15) NOT NULL DEFAULT 'criada',
+                origem VARCHAR(20) NOT NULL,
+                transfer_id VARCHAR(60),
+                erro TEXT,
+                criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                concluido_em DATETIME NULL,
+                INDEX idx_varreduras_criado (criado_em)
+            )
+        """)
+        # Received payments waiting for (or covered by) a sweep
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS varredura_pagamentos (
+                payment_id VARCHAR(40) PRIMARY KEY,
+                valor_liquido DECIMAL(12,2) NOT NULL,
+                data_pagamento DATE,
+                cpf_cliente VARCHAR(20),
+                recebido_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                varredura_id BIGINT NULL,
+                INDEX idx_varredura_pagamentos_varredura (varredura_id)
+            )
+        """)
+
+
+@migration(9, "execucoes_jobs: histórico de execuções dos jobs agendados")
+def job_runs(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS execucoes_jobs (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                job VARCHAR(60) NOT NULL,
+                chave VARCHAR(60),
+                status VARCHAR(15) NOT NULL DEFAULT 'executando',
+                host VARCHAR(100),
+                mensagem TEXT,
+                iniciado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                finalizado_em DATETIME NULL,
+                INDEX idx_execucoes_jobs_job (job, iniciado_em)
+            )
+        """)
+
+
+@migration(10, "cpf_digits: CPF/CNPJ normalizado e indexado em locatarios, transacoes e asaas_clientes")
+def cpf_digits_columns(conn):
+    # (table, source column). Digits only, like pilot_finance.normalize_cpf. The column is VIRTUAL, so adding it
+    # is a metadata change; InnoDB keeps its index up to date on every write, so add_locatario, add_transaction,
+    # the Asaas upserts etc. need no change
+    sources = [
+        ("locatarios", "cpf"),
+        ("transacoes", "cpf_cliente"),
+        ("asaas_clientes", "cpf_cnpj"),
+    ]
+    with conn.cursor() as cursor:
+        for table, source in sources:
+            if not column_type(cursor, table, "cpf_digits"):
+                cursor.execute(f"""
+                    ALTER TABLE {table} ADD COLUMN cpf_digits VARCHAR(20)
+                    AS (REGEXP_REPLACE(COALESCE({source}, ''), '[^0-9]', '')) VIRTUAL,
+                    ALGORITHM=INPLACE, LOCK=NONE
+                """)
+                print(f"  Column {table}.cpf_digits created.")
+            name = f"idx_{table}_cpf_digits"
+            if not index_exists(cursor, table, name):
+                cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} (cpf_digits), ALGORITHM=INPLACE, LOCK=NONE")
+                print(f"  Index {name} created.")
+
+
+@migration(11, "locatarios.asaas_hash: pula clientes do ASAAS sem alterações na sincronização")
+def locatarios_asaas_hash(conn):
+    with conn.cursor() as cursor:
+        if not column_type(cursor, "locatarios", "asaas_hash"):
+            cursor.execute("ALTER TABLE locatarios ADD COLUMN asaas_hash CHAR(40) NULL, ALGORITHM=INPLACE, LOCK=NONE")
+
+
+
+@migration(12, "asaas_pagamentos / asaas_clientes: versao, descarta eventos de webhook fora de ordem")
+def asaas_mirror_versao(conn):
+    # When the mirrored state was observed (webhook event time or API fetch time); NULL = unknown/oldest
+    with conn.cursor() as cursor:
+        for table in ("asaas_pagamentos", "asaas_clientes"):
+            if not column_type(cursor, table, "versao"):
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN versao DATETIME NULL, ALGORITHM=INSTANT")
+
+# --- Runner ---
+
+def run_migrations():
+    db = DatabaseManager()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    descricao VARCHAR(255) NOT NULL,
+                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+
+        for version, descricao, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in applied:
+                continue
+            print(f"Applying migration {version}: {descricao}")
+            func(conn)
+            with conn.cursor() as cursor:
+                cursor.execute("INSERT INTO schema_migrations (version, descricao) VALUES (%s, %s)", (version, descricao))
+            conn.commit()
+            print(f"Migration {version} applied.")
+        print("Database schema is up to date.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    run_migrations()
@@ -0,0 +1,88 @@
+import streamlit as st
+from database_manager import DatabaseManager, get_table_versions
+from ui_cache import UI_CACHE_TTL
+
+ASAAS_STATUS_MAP = {
+    "RECEIVED": "recebido",
+    "CONFIRMED": "recebido",
+    "RECEIVED_IN_CASH": "recebido",
+    "PENDING": "pendente",
+    "OVERDUE": "em atraso",
+}
+
+# Tables the index is built from; a write to any of them rebuilds it
+FINANCE_TABLES = ("transacoes", "asaas_clientes", "asaas_pagamentos")
+
+
+def normalize_cpf(value):
+    """ Digits only, so '123.456.789-00' and '12345678900' match """
+    return "".join(ch for ch in str(value or "") if ch.isdigit())
+
+
+def build_finance_index(db):
+    """
+    Groups the ledger and the mirrored Asaas payments by clean CPF in one pass over each.
+    Returns (index, asaas_error): index maps CPF -> list of finance rows (manual entries first),
+    asaas_error is the message of a failed Asaas read, or None.
+    """
+    index = {}
+
+    # 1. Ledger entries linked to a CPF; cpf_digits comes normalized from MySQL
+    columns = DatabaseManager.TRANSACTION_COLUMNS + ("cpf_digits",)
+    for tx in db.get_transactions(columns=columns):
+        cpf = tx[8]
+        if not cpf:
+            continue
+        tipo_label = "Receita" if tx[2] in ('entrada', 'entrada_liquida') else "Despesa"
+        index.setdefault(cpf, []).append({
+            "id": tx[0],
+            "origem": f"{tx[1] or 'Manual'} ({tipo_label})",
+            "valor": float(tx[3]),
+            "valor_liquido": float(tx[3]),
+            "data": str(tx[4]) if tx[4] else "",
+            "status": tx[5] or "recebido",  # Legacy entries may have empty status
+            "tipo": tx[2],
+            "editavel": True
+        })
+
+    # 2. ASAAS payments from the local mirror, attributed through the customer's CPF
+    try:
+        cpf_by_customer = db.get_asaas_customer_cpfs()
+        for pg in db.get_asaas_payments(status=list(ASAAS_STATUS_MAP)):
+            cpf = cpf_by_customer.get(pg.get("customer"))
+            if not cpf:
+                continue
+            index.setdefault(cpf, []).append({
+                "id": None,
+                "origem": "ASAAS",
+                "valor": float(pg.get("value", 0)),
+                "valor_liquido": float(pg.get("netValue", pg.get("value", 0))),
+                "data": pg.get("paymentDate") or pg.get("dueDate") or pg.get("dateCreated", ""),
+                "status": ASAAS_STATUS_MAP[pg["status"]],
+                "tipo": "entrada",
+                "editavel": False
+            })
+    except Exception as e:
+        return index, str(e)
+
+    return index, None
+
+
+def finance_totals(rows):
+    """ (recebido, pendente, em atraso) of a pilot's finance rows """
+    totals = {"recebido": 0.0, "pendente": 0.0, "em atraso": 0.0}
+    for r in rows:
+        if r["status"] in totals:
+            totals[r["status"]] += r["valor"]
+    return totals["recebido"], totals["pendente"], totals["em atraso"]
+
+
+@st.cache_data(ttl=UI_CACHE_TTL, max_entries=8, show_spinner=False)
+def _cached_finance_index(versions):
+    # `versions` is only part of the cache key
+    return build_finance_index(DatabaseManager())
+
+
+def get_finance_index():
+    """ The per-CPF index shared by every pilot finance view, rebuilt only after writes to FINANCE_TABLES """
+    return _cached_finance_index(get_table_versions(*FINANCE_TABLES))
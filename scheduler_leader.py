@@ -0,0 +1,118 @@
+import os
+import signal
+import datetime
+import threading
+import pymysql
+from dotenv import load_dotenv
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from db_pool import get_pool
+
+load_dotenv()
+
+SCHEDULER_LOCK = "locamotos_scheduler_leader"
+SCHEDULER_HEARTBEAT = float(os.getenv("SCHEDULER_HEARTBEAT", "15"))  # seconds between leadership checks
+SCHEDULER_RETRY = float(os.getenv("SCHEDULER_RETRY", "30"))  # seconds a standby waits before trying again
+
+
+def build_scheduler():
+    """ Every periodic job of the system, registered on a not-yet-started BackgroundScheduler """
+    import inter_sync
+    from asaas_sync import run_sync, ASAAS_SYNC_INTERVAL_MINUTES
+    from sweep import sweep_job, SWEEP_INTERVAL_MINUTES
+    from webhook_queue import purge_webhook_history
+    from accountant_export import auto_send_accountant_export_job
+
+    scheduler = BackgroundScheduler(timezone="America/Sao_Paulo")
+    # Accountant export: daily at 08:00 AM from the 5th on; a no-op once last month was sent
+    scheduler.add_job(
+        auto_send_accountant_export_job,
+        'cron',
+        day='5-31',
+        hour='8',
+        minute='0',
+        max_instances=1,
+        coalesce=True
+    )
+    # Incremental Asaas mirror sync; the first run starts right away
+    scheduler.add_job(
+        run_sync,
+        'interval',
+        minutes=ASAAS_SYNC_INTERVAL_MINUTES,
+        next_run_time=datetime.datetime.now(),
+        max_instances=1,
+        coalesce=True
+    )
+    # Incremental Banco Inter statement sync into extrato_inter
+    scheduler.add_job(
+        inter_sync.run_sync,
+        'interval',
+        minutes=inter_sync.INTER_SYNC_INTERVAL_MINUTES,
+        next_run_time=datetime.datetime.now(),
+        max_instances=1,
+        coalesce=True
+    )
+    # Periodic Pix sweep of the Asaas balance to Banco Inter
+    scheduler.add_job(
+        sweep_job,
+        'interval',
+        minutes=SWEEP_INTERVAL_MINUTES,
+        max_instances=1,
+        coalesce=True
+    )
+    # Retention for webhook idempotency keys and processed queue events
+    scheduler.add_job(purge_webhook_history, 'cron', hour='3', minute='30')
+
+    print("Background Scheduler configured. Accountant export daily at 08:00 AM from the 5th of the month.")
+    print(f"Asaas mirror sync every {ASAAS_SYNC_INTERVAL_MINUTES} minutes.")
+    print(f"Inter statement sync every {inter_sync.INTER_SYNC_INTERVAL_MINUTES} minutes.")
+    print(f"Pix sweep every {SWEEP_INTERVAL_MINUTES} minutes.")
+    return scheduler
+
+
+def run_leader(stop_event):
+    """
+    Runs the scheduler only while this process holds the MySQL named lock SCHEDULER_LOCK.
+    Any number of copies can be started (on any host): one leads, the others wait as standbys.
+    The lock lives on a dedicated connection; if that connection dies, MySQL releases the lock,
+    this process stops its jobs and a standby takes over.
+    """
+    while not stop_event.is_set():
+        conn = None
+        try:
+            conn = pymysql.connect(**get_pool().connect_kwargs)
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, 0)", (SCHEDULER_LOCK,))
+                leader = cursor.fetchone()[0] == 1
+        except Exception as e:
+            print(f"[Scheduler] Could not reach the database: {e}")
+            leader = False
+
+        if leader:
+            print(f"[Scheduler] This process (pid {os.getpid()}) is the scheduler leader.")
+            scheduler = build_scheduler()
+            scheduler.start()
+            try:
+                while not stop_event.wait(SCHEDULER_HEARTBEAT):
+                    conn.ping(reconnect=False)
+            except Exception as e:
+                print(f"[Scheduler] Lost the leader lock: {e}")
+            finally:
+                # Let running jobs finish before giving up leadership
+                scheduler.shutdown(wait=True)
+                print("[Scheduler] Scheduler safely shut down.")
+        else:
+            stop_event.wait(SCHEDULER_RETRY)
+
+        if conn is not None:
+            try:
+                conn.close()  # Also releases the named lock
+            except Exception:
+                pass
+
+
+if __name__ == "__main__":
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run_leader(stop)
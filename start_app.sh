@@ -6,15 +6,27 @@ cd "$(dirname "$0")"
 # Optional: If you are using a virtual environment (e.g., venv), uncomment the next line to activate it before running.
 # source venv/bin/activate
 
-# 1. Start the Flask Webhook Server in the background
+# 0. Apply pending database migrations
+python3 migrations.py
+
+# 1. Start the Webhook Server (gunicorn, see gunicorn.conf.py) in the background
 echo "Starting Webhook Server..."
-python3 webhook_server.py &
+gunicorn -c gunicorn.conf.py wsgi:app &
 WEBHOOK_PID=$!
 
-# 2. Start the Streamlit Configuration UI in the foreground
+# 2. Start the job scheduler; only one scheduler_leader.py runs jobs at a time, extra copies stay on standby
+echo "Starting Scheduler..."
+python3 scheduler_leader.py &
+SCHEDULER_PID=$!
+
+# 3. When Streamlit is closed (or this script is stopped), stop the background services gracefully
+shutdown() {
+    echo "Shutting down..."
+    kill -TERM $WEBHOOK_PID $SCHEDULER_PID 2>/dev/null
+    wait $WEBHOOK_PID $SCHEDULER_PID 2>/dev/null
+}
+trap shutdown EXIT
+
+# 4. Start the Streamlit Configuration UI in the foreground
 echo "Starting Configuration UI..."
 streamlit run config_ui.py
-
-# 3. When Streamlit is closed, stop the Webhook server
-echo "Shutting down..."
-kill $WEBHOOK_PID
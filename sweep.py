@@ -0,0 +1,96 @@
+import os
+from decimal import Decimal, ROUND_DOWN
+from dotenv import load_dotenv
+from asaas_client import AsaasClient
+from database_manager import DatabaseManager
+
+load_dotenv()
+
+# Automatic sweeps only move money once the Asaas balance reaches this amount
+SWEEP_MIN_AMOUNT = Decimal(os.getenv("SWEEP_MIN_AMOUNT", "100.00"))
+SWEEP_INTERVAL_MINUTES = int(os.getenv("SWEEP_INTERVAL_MINUTES", "60"))
+
+SWEEP_LOCK = "locamotos_varredura"
+
+
+def run_sweep(origem="automatica", min_amount=SWEEP_MIN_AMOUNT, db=None, client=None):
+    """
+    Moves the whole available Asaas balance to Banco Inter in a single Pix and records
+    which received payments the transfer covered. Those payments are written to the
+    ledger as 'entrada_liquida' in the same transaction that closes the sweep; if that
+    fails, the next run retries it.
+    Returns (success, message).
+    """
+    db = db or DatabaseManager()
+    client = client or AsaasClient()
+
+    inter_pix_key = os.getenv("INTER_PIX_KEY")
+    inter_pix_key_type = os.getenv("INTER_PIX_KEY_TYPE")
+    if not inter_pix_key:
+        return False, "INTER_PIX_KEY não configurada. Varredura cancelada."
+
+    # Only one sweep at a time across the Streamlit app and the webhook server
+    with db.advisory_lock(SWEEP_LOCK) as acquired:
+        if not acquired:
+            return False, "Já existe uma varredura em andamento."
+
+        # Ledger entries of earlier sweeps whose transfer went out but whose finish_sweep failed
+        for pending_id, transfer_id in db.get_transferred_sweeps():
+            try:
+                db.finish_sweep(pending_id, transfer_id)
+                print(f"[Sweep] #{pending_id}: ledger entries recorded on retry.")
+            except Exception as e:
+                print(f"[Sweep] #{pending_id}: ledger retry failed: {e}")
+
+        pendentes = db.get_pending_sweep_payments()
+        balance = Decimal(str(client.get_balance(use_cache=False))).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+        if balance <= 0 or balance < min_amount:
+            msg = f"Saldo R$ {balance} abaixo do mínimo de R$ {min_amount}. {len(pendentes)} pagamento(s) aguardando."
+            print(f"[Sweep] {msg}")
+            return False, msg
+
+        sweep_id = db.create_sweep(balance, origem, [p[0] for p in pendentes])
+        try:
+            print(f"[Sweep] #{sweep_id}: transferring R${balance} ({len(pendentes)} payments) to {inter_pix_key}...")
+            transfer = client.create_pix_transfer(
+                pix_key=inter_pix_key,
+                pix_key_type=inter_pix_key_type,
+                value=float(balance),
+                description=f"Varredura #{sweep_id} ({len(pendentes)} pagamentos)"
+            )
+        except Exception as e:
+            db.fail_sweep(sweep_id, str(e))
+            print(f"[Sweep] #{sweep_id} failed: {e}")
+            return False, f"Falha na transferência: {e}"
+
+        try:
+            db.finish_sweep(sweep_id, transfer.get("id"))
+        except Exception as e:
+            # The money already moved: never hand these payments to another sweep, only retry the ledger
+            db.mark_sweep_transferred(sweep_id, transfer.get("id"), f"Lançamento no caixa pendente: {e}")
+            print(f"[Sweep] #{sweep_id}: transfer done, ledger entries failed ({e}). Will retry.")
+            return True, f"Varredura #{sweep_id}: R$ {balance} transferidos, lançamento no caixa pendente ({e})."
+
+        msg = f"Varredura #{sweep_id}: R$ {balance} transferidos para o Inter ({len(pendentes)} pagamento(s))."
+        print(f"[Sweep] {msg}")
+        return True, msg
+
+
+def trigger_sweep():
+    """ Manual sweep from the UI: ignores the minimum amount """
+    try:
+        return run_sweep(origem="manual", min_amount=Decimal("0.01"))
+    except Exception as e:
+        return False, f"Erro na varredura: {e}"
+
+
+def sweep_job():
+    """ Scheduler entry point """
+    try:
+        run_sweep()
+    except Exception as e:
+        print(f"[Sweep] EXCEPTION: {e}")
+
+
+if __name__ == "__main__":
+    print(trigger_sweep()[1])
@@ -0,0 +1,60 @@
+import os
+import streamlit as st
+from dotenv import load_dotenv
+from database_manager import DatabaseManager, get_table_versions
+
+load_dotenv()
+
+# Upper bound on how stale a cached read can get when the table was changed by another
+# process (webhook workers, scheduler). Writes made by this process invalidate immediately.
+UI_CACHE_TTL = int(os.getenv("UI_CACHE_TTL", "60"))
+
+# DatabaseManager read methods served from the cache, and the tables each one reads
+CACHED_READS = {
+    "get_all_configs": ("configuracoes",),
+    "get_config": ("configuracoes",),
+    "get_motos_list": ("motos",),
+    "get_all_motos": ("motos",),
+    "get_moto_details": ("motos",),
+    "get_locatarios_list": ("locatarios",),
+    "get_locatario_details": ("locatarios",),
+    "get_transactions": ("transacoes",),
+    "count_transactions": ("transacoes",),
+    "get_transaction_totals": ("transacoes",),
+    "get_asaas_customers": ("asaas_clientes",),
+    "get_asaas_payments": ("asaas_pagamentos", "asaas_clientes"),  # the cpf filter joins asaas_clientes
+    "get_inter_statement": ("extrato_inter",),
+    "get_accountant_exports": ("envios_contador",),
+    "get_last_job_run": ("execucoes_jobs",),
+    "get_recent_sweeps": ("varreduras",),
+}
+
+
+@st.cache_data(ttl=UI_CACHE_TTL, max_entries=500, show_spinner=False)
+def _cached_read(method, versions, args, kwargs):
+    # `versions` is only part of the cache key
+    return getattr(DatabaseManager(), method)(*args, **dict(kwargs))
+
+
+class CachedDatabase:
+    """
+    Drop-in for DatabaseManager in the Streamlit pages. Reads listed in CACHED_READS are shared
+    across reruns and sessions until a DatabaseManager write touches one of their tables;
+    everything else (writes, documents, users, queue stats) goes straight to the database.
+    """
+
+    def __init__(self):
+        self._db = DatabaseManager()
+
+    def __getattr__(self, name):
+        tables = CACHED_READS.get(name)
+        if tables is None:
+            return getattr(self._db, name)
+
+        def read(*args, **kwargs):
+            return _cached_read(name, get_table_versions(*tables), args, tuple(sorted(kwargs.items())))
+        return read
+
+
+def clear_ui_cache():
+    _cached_read.clear()
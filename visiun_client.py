@@ -1,6 +1,7 @@
 import os
 import requests
 from dotenv import load_dotenv
+from http_session import get_session
 
 load_dotenv()
 
@@ -13,6 +14,7 @@ class VisiunClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.session = get_session("visiun")
 
     def _check_config(self):
         if not self.api_key:
@@ -34,7 +36,7 @@ class VisiunClient:
         }
         
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self.session.get(url, headers=self.headers, params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.HTTPError as e:
@@ -0,0 +1,162 @@
+import os
+import threading
+from dotenv import load_dotenv
+from asaas_client import AsaasClient, invalidate_asaas_cache
+from asaas_sync import apply_webhook_event
+from database_manager import DatabaseManager
+
+load_dotenv()
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE = int(os.getenv("WEBHOOK_RETRY_BASE", "30"))  # seconds, doubled on each attempt
+WEBHOOK_RETRY_MAX = int(os.getenv("WEBHOOK_RETRY_MAX", "3600"))
+WEBHOOK_LOCK_TIMEOUT = int(os.getenv("WEBHOOK_LOCK_TIMEOUT", "600"))  # reclaim events of crashed workers
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "2"))
+
+# Retention of webhook_idempotencia keys and of processed webhook_eventos rows
+WEBHOOK_IDEMPOTENCY_RETENTION_DAYS = int(os.getenv("WEBHOOK_IDEMPOTENCY_RETENTION_DAYS", "30"))
+WEBHOOK_EVENTS_RETENTION_DAYS = int(os.getenv("WEBHOOK_EVENTS_RETENTION_DAYS", "90"))
+
+# Event types that can legitimately happen more than once for the same payment/customer;
+# these are deduplicated by the Asaas event id instead of by (payment id, event type)
+REPEATABLE_EVENTS = {"PAYMENT_UPDATED", "PAYMENT_RESTORED", "PAYMENT_DELETED", "CUSTOMER_UPDATED"}
+
+
+asaas_client = AsaasClient()
+db_manager = DatabaseManager()
+
+
+def process_event(event_type, data, received_at=None):
+    """
+    Everything the webhook used to do inside the HTTP request.
+    Raising makes the worker retry the event later.
+    """
+    # Any payment event changes the payment list and, possibly, the balance
+    if event_type.startswith('PAYMENT_'):
+        invalidate_asaas_cache("payments", "balance")
+    elif event_type.startswith('CUSTOMER_'):
+        invalidate_asaas_cache("customers")
+
+    # Keep the local mirror (asaas_pagamentos / asaas_clientes) up to date
+    if event_type.startswith(('PAYMENT_', 'CUSTOMER_')):
+        apply_webhook_event(event_type, data, db=db_manager, client=asaas_client, received_at=received_at)
+
+    # We only care when the payment is confirmed received
+    if event_type != 'PAYMENT_RECEIVED':
+        return
+
+    payment_data = data.get('payment', {})
+
+    payment_id = payment_data.get('id')
+    net_value = float(payment_data.get('netValue', 0.0))
+    payment_date = payment_data.get('paymentDate') or payment_data.get('clientPaymentDate')
+    # If 'cpfCnpj' is not in the webhook payload, an extra API call to /customers/{id} would be needed.
+    customer_cpf = payment_data.get('cpfCnpj')
+
+    # The money goes to Inter with the next sweep (sweep.py), together with the other received payments
+    db_manager.record_sweep_payment(payment_id, net_value, payment_date, customer_cpf)
+    print(f"Payment {payment_id} (R${net_value}) queued for the next sweep.")
+
+
+def idempotency_key(event_type, data):
+    """ Key under which a delivery is deduplicated, or None when the event cannot be identified """
+    if event_type in REPEATABLE_EVENTS:
+        event_id = data.get('id')
+        return f"evt:{event_id}" if event_id else None
+    for field in ('payment', 'customer'):
+        obj = data.get(field)
+        if isinstance(obj, dict) and obj.get('id'):
+            return obj['id']
+    return None
+
+
+def purge_webhook_history():
+    """ Daily retention job for the idempotency store and the processed queue """
+    keys, events = db_manager.purge_webhook_history(WEBHOOK_IDEMPOTENCY_RETENTION_DAYS, WEBHOOK_EVENTS_RETENTION_DAYS)
+    print(f"[WebhookQueue] Retention: {keys} idempotency keys and {events} processed events removed.")
+
+
+def retry_delay(tentativas):
+    return min(WEBHOOK_RETRY_BASE * 2 ** (tentativas - 1), WEBHOOK_RETRY_MAX)
+
+
+class WebhookWorkerPool:
+    """
+    Background threads draining webhook_eventos.
+    Each worker claims one event at a time; failures are retried with exponential backoff
+    and end up in the 'morto' (dead-letter) state after WEBHOOK_MAX_ATTEMPTS.
+    """
+    def __init__(self, workers=WEBHOOK_WORKERS, db=None):
+        self.workers = workers
+        self.db = db or db_manager
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"webhook-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[WebhookQueue] {self.workers} workers started.")
+
+    def notify(self):
+        """ Wakes idle workers right away instead of waiting for the next poll """
+        self._wakeup.set()
+
+    def stop(self, timeout=30):
+        """ Lets in-flight events finish, then stops the workers """
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        print("[WebhookQueue] Workers stopped.")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.db.claim_webhook_event(WEBHOOK_LOCK_TIMEOUT)
+            except Exception as e:
+                print(f"[WebhookQueue] Could not claim event: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(WEBHOOK_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            try:
+                self._handle(*job)
+            except Exception as e:
+                # The event stays 'processando' and is reclaimed after WEBHOOK_LOCK_TIMEOUT
+                print(f"[WebhookQueue] Could not record result of event {job[0]}: {e}")
+
+    def _handle(self, event_id, event_type, data, tentativas, recebido_em=None):
+        try:
+            process_event(event_type, data, received_at=recebido_em)
+            self.db.complete_webhook_event(event_id)
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+            if tentativas >= WEBHOOK_MAX_ATTEMPTS:
+                print(f"[WebhookQueue] Event {event_id} ({event_type}) dead after {tentativas} attempts: {erro}")
+                self.db.fail_webhook_event(event_id, erro)
+            else:
+                delay = retry_delay(tentativas)
+                print(f"[WebhookQueue] Event {event_id} ({event_type}) failed, retrying in {delay}s: {erro}")
+                self.db.fail_webhook_event(event_id, erro, retry_in=delay)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WebhookWorkerPool()
+    return _pool
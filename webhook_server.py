@@ -1,156 +1,189 @@
 import os
-from flask import Flask, request, jsonify
+import re
+import unicodedata
+from urllib.parse import quote
+from flask import Flask, request, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
-import datetime
-import calendar
-from apscheduler.schedulers.background import BackgroundScheduler
 
-from asaas_client import AsaasClient
 from database_manager import DatabaseManager
-from inter_client import InterClient
+from webhook_queue import get_worker_pool, idempotency_key
+from document_store import get_document_store, verify_document_signature
 from exports import generate_csv_summary
-from mailer import send_accountant_email
 
 load_dotenv()
 
 app = Flask(__name__)
 
 # Initialize clients
-asaas_client = AsaasClient()
 db_manager = DatabaseManager()
 
+# Optional shared secret configured in the Asaas webhook settings (sent as the asaas-access-token header)
+ASAAS_WEBHOOK_TOKEN = os.getenv("ASAAS_WEBHOOK_TOKEN", "")
+
 @app.route('/asaas-webhook', methods=['POST'])
 def asaas_webhook():
     """
     Endpoint to receive Asaas Webhooks.
-    We are specifically interested in the 'PAYMENT_RECEIVED' event.
+    Only validates and stores the event in webhook_eventos; the worker pool in
+    webhook_queue.py does the actual processing (transfer, mirror, cache invalidation),
+    so Asaas gets its 200 in milliseconds even on busy due dates.
     """
-    data = request.json
+    if ASAAS_WEBHOOK_TOKEN and request.headers.get('asaas-access-token') != ASAAS_WEBHOOK_TOKEN:
+        return jsonify({"message": "Invalid webhook token"}), 401
+
+    data = request.get_json(silent=True)
     
     if not data:
         return jsonify({"message": "No data received"}), 400
 
     event_type = data.get('event')
-    
-    # We only care when the payment is confirmed received
-    if event_type == 'PAYMENT_RECEIVED':
-        payment_data = data.get('payment', {})
-        
-        payment_id = payment_data.get('id')
-        net_value = float(payment_data.get('netValue', 0.0))
-        customer_id = payment_data.get('customer') # Asaas customer ID, might need mapping to CPF
-        payment_date = payment_data.get('paymentDate') or payment_data.get('clientPaymentDate')
-        
-        print(f"--- WEBHOOK RECEIVED: PAYMENT_RECEIVED ---")
-        print(f"Payment ID: {payment_id} | Net Value: R${net_value}")
-        
-        # 1. Retrieve the configured Banco Inter Pix Key
-        inter_pix_key = os.getenv("INTER_PIX_KEY")
-        inter_pix_key_type = os.getenv("INTER_PIX_KEY_TYPE")
-        
-        if not inter_pix_key:
-            print("ERROR: INTER_PIX_KEY is not configured in .env. Cannot auto-transfer.")
-            return jsonify({"message": "Transfer aborted, Pix Key missing."}), 500
-
-        try:
-            # 2. Check Available Balance in Asaas
-            balance = asaas_client.get_balance()
-            print(f"Current Asaas Balance: R${balance}")
-            
-            if balance >= net_value:
-                # 3. Create Pix Transfer to Banco Inter
-                print(f"Initiating auto-transfer of R${net_value} to {inter_pix_key}...")
-                transfer_response = asaas_client.create_pix_transfer(
-                    pix_key=inter_pix_key,
-                    pix_key_type=inter_pix_key_type,
-                    value=net_value,
-                    description=f"Auto-Transfer for Payment {payment_id}"
-                )
-                print(f"Pix Transfer Created successfully. Response: {transfer_response.get('id')}")
-                
-                # 4. Record the net profit transaction in our Database
-                # Note: Ideally, we should fetch the actual CPF from Asaas using customer_id. 
-                # For this MVP, we assume customer_cpf is either in the payload or we log it generically if missing.
-                # If 'cpfCnpj' is not in the webhook payload, an extra API call to /customers/{id} would be needed. 
-                customer_cpf = payment_data.get('cpfCnpj') 
-                
-                # Using 'entrada_liquida' to distinguish from gross
-                db_manager.add_transaction(
-                    origem="ASAAS",
-                    tipo="entrada_liquida",
-                    valor=net_value,
-                    data=payment_date,
-                    cpf_cliente=customer_cpf 
-                )
-                print(f"Net Profit of R${net_value} saved to Database.")
-                
-            else:
-                print(f"INSUFFICIENT FUNDS: Balance (R${balance}) is less than Net Value (R${net_value}).")
-        
-        except Exception as e:
-            print(f"Error processing automation: {e}")
-            return jsonify({"message": "Error processing automation", "details": str(e)}), 500
-
-    return jsonify({"message": "Webhook processed successfully."}), 200
-
-def auto_send_accountant_export_job():
-    print("[APScheduler] Executing monthly accountant export job...")
-    
-    # Reload env vars inside job to catch any updates made via UI
-    load_dotenv(override=True)
-    contador_email = os.getenv("EMAIL_CONTADOR", "")
-    
-    if not contador_email:
-        print("[APScheduler] EMAIL_CONTADOR not configured. Aborting execution.")
-        return
-        
-    hoje = datetime.date.today()
-    mes_anterior = (hoje.replace(day=1) - datetime.timedelta(days=1)).strftime("%Y-%m")
-    
-    db = DatabaseManager()
-    
-    if not db.has_sent_export_for_month(mes_anterior):
-        print(f"[APScheduler] Generating reports for {mes_anterior}...")
-        year_str, month_str = mes_anterior.split('-')
-        last_day = calendar.monthrange(int(year_str), int(month_str))[1]
-        data_inicio = f"{mes_anterior}-01"
-        data_fim = f"{mes_anterior}-{last_day:02d}"
-        
-        try:
-            client = InterClient()
-            pdf_b64 = client.get_extrato_export(data_inicio, data_fim, "PDF")
-            ofx_b64 = client.get_extrato_export(data_inicio, data_fim, "OFX")
-            
-            success, msg = send_accountant_email(contador_email, mes_anterior, ofx_b64=ofx_b64, pdf_b64=pdf_b64)
-            if success:
-                db.record_accountant_export(mes_anterior, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "sucesso", "Worker Automático")
-                print(f"[APScheduler] SUCCESS: Reports sent to {contador_email}")
-            else:
-                db.record_accountant_export(mes_anterior, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "falha", "Worker Automático")
-                print(f"[APScheduler] ERROR sending email: {msg}")
-        except Exception as e:
-            print(f"[APScheduler] EXCEPTION in integration: {str(e)}")
+    if not isinstance(event_type, str) or not event_type:
+        return jsonify({"message": "Missing event type"}), 400
+
+    payment = data.get('payment')
+    payment_id = payment.get('id') if isinstance(payment, dict) else None
+
+    try:
+        event_id = db_manager.enqueue_webhook_event(event_type, payment_id, data, idempotency_key(event_type, data))
+    except Exception as e:
+        # Not stored: a non-2xx makes Asaas deliver it again later
+        print(f"Could not enqueue webhook {event_type}: {e}")
+        return jsonify({"message": "Could not store event"}), 503
+
+    if event_id is None:
+        # Redelivery of an event we already have: acknowledge without doing anything
+        return jsonify({"message": "Duplicate webhook ignored."}), 200
+
+    get_worker_pool().notify()
+    return jsonify({"message": "Webhook queued.", "id": event_id}), 200
+
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Liveness probe that also exposes the shared DB connection pool counters,
+    the webhook queue size and the webhook redelivery rate of the last 24h.
+    """
+    try:
+        webhook_queue = db_manager.get_webhook_queue_stats()
+        webhook_duplicates = db_manager.get_webhook_duplicate_stats()
+    except Exception as e:
+        webhook_queue = webhook_duplicates = {"error": str(e)}
+    return jsonify({
+        "status": "ok",
+        "db_pool": db_manager.get_pool_stats(),
+        "webhook_queue": webhook_queue,
+        "webhook_duplicates": webhook_duplicates
+    }), 200
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _parse_range(header, size):
+    """
+    Parses a single-range `Range: bytes=a-b` header.
+    Returns (start, end) inclusive, None when there is no usable header, or False when unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    start_s, end_s = match.groups()
+    if not start_s and not end_s:
+        return None
+    if not start_s:
+        # Suffix range: last N bytes
+        length = int(end_s)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start_s)
+    end = int(end_s) if end_s else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+def _content_disposition(nome):
+    """
+    RFC 6266 header for a download name: an ASCII filename= fallback for old clients plus
+    filename*= with the UTF-8 name (header values must be latin-1, so names like 'CNH Nguyễn.pdf' broke the route)
+    """
+    ascii_nome = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
+    ascii_nome = re.sub(r'[\x00-\x1f\x7f"\\]', "", ascii_nome) or "documento"
+    return f"inline; filename=\"{ascii_nome}\"; filename*=UTF-8''{quote(nome, safe='')}"
+
+@app.route('/documentos/<sha256>', methods=['GET', 'HEAD'])
+def serve_document(sha256):
+    """
+    Streams a stored document (CNH, CRLV, IPVA...) by its SHA-256.
+    Access requires a link signed by document_store.sign_document_url.
+    Supports ETag/If-None-Match and single HTTP ranges so PDFs can be paged in by the browser.
+    """
+    if not SHA256_RE.match(sha256):
+        return jsonify({"message": "Invalid document id"}), 404
+    nome = request.args.get("nome")
+    if not verify_document_signature(sha256, request.args.get("exp"), request.args.get("sig"), nome):
+        return jsonify({"message": "Invalid or expired link"}), 403
+
+    meta = db_manager.get_document_meta(sha256)
+    if not meta:
+        return jsonify({"message": "Document not found"}), 404
+    size = int(meta[1])
+    content_type = meta[2] or "application/octet-stream"
+
+    # Content-addressed: the hash is a perfect strong validator and the bytes never change
+    etag = f'"{sha256}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if nome:
+        headers["Content-Disposition"] = _content_disposition(nome)
+
+    if_none_match = request.headers.get("If-None-Match", "")
+    if if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status=304, headers=headers)
+
+    byte_range = _parse_range(request.headers.get("Range"), size)
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range.strip() != etag:
+        byte_range = None  # Stale partial copy on the client: send the whole file
+
+    if byte_range is False:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    if byte_range:
+        start, end = byte_range
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
     else:
-        print(f"[APScheduler] Reports for {mes_anterior} have already been sent. Skipping.")
+        start, end = 0, size - 1
+        status = 200
+    headers["Content-Length"] = str(end - start + 1 if size else 0)
+
+    if request.method == "HEAD" or size == 0:
+        return Response(status=status, headers=headers, content_type=content_type)
+
+    chunks = get_document_store().iter_chunks(sha256, start, end)
+    return Response(stream_with_context(chunks), status=status, headers=headers, content_type=content_type)
 
 if __name__ == '__main__':
-    # Initialize Scheduler
-    scheduler = BackgroundScheduler(timezone="America/Sao_Paulo")
-    # Schedule the job to run at 08:00 AM on the 5th day of every month
-    scheduler.add_job(
-        auto_send_accountant_export_job, 
-        'cron', 
-        day='5', 
-        hour='8', 
-        minute='0'
-    )
+    # Development mode: Flask dev server with the scheduler and the queue workers in this process.
+    # Production uses gunicorn (wsgi.py + gunicorn.conf.py) and a separate scheduler_leader.py.
+    from scheduler_leader import build_scheduler
+    scheduler = build_scheduler()
     scheduler.start()
-    print("Background Scheduler Started. Job configured for 5th of the month at 08:00 AM.")
+
+    # Workers that drain the webhook queue
+    get_worker_pool().start()
 
     try:
         # Run the Flask app on port 5001
         print("Starting Asaas Webhook Server on port 5001...")
         app.run(host='0.0.0.0', port=5001)
     except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
         scheduler.shutdown()
+        get_worker_pool().stop()
         print("Scheduler safely shut down.")
@@ -0,0 +1,8 @@
+"""
+WSGI entry point for production:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Periodic jobs do not run here; start scheduler_leader.py separately (once or on several hosts).
+"""
+from webhook_server import app  # noqa: F401